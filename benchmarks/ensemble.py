@@ -0,0 +1,54 @@
+"""
+Trajectory steps per second of the lockstep docking simulation, for a few
+ensemble sizes and both controllers, with the dynamics kernel
+(kernels.spacecraft_f) as f. From the root of the repo:
+
+    python benchmarks/ensemble.py
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, ActiveSetFilter, SafetyFilter, kernels, spacecraft as sc  # noqa: E402
+from iccbf.simulate import simulate  # noqa: E402
+
+
+def initial_states(K, rng):
+    # around the x0 = [0.1, -0.01, 0, 0, 0] of docking.jl
+    return np.column_stack([
+        rng.uniform(0.05, 0.1, K),
+        rng.uniform(-0.01, 0.01, K),
+        np.zeros(K),
+        np.zeros(K),
+        np.zeros(K),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the ensemble docking simulation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 1024])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--dt", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    f = kernels.spacecraft_f
+    b = ICCBF(f, sc.g, sc.h, sc.alphas, sc.U)
+    rng = np.random.default_rng(0)
+    # compile (or load) the kernel before timing
+    f(initial_states(1, rng))
+
+    print(f"{'K':>6} {'controller':>16} {'traj steps/s':>14}")
+    for K in args.sizes:
+        X0 = initial_states(K, rng)
+        for controller in (ActiveSetFilter(b, sc.V), SafetyFilter(b, sc.V)):
+            _, _, _, info = simulate(f, sc.g, controller, X0, args.steps * args.dt, args.dt, done=sc.docked)
+            print(f"{K:>6} {type(controller).__name__:>16} {info['rate']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Right hand side evaluations and accuracy of the docking simulation with the
+Euler steps of docking.jl (dt = 1e-3) and with adaptive steps, against an
+adaptive reference at a tight tolerance, all with the dynamics kernel
+(kernels.spacecraft_f) as f. From the root of the repo:
+
+    python benchmarks/integrators.py
+
+The Euler run calls the controller once per millisecond of simulated time,
+so it takes a few minutes.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, ActiveSetFilter, kernels, spacecraft as sc  # noqa: E402
+from iccbf.simulate import simulate, simulate_adaptive  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare the Euler and adaptive docking simulations")
+    parser.add_argument("--t-max", type=float, default=400.0)
+    parser.add_argument("--dt", type=float, default=1e-3)
+    parser.add_argument("--rtols", type=float, nargs="+", default=[1e-6, 1e-7, 1e-8])
+    args = parser.parse_args()
+
+    f = kernels.spacecraft_f
+    b = ICCBF(f, sc.g, sc.h, sc.alphas, sc.U)
+    X0 = np.array([[0.1, -0.01, 0, 0, 0]])
+
+    def adaptive(rtol):
+        return simulate_adaptive(f, sc.g, ActiveSetFilter(b, sc.V), X0, args.t_max,
+                                 done=sc.port_distance, safety=sc.h, rtol=rtol, atol=1e-12)
+
+    _, t_ref, X_ref, _ = adaptive(1e-11)
+
+    def report(name, t, X, evals, seconds):
+        err = np.abs(X - X_ref).max()
+        print(f"{name:>14} {evals:>10} {t[0]:>12.6f} {abs(t[0] - t_ref[0]):>10.2e} {err:>10.2e} {seconds:>8.2f}")
+
+    print(f"{'integrator':>14} {'rhs evals':>10} {'rendezvous':>12} {'|dt|':>10} {'|dx|':>10} {'seconds':>8}")
+    for rtol in args.rtols:
+        status, t, X, info = adaptive(rtol)
+        report(f"dopri5 {rtol:.0e}", t, X, info["rhs_evals"], info["seconds"])
+
+    status, t, X, info = simulate(f, sc.g, ActiveSetFilter(b, sc.V), X0, args.t_max, args.dt, done=sc.docked)
+    report(f"euler {args.dt:.0e}", t, X, info["trajectory_steps"], info["seconds"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Calls and states per second of the dynamics f of both examples: a plain
+Python loop over the states, the model's own numpy f, and the kernels of
+iccbf.kernels writing into a buffer (numpy out= and, if installed, numba).
+From the root of the repo:
+
+    python benchmarks/kernels.py
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import acc, kernels, spacecraft  # noqa: E402
+from lie_derivatives import acc_states, spacecraft_states, timed  # noqa: E402
+
+
+SYSTEMS = {
+    "acc": (acc.f, acc_states, kernels._acc_loop, kernels._acc_numpy, kernels.acc_f),
+    "spacecraft": (spacecraft.f, spacecraft_states, kernels._spacecraft_loop, kernels._spacecraft_numpy,
+                   kernels.spacecraft_f),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dynamics kernels against a per state loop")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    compiled = "numba" if kernels.numba is not None else "numpy"
+    print(f"{'system':>10} {'batch':>6} {'method':>8} {'calls/s':>10} {'states/s':>12} {'max diff':>10}")
+
+    for name, (f, states, loop, numpy_kernel, dynamics) in SYSTEMS.items():
+        for M in args.batch:
+            X = states(M, rng)
+            out = np.empty_like(X)
+            ref = f(X)
+            methods = {
+                "loop": lambda: loop(X, out),
+                "model": lambda: f(X),
+                "numpy": lambda: numpy_kernel(X, out),
+                compiled: lambda: dynamics(X, out),
+            }
+            for method, call in methods.items():
+                t, result = timed(call, args.repeat)
+                diff = np.max(np.abs(result - ref)) / np.max(np.abs(ref))
+                print(f"{name:>10} {M:>6} {method:>8} {1 / t:>10.0f} {M / t:>12.0f} {diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+b_i, L_f b_i and L_g b_i for every level, with each way of taking the
+gradients: Taylor mode (jet), nested duals (dual) and nested central
+differences (fd). From the root of the repo:
+
+    python benchmarks/lie_derivatives.py
+
+prints the time per call and the largest difference from the jet result.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, acc, spacecraft  # noqa: E402
+
+
+def acc_states(M, rng):
+    return np.column_stack([rng.uniform(50, 150, M), rng.uniform(10, 24, M)])
+
+
+def spacecraft_states(M, rng):
+    return np.column_stack([
+        rng.uniform(5e-3, 2e-2, M),
+        rng.uniform(-1e-3, 1e-3, M),
+        rng.uniform(-1e-4, 1e-4, M),
+        rng.uniform(-1e-4, 1e-4, M),
+        rng.uniform(-0.05, 0.05, M),
+    ])
+
+
+SYSTEMS = {
+    "acc": (acc, acc_states, 1e-3),
+    "spacecraft": (spacecraft, spacecraft_states, 1e-6),
+}
+
+# fd evaluates h on (2n+1)^(N+1) states per state, skip it above this many
+MAX_STENCIL = 2 * 10**7
+
+
+def timed(fn, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare the ways of taking nested Lie derivatives")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 3], help="values of N")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'system':>10} {'N':>2} {'batch':>6} {'method':>6} {'ms/call':>10} {'states/s':>10} {'max diff':>10}")
+
+    for name, (system, states, step) in SYSTEMS.items():
+        n = system.B.shape[0]
+        for N in args.levels:
+            # repeat the last gain for the levels beyond the paper's
+            alphas = (system.alphas + [system.alphas[-1]] * N)[:N + 1]
+            for M in args.batch:
+                X = states(M, rng)
+                ref = None
+                for method in ("jet", "dual", "fd"):
+                    if method == "fd" and M * (2 * n + 1) ** (N + 1) > MAX_STENCIL:
+                        continue
+                    b = ICCBF(system.f, system.g, system.h, alphas, system.U, step=step, method=method)
+                    t, out = timed(lambda: b.lie_levels(X), args.repeat)
+                    if ref is None:
+                        ref = out
+                    diff = max(np.max(np.abs(o - r) / (1 + np.abs(r))) for o, r in zip(out, ref))
+                    print(f"{name:>10} {N:>2} {M:>6} {method:>6} {t * 1e3:>10.2f} {M / t:>10.0f} {diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+h and V of the docking model with their gradients: the analytic, buffered
+spacecraft.LineOfSight against the automatic differentiation path (jets and
+duals through spacecraft.h and spacecraft.V). From the root of the repo:
+
+    python benchmarks/line_of_sight.py
+
+prints the time per call, the bytes allocated per call, and the largest
+difference from the jet gradient.
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import spacecraft as sc  # noqa: E402
+from iccbf.autodiff import Dual, Jet  # noqa: E402
+from lie_derivatives import spacecraft_states, timed  # noqa: E402
+
+
+def jet_gradient(fn):
+    def gradient(X):
+        b = fn(Jet.seed(X, 1))
+        return b.value, b.gradient()
+    return gradient
+
+
+def dual_gradient(fn):
+    def gradient(X):
+        b = fn(Dual.seed(X))
+        return b.v, b.d
+    return gradient
+
+
+def allocated(fn):
+    # peak bytes allocated by one call, after a warm up call
+    fn()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analytic against automatic gradients of h and V")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'fn':>3} {'batch':>6} {'method':>8} {'us/call':>10} {'states/s':>10} {'bytes':>10} {'max diff':>10}")
+
+    for name in ("h", "V"):
+        fn = getattr(sc, name)
+        for M in args.batch:
+            X = spacecraft_states(M, rng)
+            los = sc.LineOfSight(M)
+            value, grad = np.empty(M), np.empty((M, 5))
+            methods = {
+                "analytic": lambda: getattr(los, name + "_gradient")(X, value, grad),
+                "jet": lambda: jet_gradient(fn)(X),
+                "dual": lambda: dual_gradient(fn)(X),
+            }
+            ref = methods["jet"]()[1]
+            for method, call in methods.items():
+                t, out = timed(call, args.repeat)
+                diff = np.max(np.abs(out[1] - ref)) / np.max(np.abs(ref))
+                print(f"{name:>3} {M:>6} {method:>8} {t * 1e6:>10.1f} {M / t:>10.0f} {allocated(call):>10} {diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+The ACC's filter from a lookup table (iccbf.lookup) against solving it
+exactly (ScalarFilter): build time, size, the share of states the table
+answers, how far its u is from the exact one, the smallest
+bdot_2 + alpha_2(b_2) with its u, and the time per call. From the root of
+the repo:
+
+    python benchmarks/lookup.py
+    python benchmarks/lookup.py --margin 0.5 --max-level 6
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, ScalarFilter, acc  # noqa: E402
+from iccbf.lookup import build  # noqa: E402
+from lie_derivatives import timed  # noqa: E402
+
+
+BOUNDS = ([0, 0], [100, 24])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="the ACC filter from a lookup table against the exact solve")
+    parser.add_argument("--shape", type=int, nargs=2, default=[16, 16])
+    parser.add_argument("--max-level", type=int, default=5)
+    parser.add_argument("--margin", type=float, default=0.1)
+    parser.add_argument("--tol", type=float, default=1e-3)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    exact = ScalarFilter(b, acc.u_des)
+
+    start = time.perf_counter()
+    table = build(b, acc.u_des, BOUNDS, tuple(args.shape), args.max_level, args.margin, args.tol)
+    print(f"built in {time.perf_counter() - start:.1f} s: {table.nbytes / 1024:.0f} KB, "
+          f"{100 * table.coverage():.1f}% of the region tabulated")
+
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.uniform(0, 100, 100000), rng.uniform(0, 24, 100000)])
+    success, u = exact.solve(X)
+    table_success, table_u = table.solve(X)
+    answered = table.status == "table"
+    B, Lf, Lg = b.lie(X[answered])
+    condition = Lf + Lg[:, 0] * table_u[answered, 0] + b.alphas[-1](B)
+    print(f"feasible states answered by the table: {100 * np.sum(answered) / np.sum(success):.1f}%")
+    print(f"same success everywhere: {np.array_equal(success, table_success)}, "
+          f"max |u - u_exact| {np.abs(table_u - u)[success].max():.2g}, "
+          f"min bdot_2 + alpha_2(b_2) with the table's u {condition.min():.3g}")
+
+    # feasible states of the region
+    feasible = X[success]
+    print(f"{'batch':>6} {'table us':>10} {'exact us':>10} {'fallback':>9}")
+    for M in args.batch:
+        Y = feasible[rng.choice(len(feasible), M)]
+        t_table, _ = timed(lambda: table.solve(Y), args.repeat)
+        t_exact, _ = timed(lambda: exact.solve(Y), args.repeat)
+        print(f"{M:>6} {1e6 * t_table:>10.1f} {1e6 * t_exact:>10.1f} {table.info['fallback']:>9}")
+
+
+if __name__ == "__main__":
+    main()
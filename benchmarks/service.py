@@ -0,0 +1,110 @@
+"""
+Throughput and latency of the safety filter service (iccbf.service) as the
+number of clients grows, against calling the docking controller in process
+one state at a time. Each client sends one state, waits for its u, and sends
+the next. From the root of the repo:
+
+    python benchmarks/service.py
+    python benchmarks/service.py --clients 1 8 64 --window 1e-3
+
+With --serve it only runs the service, for clients in other processes:
+
+    python benchmarks/service.py --serve --port 8765
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, ActiveSetFilter, spacecraft as sc  # noqa: E402
+from iccbf.service import FilterClient, FilterService, _percentiles  # noqa: E402
+from ensemble import initial_states  # noqa: E402
+
+
+def controller():
+    return ActiveSetFilter(ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U), sc.V)
+
+
+def in_process(requests, rng):
+    c = controller()
+    X = initial_states(requests, rng)
+    c.solve(X[:1])
+    latency = []
+    start = time.perf_counter()
+    for x in X:
+        t = time.perf_counter()
+        c.solve(x[None])
+        latency.append(time.perf_counter() - t)
+    return requests / (time.perf_counter() - start), _percentiles(latency)
+
+
+async def clients(host, port, K, requests, rng):
+    # K clients in lockstep with the service, each timing its own requests
+    X = initial_states(K * requests, rng).reshape(K, requests, -1)
+    connections = [await FilterClient.connect(host, port) for _ in range(K)]
+    latency = []
+
+    async def run(client, states):
+        for x in states:
+            t = time.perf_counter()
+            await client.solve(x)
+            latency.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(c, x) for c, x in zip(connections, X)))
+    seconds = time.perf_counter() - start
+    stats = await connections[0].stats()
+    for c in connections:
+        await c.close()
+    return K * requests / seconds, _percentiles(latency), stats
+
+
+async def compare(args):
+    service = FilterService(controller(), 5, window=args.window)
+    ready = asyncio.get_running_loop().create_future()
+    server = asyncio.create_task(service.serve("127.0.0.1", 0, ready=ready))
+    host, port = await ready
+
+    rng = np.random.default_rng(0)
+    rate, p = in_process(args.requests, rng)
+    print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'batch':>7}")
+    print(f"{'local':>8} {rate:>10.0f} {p['p50']:>8.3f} {p['p99']:>8.3f} {1:>7.1f}")
+
+    for K in args.clients:
+        before = service.stats()
+        rate, p, stats = await clients(host, port, K, args.requests, rng)
+        batch = (stats["states"] - before["states"]) / max(stats["batches"] - before["batches"], 1)
+        print(f"{K:>8} {rate:>10.0f} {p['p50']:>8.3f} {p['p99']:>8.3f} {batch:>7.1f}")
+
+    server.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="the safety filter service against in process calls")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="per client")
+    parser.add_argument("--window", type=float, default=5e-4, help="seconds to wait to fill a batch")
+    parser.add_argument("--serve", action="store_true", help="only run the service")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.serve:
+        service = FilterService(controller(), 5, window=args.window)
+        print(f"serving on 127.0.0.1:{args.port}")
+        try:
+            asyncio.run(service.serve("127.0.0.1", args.port))
+        except KeyboardInterrupt:
+            print(service.stats())
+        return
+
+    asyncio.run(compare(args))
+
+
+if __name__ == "__main__":
+    main()
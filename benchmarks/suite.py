@@ -0,0 +1,187 @@
+"""
+The benchmark suite: the hot paths of the controllers, the construction, the
+simulations, the sets and the slides, each reduced to a few numbers, checked
+against a JSON baseline. From the root of the repo:
+
+    python benchmarks/suite.py --save           # write benchmarks/baseline.json
+    python benchmarks/suite.py                  # compare with it
+    python benchmarks/suite.py --only filter levels --threshold 0.1
+
+A metric regresses if it is worse than the baseline by more than the
+threshold (a fraction, 0.25 by default); the run then exits with status 1.
+Timings are the best of --repeat runs. Baselines are per machine: the
+machine they were taken on is saved with them.
+
+    filter      safety filter solve latency, one state and per state of a batch
+    levels      b_N throughput for N = 0 ... 3
+    simulate    ensemble simulation trajectory steps per second
+    sets        set grid evaluation and boundary refinement time
+    render      low quality render time of two scenes (needs manim)
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from iccbf import ICCBF, ActiveSetFilter, SafetyFilter, ScalarFilter, acc, spacecraft as sc  # noqa: E402
+from iccbf.sets import evaluate, refine  # noqa: E402
+from iccbf.simulate import simulate  # noqa: E402
+from ensemble import initial_states  # noqa: E402
+from lie_derivatives import acc_states, spacecraft_states, timed  # noqa: E402
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SLIDES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "slides")
+SCENES = ["BackgroundSlide_CBFs", "FormalConstruction"]
+
+
+def metric(value, unit, better):
+    return dict(value=float(value), unit=unit, better=better)
+
+
+def bench_filter(repeat):
+    rng = np.random.default_rng(0)
+    b = ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U)
+    out = {}
+    for name, controller in (("active_set", ActiveSetFilter(b, sc.V)), ("osqp", SafetyFilter(b, sc.V))):
+        for K in (1, 64):
+            X = initial_states(K, rng)
+            controller.solve(X)  # set up and warm start
+            t, _ = timed(lambda: controller.solve(X), repeat)
+            label = "single" if K == 1 else f"batch{K}"
+            out[f"filter.{name}.{label}"] = metric(1e3 * t / K, "ms/state", "lower")
+
+    controller = ScalarFilter(ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U), acc.u_des)
+    for K in (1, 64):
+        X = acc_states(K, rng)
+        t, _ = timed(lambda: controller.solve(X), repeat)
+        out[f"filter.acc_scalar.{'single' if K == 1 else f'batch{K}'}"] = metric(1e3 * t / K, "ms/state", "lower")
+    return out
+
+
+def bench_levels(repeat, M=10000):
+    rng = np.random.default_rng(0)
+    out = {}
+    for name, system, states in (("acc", acc, acc_states), ("spacecraft", sc, spacecraft_states)):
+        X = states(M, rng)
+        for N in range(4):
+            alphas = (system.alphas + [system.alphas[-1]] * N)[:N + 1]
+            b = ICCBF(system.f, system.g, system.h, alphas, system.U)
+            t, _ = timed(lambda: b.levels(X), repeat)
+            out[f"levels.{name}.N{N}"] = metric(M / t, "states/s", "higher")
+    return out
+
+
+def bench_simulate(repeat, K=64, steps=50, dt=1e-3):
+    rng = np.random.default_rng(0)
+    b = ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U)
+    X0 = initial_states(K, rng)
+    rates = []
+    for _ in range(repeat):
+        info = simulate(sc.f, sc.g, ActiveSetFilter(b, sc.V), X0, steps * dt, dt, done=sc.docked)[3]
+        rates.append(info["rate"])
+    return {"simulate.docking.active_set": metric(max(rates), "traj steps/s", "higher")}
+
+
+def bench_sets(repeat):
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    t_grid, _ = timed(lambda: evaluate(b, [0, 100], [0, 24], (512, 512)), repeat)
+    t_refine, _ = timed(lambda: refine(b, [0, 100], [0, 24], resolution=1024), repeat)
+    return {
+        "sets.acc.grid512": metric(t_grid, "s", "lower"),
+        "sets.acc.refine1024": metric(t_refine, "s", "lower"),
+    }
+
+
+def bench_render(repeat):
+    if importlib.util.find_spec("manim") is None:
+        print("render: manim is not installed, skipped")
+        return {}
+    out = {}
+    for scene in SCENES:
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(["manim", "-ql", "--disable_caching", "-v", "WARNING", "--progress_bar", "none",
+                            "slides2.py", scene], cwd=SLIDES, check=True)
+            best = min(best, time.perf_counter() - start)
+        out[f"render.{scene}"] = metric(best, "s", "lower")
+    return out
+
+
+BENCHMARKS = {
+    "filter": bench_filter,
+    "levels": bench_levels,
+    "simulate": bench_simulate,
+    "sets": bench_sets,
+    "render": bench_render,
+}
+
+
+def machine():
+    return dict(platform=platform.platform(), processor=platform.processor(), cpus=os.cpu_count(),
+                python=platform.python_version(), numpy=np.__version__)
+
+
+def compare(results, baseline, threshold):
+    # prints every metric against the baseline, returns the regressed ones
+    regressed = []
+    print(f"{'metric':<36} {'value':>12} {'baseline':>12} {'change':>8}  unit")
+    for name, m in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36} {m['value']:>12.4g} {'':>12} {'new':>8}  {m['unit']}")
+            continue
+        change = m["value"] / base["value"] - 1
+        worse = -change if m["better"] == "higher" else change
+        flag = "  REGRESSED" if worse > threshold else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<36} {m['value']:>12.4g} {base['value']:>12.4g} {100 * change:>+7.1f}%  {m['unit']}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run the benchmark suite against a baseline")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only:
+        results.update(BENCHMARKS[name](args.repeat))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved["metrics"]
+        if saved["machine"] != machine():
+            print(f"note: the baseline was taken on another machine ({saved['machine']['platform']})")
+
+    regressed = compare(results, baseline, args.threshold)
+
+    if args.save:
+        # keep the baseline's other metrics when running part of the suite
+        with open(args.baseline, "w") as f:
+            json.dump(dict(machine=machine(), metrics={**baseline, **results}), f, indent=2)
+        print(f"saved {args.baseline}")
+    elif regressed:
+        print(f"{len(regressed)} metrics regressed by more than {100 * args.threshold:.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
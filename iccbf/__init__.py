@@ -0,0 +1,8 @@
+"""
+Input constrained control barrier functions in Python.
+"""
+
+from .activeset import ActiveSetFilter, ClippedCBFQP, ScalarFilter, scalar_filter
+from .construction import ICCBF, Analytic, Linear, Root, jet_seed, jet_step, lie
+from .filter import SafetyFilter
+from .inputs import Box, L1Ball
@@ -0,0 +1,73 @@
+"""
+Adaptive cruise control example, as in adaptive_cruise_control/ACC_example_detailed.nb
+
+states:
+    x[0] - distance to the car in front [m]
+    x[1] - velocity of the following car [m/s]
+
+control input:
+    u[0] - acceleration of the following car [g]
+
+The notebook's run starts from x0 = [100, 20] and lasts 20 s.
+"""
+
+import numpy as np
+
+from .construction import Linear, Root
+from .inputs import Box
+
+
+m = 1650.0   # mass [kg]
+f0 = 0.1     # resistive force coefficients: F(v) = f0 + f1 v + f2 v^2
+f1 = 5.0
+f2 = 0.25
+v0 = 13.89   # velocity of the car in front [m/s]
+vmax = 24.0
+g0 = 9.81
+
+umax = 0.25
+U = Box(-umax, umax)
+
+x0 = np.array([100.0, 20.0])
+t_max = 20.0
+
+# control matrix
+B = np.array([[0.0], [g0]])
+
+
+def f(X):
+    v = X[:, 1]
+    F = f0 + f1 * v + f2 * v**2
+    return np.stack([v0 - v, -F / m], axis=-1)
+
+
+def g(X):
+    # constant
+    return B
+
+
+def h(X):
+    # safe if d >= 1.8 v
+    return X[:, 0] - 1.8 * X[:, 1]
+
+
+def V(X):
+    # drive at vmax
+    return (X[:, 1] - vmax)**2
+
+
+def u_des(X):
+    # the u with L_f V + L_g V u = -10 V, the desired input of the ICCBF-QP
+    v = X[:, 1]
+    F = f0 + f1 * v + f2 * v**2
+    return (F / m - 5 * (v - vmax)) / g0
+
+
+def class_k(k0=4.0, k1=7.0, k2=2.0):
+    # alpha_0(r) = k0 r, alpha_1(r) = k1 sqrt(r) and alpha_2(r) = k2 r
+    return [Linear(k0), Root(k1), Linear(k2)]
+
+
+# class K functions used in the paper: b_1 = ... + 4 b_0, b_2 = ... + 7 sqrt(b_1)
+# and the controller enforces bdot_2 >= -2 b_2
+alphas = class_k()
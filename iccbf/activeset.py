@@ -0,0 +1,264 @@
+"""
+Exact solvers for the tiny controller QPs, for thousands of states at once.
+
+scalar_filter
+    the ICCBF-QP of the adaptive cruise control example,
+    argmin (u - ud)^2 s.t. |u| <= umax, L_f b_N + L_g b_N u >= -alpha_N(b_N),
+    which for a scalar u is a clip to an interval. ScalarFilter wraps it as a
+    controller, and ClippedCBFQP is the example's clipped CLF-CBF-QP.
+
+ActiveSetFilter
+    the docking QP of SafetyFilter. The slacks only enter one row each, so
+    they can be eliminated:
+
+        min 1/2 |u|^2 + w_δ max(0, L_g V u + c V + L_f V)
+                      + (w_k / b) max(0, -(L_g b u + L_f b + alpha(b)))
+
+    over u in U (with the last term a hard constraint when b <= 0). The
+    minimiser is the minimiser of 1/2 |u|^2 + l.u on some affine set E u = e,
+    where each hinge is off, on (adding to l) or at its kink (a row of E),
+    and each row of U is free or at one of its bounds. All such active sets
+    are enumerated, and the feasible candidate with the lowest cost wins.
+    With m equalities u is fixed whatever the hinges, so those sets are only
+    tried once.
+"""
+
+from itertools import combinations, product
+
+import numpy as np
+
+from .construction import lie
+from .filter import SafetyFilter
+
+
+# constraint violation allowed in a candidate, relative to the row's scale
+TOL = 1e-9
+
+
+def clip(u_des, a, r, lo, hi):
+    """
+    argmin (u - u_des)^2 s.t. a u >= r, lo <= u <= hi, for arrays of scalar
+    problems. Returns (success, u). When the problem is infeasible, u is the
+    bound that comes closest to a u >= r.
+    """
+    u_des, a, r = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (u_des, a, r)])
+    lo = np.broadcast_to(lo, u_des.shape).astype(float)
+    hi = np.broadcast_to(hi, u_des.shape).astype(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = r / a
+    lower = np.where(a > 0, np.maximum(lo, bound), lo)
+    upper = np.where(a < 0, np.minimum(hi, bound), hi)
+
+    success = (lower <= upper + TOL * (1 + np.abs(upper))) & ((a != 0) | (r <= 0))
+    u = np.clip(u_des, lower, np.maximum(lower, upper))
+    u = np.where(success, u, np.where(a < 0, lo, hi))
+    return success, u
+
+
+def scalar_filter(b, X, u_des):
+    """
+    The ICCBF-QP for a scalar input: u closest to u_des (M,) with
+    L_f b_N + L_g b_N u >= -alpha_N(b_N) and u in the Box b.U. Returns
+    (success, u) with shapes (M,) and (M,).
+    """
+    B, Lf, Lg = b.lie(X)
+    return clip(u_des, Lg[:, 0], -(Lf + b.alphas[-1](B)), b.U.lo[0], b.U.hi[0])
+
+
+class ScalarFilter:
+    """
+    scalar_filter as a controller for simulate, with u_des(X) -> (M,) the
+    desired input (e.g. acc.u_des).
+    """
+
+    def __init__(self, b, u_des):
+        self.b = b
+        self.u_des = u_des
+
+    def solve(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        success, u = scalar_filter(self.b, X, self.u_des(X))
+        return success, u[:, None]
+
+
+class ClippedCBFQP:
+    """
+    The CLF-CBF-QP of the ACC example, for a scalar input, with h in place
+    of an ICCBF, clipped to the Box U afterwards:
+
+        argmin u^2 + weight δ  s.t.  L_f V + L_g V u <= -clf_rate V + δ,
+                                     L_f h + L_g h u >= -rate h,  δ >= 0
+
+    Its solution can leave U, so the clipped u can break the h condition,
+    which is what the example shows.
+    """
+
+    def __init__(self, f, g, h, V, U, rate=2.0, clf_rate=10.0, weight=0.1):
+        self.f = f
+        self.g = g
+        self.h = h
+        self.V = V
+        self.U = U
+        self.rate = rate
+        self.clf_rate = clf_rate
+        self.weight = weight
+
+    def solve(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        V, LfV, LgV = lie(self.V, self.f, self.g, X)
+        h, Lfh, Lgh = lie(self.h, self.f, self.g, X)
+        p, q = LgV[:, 0], LfV + self.clf_rate * V
+
+        # with δ eliminated the cost is u^2 + weight max(0, p u + q): its
+        # minimiser is 0, the minimiser with the hinge on, or the kink
+        on = -self.weight * p / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kink = np.where(p != 0, -q / p, 0.0)
+        u = np.where(q <= 0, 0.0, np.where(p * on + q >= 0, on, kink))
+
+        # a convex function of a scalar: the constrained minimiser is the
+        # projection onto the feasible half line
+        success, u = clip(u, Lgh[:, 0], -(Lfh + self.rate * h), -np.inf, np.inf)
+        return success, np.clip(u, self.U.lo[0], self.U.hi[0])[:, None]
+
+
+def _candidates(m, rows):
+    # every active set with at most m equalities: the state of each of the 2
+    # hinges (0 off, 1 on, 2 at its kink) and the rows of U at a bound,
+    # as indices into [kink 1, kink 2, U rows at lo..., U rows at hi...]
+    groups = {}
+    for hinges in product((0, 1, 2), repeat=2):
+        kinks = [j for j in range(2) if hinges[j] == 2]
+        for k in range(m - len(kinks) + 1):
+            for active in combinations(range(rows), k):
+                for sides in product((0, 1), repeat=k):
+                    eq = kinks + [2 + i + rows * s for i, s in zip(active, sides)]
+                    # with m equalities the hinges do not move u
+                    on = (False, False) if len(eq) == m else tuple(hinges[j] == 1 for j in range(2))
+                    candidates = groups.setdefault(len(eq), [])
+                    if (eq, on) not in candidates:
+                        candidates.append((eq, on))
+    return {k: (np.array([eq for eq, _ in c], dtype=int).reshape(len(c), k), np.array([on for _, on in c], dtype=float))
+            for k, c in groups.items()}
+
+
+def _affine(u, E, rhs):
+    # the point of E u = rhs nearest to each u, for stacks of k x m systems E,
+    # in closed form for k = 1 and 2; ok is False where E is singular
+    k = E.shape[-2]
+    r = rhs - np.einsum("...ij,...j->...i", E, u)
+    if k == 1:
+        e = E[..., 0, :]
+        a = np.sum(e * e, axis=-1)
+        ok = a > 0
+        return u + (r[..., 0] / np.where(ok, a, 1.0))[..., None] * e, ok
+    if k == 2:
+        e1, e2 = E[..., 0, :], E[..., 1, :]
+        a, b, c = np.sum(e1 * e1, axis=-1), np.sum(e1 * e2, axis=-1), np.sum(e2 * e2, axis=-1)
+        det = a * c - b * b
+        ok = np.abs(det) > 1e-12 * a * c
+        det = np.where(ok, det, 1.0)
+        l1 = (c * r[..., 0] - b * r[..., 1]) / det
+        l2 = (a * r[..., 1] - b * r[..., 0]) / det
+        return u + l1[..., None] * e1 + l2[..., None] * e2, ok
+    gram = E @ np.swapaxes(E, -1, -2)
+    det = np.linalg.det(gram)
+    ok = np.abs(det) > 1e-12 * np.prod(np.diagonal(gram, axis1=-2, axis2=-1), axis=-1)
+    gram[~ok] = np.eye(k)
+    lam = np.linalg.solve(gram, r[..., None])
+    return u + (np.swapaxes(E, -1, -2) @ lam)[..., 0], ok
+
+
+class ActiveSetFilter:
+    """
+    The same controller as SafetyFilter, solved exactly. States it cannot
+    decide (no candidate passes when the QP should be feasible, or the data
+    is not finite) go to a SafetyFilter with the given OSQP settings.
+
+        controller = ActiveSetFilter(ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U), sc.V)
+        success, U = controller.solve(X)
+    """
+
+    def __init__(self, b, V, clf_rate=0.1, weights=(10.0, 50.0), **settings):
+        self.b = b
+        self.V = V
+        self.clf_rate = clf_rate
+        self.weights = weights
+        self.settings = settings
+
+        self.m = b.U.m
+        self.AU, self.loU, self.hiU = b.U.rows()
+        self._groups = _candidates(self.m, len(self.AU))
+
+        self.fallback = None
+        self.status = None
+        self.info = None
+
+    def solve(self, X):
+        """
+        u for every state X (M, n): returns (success, U) with shapes (M,) and
+        (M, m), like feedback!. Per state status is left in self.status:
+        "solved" or "infeasible", and self.info counts the states that went
+        to OSQP.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        M, m, r = len(X), self.m, len(self.AU)
+
+        V, LfV, LgV = lie(self.V, self.b.f, self.b.g, X)
+        b, Lfb, Lgb = self.b.lie(X)
+
+        # hinges w max(0, H u + h0): CLF, then ICCBF (hard when b <= 0)
+        H = np.stack([LgV, -Lgb], axis=1)
+        h0 = np.stack([self.clf_rate * V + LfV, -(Lfb + self.b.alphas[-1](b))], axis=1)
+        with np.errstate(divide="ignore"):
+            w = np.stack([np.full(M, self.weights[0]), np.where(b > 0, self.weights[1] / b, np.inf)], axis=1)
+        hard = ~np.isfinite(w[:, 1])
+        soft = np.where(np.isfinite(w), w, 0.0)
+
+        # every row that can be an equality, as G u = e
+        G = np.concatenate([H, np.broadcast_to(self.AU, (M, r, m)), np.broadcast_to(self.AU, (M, r, m))], axis=1)
+        e = np.concatenate([-h0, np.broadcast_to(self.loU, (M, r)), np.broadcast_to(self.hiU, (M, r))], axis=1)
+
+        best = np.full(M, np.inf)
+        U = np.zeros((M, m))
+        for k, (eq, on) in self._groups.items():
+            # linear term of each candidate: the hinges that are on
+            l = np.tensordot(on, soft[..., None] * H, axes=([1], [1]))
+            u = -l
+
+            if k > 0:
+                u, ok = _affine(u, G[:, eq].transpose(1, 0, 2, 3), e[:, eq].transpose(1, 0, 2))
+            else:
+                ok = np.ones(u.shape[:2], dtype=bool)
+
+            # feasible in U, and for the hard ICCBF row
+            Au = u @ self.AU.T
+            ok &= np.all((Au >= self.loU - TOL * (1 + np.abs(self.loU))) & (Au <= self.hiU + TOL * (1 + np.abs(self.hiU))), axis=-1)
+            g = (u[..., None, :] @ H.transpose(0, 2, 1))[..., 0, :] + h0
+            ok &= ~(hard & (g[..., 1] > TOL * (1 + np.abs(h0[:, 1]))))
+
+            cost = 0.5 * np.sum(u * u, axis=-1) + np.sum(soft * np.maximum(g, 0), axis=-1)
+            cost = np.where(ok, cost, np.inf)
+
+            i = np.argmin(cost, axis=0)
+            c = cost[i, np.arange(M)]
+            better = c < best
+            best[better] = c[better]
+            U[better] = u[i, np.arange(M)][better]
+
+        feasible = (b > 0) | (Lfb + self.b.U.sup(Lgb) + self.b.alphas[-1](b) >= 0)
+        finite = np.isfinite(H).all(axis=(1, 2)) & np.isfinite(h0).all(axis=1)
+        undecided = ~finite | (feasible & ~np.isfinite(best))
+
+        success = np.isfinite(best)
+        U[~success] = 0
+
+        if undecided.any():
+            if self.fallback is None:
+                self.fallback = SafetyFilter(self.b, self.V, self.clf_rate, self.weights, **self.settings)
+            success[undecided], U[undecided] = self.fallback.solve(X[undecided])
+
+        self.status = np.where(success, "solved", "infeasible").astype(object)
+        self.info = dict(fallback=int(undecided.sum()))
+        return success, U
@@ -0,0 +1,632 @@
+"""
+Forward mode automatic differentiation, batched over states.
+
+Jet
+    truncated multivariate Taylor polynomial of order K in n variables. Seeding
+    x = X + e_j gives every partial derivative of a function up to order K in
+    one evaluation, with each distinct (symmetric) derivative stored once.
+
+Dual
+    first order dual numbers, which can be nested (like ForwardDiff.jl's
+    nested gradients in docking.jl). Kept as the reference to compare against.
+
+Both work through numpy: functions written with numpy ufuncs, indexing,
+np.stack, np.sum and np.max / np.min run unchanged on either.
+
+Duals can also be taken of interval.Intervals: the branches of abs, max and
+min that cannot be decided over a box take the hull of both sides.
+"""
+
+from functools import lru_cache
+from itertools import combinations_with_replacement
+from math import factorial
+
+import numpy as np
+
+from .interval import Interval
+
+
+@lru_cache(maxsize=None)
+def _basis(n, K):
+    # exponents of all monomials in n variables of degree <= K, graded, so
+    # the monomials of a lower order are a prefix of the list
+    exps = []
+    for k in range(K + 1):
+        for vars_ in combinations_with_replacement(range(n), k):
+            e = [0] * n
+            for v in vars_:
+                e[v] += 1
+            exps.append(tuple(e))
+    return exps
+
+
+@lru_cache(maxsize=None)
+def _index(n, K):
+    return {e: i for i, e in enumerate(_basis(n, K))}
+
+
+@lru_cache(maxsize=None)
+def _size(n, K):
+    return len(_basis(n, K))
+
+
+@lru_cache(maxsize=None)
+def _product(n, K):
+    # for each monomial i: its degree, and the index of its product with
+    # every monomial j of degree <= K - deg(i) (a prefix of the basis)
+    exps, index = _basis(n, K), _index(n, K)
+    table = []
+    for a in exps:
+        d = sum(a)
+        rest = exps[:_size(n, K - d)]
+        table.append((d, np.array([index[tuple(x + y for x, y in zip(a, b))] for b in rest])))
+    return table
+
+
+@lru_cache(maxsize=None)
+def _pairs(n, K, da, db):
+    # the same products as pairs (i, j) with deg(i) <= da, deg(j) <= db, and
+    # a 0/1 matrix summing each pair into its product's coefficient
+    I, J, T = [], [], []
+    for i, (d, targets) in enumerate(_product(n, K)):
+        if d > da:
+            break
+        s = _size(n, min(db, K - d))
+        I.extend([i] * s)
+        J.extend(range(s))
+        T.extend(targets[:s])
+    S = np.zeros((_size(n, K), len(I)))
+    S[T, np.arange(len(I))] = 1
+    return np.array(I), np.array(J), S
+
+
+# below this many columns (batch size x shape), products go through one
+# gather and matmul instead of a loop over monomials
+_SMALL = 256
+
+
+@lru_cache(maxsize=None)
+def _derivative(n, K, v):
+    # d/dx_v takes the coefficient of x^(e + e_v) (times e_v + 1) to x^e
+    index = _index(n, K)
+    src, factor = [], []
+    for e in _basis(n, K - 1):
+        up = list(e)
+        up[v] += 1
+        src.append(index[tuple(up)])
+        factor.append(up[v])
+    return np.array(src), np.array(factor, dtype=float)
+
+
+class Jet:
+    """
+    Taylor polynomial sum_e c_e (x - X)^e, stored by coefficient: c has shape
+    (C, *shape), one row per monomial of degree <= K in n variables.
+
+    deg is the highest degree that can be nonzero (0 for constants, 1 for the
+    seeded states), so products of low degree jets skip the zero terms.
+    """
+
+    def __init__(self, c, n, K, deg=None):
+        self.c = c
+        self.n = n
+        self.K = K
+        self.deg = K if deg is None else min(deg, K)
+
+    @classmethod
+    def seed(cls, X, K):
+        # the jet of x itself at the states X (M, n)
+        X = np.asarray(X, dtype=float)
+        n = X.shape[-1]
+        c = np.zeros((_size(n, K),) + X.shape)
+        c[0] = X
+        if K > 0:
+            c[1:n + 1] = np.eye(n).reshape((n,) + (1,) * (X.ndim - 1) + (n,))
+        return cls(c, n, K, 1)
+
+    def _new(self, c, deg=None):
+        return Jet(c, self.n, self.K, self.deg if deg is None else deg)
+
+    @property
+    def value(self):
+        return self.c[0]
+
+    @property
+    def shape(self):
+        return self.c.shape[1:]
+
+    @property
+    def ndim(self):
+        return self.c.ndim - 1
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        return self._new(self.c[(slice(None),) + key])
+
+    def __repr__(self):
+        return f"Jet(value={self.value!r}, n={self.n}, K={self.K})"
+
+    def truncate(self, K):
+        # the same polynomial, dropping the terms of degree > K
+        return Jet(self.c[:_size(self.n, K)], self.n, K, self.deg)
+
+    def derivative(self, v):
+        # d/dx_v, a jet of one order less
+        src, factor = _derivative(self.n, self.K, v)
+        c = self.c[src] * factor.reshape((-1,) + (1,) * self.ndim)
+        return Jet(c, self.n, self.K - 1, max(self.deg - 1, 0))
+
+    def gradient(self):
+        # the first derivatives at X, shape (*shape, n)
+        return np.moveaxis(self.c[1:self.n + 1], 0, -1)
+
+    def _lift(self, x):
+        # a constant as a jet
+        if isinstance(x, Jet):
+            return x
+        x = np.asarray(x, dtype=float)
+        c = np.zeros((_size(self.n, self.K),) + x.shape)
+        c[0] = x
+        return self._new(c, 0)
+
+    # arithmetic
+
+    def _mul(self, other):
+        if not isinstance(other, Jet):
+            return self._new(self.c * np.asarray(other, dtype=float))
+
+        a, b = self, other
+        if a.deg > b.deg:
+            a, b = b, a
+        shape = np.broadcast_shapes(a.shape, b.shape)
+
+        if np.prod(shape, dtype=int) <= _SMALL:
+            I, J, S = _pairs(self.n, self.K, a.deg, b.deg)
+            out = np.tensordot(S, a.c[I] * b.c[J], axes=1)
+            return self._new(np.broadcast_to(out, out.shape[:1] + shape), a.deg + b.deg)
+
+        # every monomial i of a times the monomials of b that stay in order
+        out = np.zeros((_size(self.n, self.K),) + shape)
+        for i, (d, targets) in enumerate(_product(self.n, self.K)):
+            if d > a.deg:
+                break
+            s = _size(self.n, min(b.deg, self.K - d))
+            out[targets[:s]] += a.c[i] * b.c[:s]
+        return self._new(out, a.deg + b.deg)
+
+    def _compose(self, derivs):
+        # phi(self) from phi and its derivatives at the value: derivs[k] is
+        # phi^(k)(value), and phi(a + d) = sum_k phi^(k)(a) / k! d^k
+        out = self._new(np.zeros_like(self.c), 0)
+        out.c[0] = derivs[0]
+        if self.deg == 0:
+            return out
+
+        d = self._new(self.c.copy())
+        d.c[0] = 0
+        power = None
+        for k in range(1, self.K + 1):
+            power = d if power is None else power._mul(d)
+            out.c += power.c * (derivs[k] / factorial(k))
+        out.deg = self.K
+        return out
+
+    def _pow(self, p):
+        if float(p).is_integer() and 0 <= p <= 4:
+            out = self._lift(np.ones(self.shape))
+            for _ in range(int(p)):
+                out = out._mul(self)
+            return out
+        a = self.value
+        derivs, coef = [], 1.0
+        for k in range(self.K + 1):
+            derivs.append(coef * a ** (p - k))
+            coef *= p - k
+        return self._compose(derivs)
+
+    def _reciprocal(self):
+        a = self.value
+        return self._compose([(-1) ** k * factorial(k) / a ** (k + 1) for k in range(self.K + 1)])
+
+    def _select(self, other, take_self):
+        # elementwise choice between the coefficients of two jets
+        other = self._lift(other)
+        return self._new(np.where(take_self, self.c, other.c), max(self.deg, other.deg))
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs.get("out") is not None:
+            return NotImplemented
+
+        jets = [x for x in inputs if isinstance(x, Jet)]
+        ref = jets[0]
+        if any(j.n != ref.n or j.K != ref.K for j in jets):
+            raise ValueError("cannot mix jets of different sizes or orders")
+
+        if ufunc in _UNARY and len(inputs) == 1:
+            return _UNARY[ufunc](ref)
+
+        a, b = inputs
+        if ufunc is np.add:
+            if isinstance(a, Jet) and isinstance(b, Jet):
+                return ref._new(a.c + b.c, max(a.deg, b.deg))
+            x, y = (a, b) if isinstance(a, Jet) else (b, a)
+            shape = np.broadcast_shapes(x.shape, np.shape(y))
+            c = np.broadcast_to(x.c, x.c.shape[:1] + shape).copy()
+            c[0] += y
+            return x._new(c)
+        if ufunc is np.subtract:
+            return np.add(a, np.negative(b))
+        if ufunc is np.multiply:
+            return a._mul(b) if isinstance(a, Jet) else b._mul(a)
+        if ufunc is np.true_divide:
+            if isinstance(b, Jet):
+                return np.multiply(a, b._reciprocal())
+            return a._mul(1.0 / np.asarray(b, dtype=float))
+        if ufunc is np.power:
+            if isinstance(b, Jet):
+                return np.exp(np.multiply(b, np.log(a)))
+            return a._pow(b)
+        if ufunc in (np.maximum, np.minimum):
+            x, y = (a, b) if isinstance(a, Jet) else (b, a)
+            yv = y.value if isinstance(y, Jet) else y
+            op = np.greater_equal if ufunc is np.maximum else np.less_equal
+            return x._select(y, op(x.value, yv))
+        if ufunc in _COMPARE:
+            return ufunc(*[x.value if isinstance(x, Jet) else x for x in inputs])
+
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func in _FUNCTIONS:
+            return _FUNCTIONS[func](*args, **kwargs)
+        return NotImplemented
+
+    def __add__(self, other): return np.add(self, other)
+    def __radd__(self, other): return np.add(other, self)
+    def __sub__(self, other): return np.subtract(self, other)
+    def __rsub__(self, other): return np.subtract(other, self)
+    def __mul__(self, other): return np.multiply(self, other)
+    def __rmul__(self, other): return np.multiply(other, self)
+    def __truediv__(self, other): return np.true_divide(self, other)
+    def __rtruediv__(self, other): return np.true_divide(other, self)
+    def __pow__(self, other): return np.power(self, other)
+    def __neg__(self): return np.negative(self)
+    def __pos__(self): return self
+    def __abs__(self): return np.absolute(self)
+
+
+def _sin_cos_derivs(a, K, phase):
+    # derivatives of sin (phase 0) or cos (phase 1) at a
+    cycle = [np.sin(a), np.cos(a), -np.sin(a), -np.cos(a)]
+    return [cycle[(k + phase) % 4] for k in range(K + 1)]
+
+
+_UNARY = {
+    np.negative: lambda x: x._new(-x.c),
+    np.positive: lambda x: x,
+    np.square: lambda x: x._mul(x),
+    np.sqrt: lambda x: x._pow(0.5),
+    np.reciprocal: lambda x: x._reciprocal(),
+    np.exp: lambda x: x._compose([np.exp(x.value)] * (x.K + 1)),
+    np.log: lambda x: x._compose([np.log(x.value)] + [(-1) ** (k - 1) * factorial(k - 1) / x.value ** k for k in range(1, x.K + 1)]),
+    np.sin: lambda x: x._compose(_sin_cos_derivs(x.value, x.K, 0)),
+    np.cos: lambda x: x._compose(_sin_cos_derivs(x.value, x.K, 1)),
+    # piecewise: the derivatives of the branch at the value
+    np.absolute: lambda x: x._mul(np.where(x.value >= 0, 1.0, -1.0)),
+    np.sign: lambda x: x._lift(np.sign(x.value)),
+}
+
+_COMPARE = {np.greater, np.greater_equal, np.less, np.less_equal, np.equal, np.not_equal}
+
+
+def _jets(arrays):
+    ref = next(a for a in arrays if isinstance(a, Jet))
+    jets = [a if isinstance(a, Jet) else ref._lift(a) for a in arrays]
+    return ref, jets, max(j.deg for j in jets)
+
+
+def _axis(axis):
+    # axis of the coefficient array for an axis of the value
+    return axis + 1 if axis >= 0 else axis
+
+
+def _stack(arrays, axis=0):
+    ref, jets, deg = _jets(list(arrays))
+    shape = np.broadcast_shapes(*[j.c.shape for j in jets])
+    return ref._new(np.stack([np.broadcast_to(j.c, shape) for j in jets], axis=_axis(axis)), deg)
+
+
+def _concatenate(arrays, axis=0):
+    ref, jets, deg = _jets(list(arrays))
+    return ref._new(np.concatenate([j.c for j in jets], axis=_axis(axis)), deg)
+
+
+def _sum(a, axis=None):
+    axis = tuple(range(a.ndim)) if axis is None else np.atleast_1d(axis)
+    return a._new(a.c.sum(axis=tuple(_axis(x) for x in axis)))
+
+
+def _extreme(arg):
+    def extreme(a, axis=None):
+        if axis is None:
+            a, axis = a._new(a.c.reshape(len(a.c), -1)), 0
+        i = np.expand_dims(arg(a.value, axis=axis), axis)
+        c = np.take_along_axis(a.c, i[None], axis=_axis(axis))
+        return a._new(np.squeeze(c, axis=_axis(axis)))
+    return extreme
+
+
+def _broadcast_to(a, shape):
+    return a._new(np.broadcast_to(a.c, (a.c.shape[0],) + tuple(shape)))
+
+
+def _where(cond, a, b):
+    ref, (a, b), deg = _jets([a, b])
+    return ref._new(np.where(cond, a.c, b.c), deg)
+
+
+_FUNCTIONS = {
+    np.stack: _stack,
+    np.concatenate: _concatenate,
+    np.sum: _sum,
+    np.max: _extreme(np.argmax),
+    np.min: _extreme(np.argmin),
+    np.broadcast_to: _broadcast_to,
+    np.where: _where,
+}
+
+
+def _real(x):
+    # the plain value under any number of dual levels
+    while isinstance(x, Dual):
+        x = x.v
+    return x
+
+
+def _col(x):
+    # x with a trailing axis, to broadcast against tangents
+    if not isinstance(x, (Dual, Interval)):
+        x = np.asarray(x)
+    return x[..., None]
+
+
+def _daxis(axis):
+    # axis of the tangent array for an axis of the value
+    return axis - 1 if axis < 0 else axis
+
+
+class Dual:
+    """
+    First order dual number v + d.eps over n directions: d has shape
+    (*shape, n). v and d may themselves be Duals of a lower level, which is
+    how gradients of gradients are taken. Duals of a lower level are
+    constants to the ones above.
+    """
+
+    def __init__(self, v, d, level):
+        self.v = v
+        self.d = d
+        self.level = level
+
+    @classmethod
+    def seed(cls, X):
+        # X (M, n), possibly a Dual already, as the variable of a new level
+        level = X.level + 1 if isinstance(X, Dual) else 1
+        n = X.shape[-1]
+        return cls(X, np.broadcast_to(np.eye(n), X.shape + (n,)), level)
+
+    @property
+    def shape(self):
+        return self.v.shape
+
+    @property
+    def ndim(self):
+        return len(self.v.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        dkey = key + (slice(None),) if Ellipsis in key else key + (Ellipsis, slice(None))
+        return Dual(self.v[key], self.d[dkey], self.level)
+
+    def __repr__(self):
+        return f"Dual(v={self.v!r}, level={self.level})"
+
+    def _split(self, x):
+        # value and tangent (None for a constant) of x at this level
+        if isinstance(x, Dual) and x.level == self.level:
+            return x.v, x.d
+        return x, None
+
+    def _chain(self, value, deriv):
+        # phi(self) given phi(v) and phi'(v)
+        return Dual(value, self.d * _col(deriv), self.level)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs.get("out") is not None:
+            return NotImplemented
+
+        # the highest level present does the work, the rest are constants
+        top = max((x for x in inputs if isinstance(x, Dual)), key=lambda x: x.level)
+
+        if len(inputs) == 1:
+            v = top.v
+            if ufunc is np.negative:
+                return Dual(-v, -top.d, top.level)
+            if ufunc is np.positive:
+                return top
+            if ufunc is np.square:
+                return top._chain(v * v, 2 * v)
+            if ufunc is np.sqrt:
+                s = np.sqrt(v)
+                return top._chain(s, 0.5 / s)
+            if ufunc is np.reciprocal:
+                return top._chain(1 / v, -1 / (v * v))
+            if ufunc is np.exp:
+                e = np.exp(v)
+                return top._chain(e, e)
+            if ufunc is np.log:
+                return top._chain(np.log(v), 1 / v)
+            if ufunc is np.sin:
+                return top._chain(np.sin(v), np.cos(v))
+            if ufunc is np.cos:
+                return top._chain(np.cos(v), -np.sin(v))
+            if ufunc is np.absolute:
+                x = _real(v)
+                if isinstance(x, Interval):
+                    s = Interval(np.where(x.lo >= 0, 1.0, -1.0), np.where(x.hi >= 0, 1.0, -1.0))
+                    return top._chain(np.absolute(v), s)
+                s = np.where(x >= 0, 1.0, -1.0)
+                return top._chain(v * s, s)
+            if ufunc is np.sign:
+                return np.sign(_real(v))
+            return NotImplemented
+
+        a, b = inputs
+        (av, ad), (bv, bd) = top._split(a), top._split(b)
+        if ufunc is np.add:
+            return Dual(av + bv, _sum_tangents(ad, bd), top.level)
+        if ufunc is np.subtract:
+            return Dual(av - bv, _sum_tangents(ad, None if bd is None else -bd), top.level)
+        if ufunc is np.multiply:
+            return Dual(av * bv, _sum_tangents(None if ad is None else ad * _col(bv),
+                                               None if bd is None else _col(av) * bd), top.level)
+        if ufunc is np.true_divide:
+            if bd is None:
+                return Dual(av / bv, ad / _col(bv), top.level)
+            return a * np.reciprocal(b)
+        if ufunc is np.power:
+            if bd is not None:
+                return np.exp(b * np.log(a))
+            if float(bv) == 2:
+                return top._chain(av * av, 2 * av)
+            return top._chain(av ** bv, bv * av ** (bv - 1))
+        if ufunc in (np.maximum, np.minimum):
+            x, y = _real(a), _real(b)
+            if isinstance(x, Interval) or isinstance(y, Interval):
+                x = x if isinstance(x, Interval) else Interval(x)
+                take_a = x.certainly_ge(y) if ufunc is np.maximum else x.certainly_le(y)
+                take_b = x.certainly_le(y) if ufunc is np.maximum else x.certainly_ge(y)
+                return _dual_where(take_a, a, _dual_where(take_b, b, _hull(a, b)))
+            op = np.greater_equal if ufunc is np.maximum else np.less_equal
+            return _dual_where(op(x, y), a, b)
+        if ufunc in _COMPARE:
+            return ufunc(_real(a), _real(b))
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func is np.stack:
+            return _dual_stack(*args, **kwargs)
+        if func is np.sum:
+            return _dual_sum(*args, **kwargs)
+        if func in (np.max, np.min):
+            return _dual_extreme(func, *args, **kwargs)
+        return NotImplemented
+
+    def __add__(self, other): return np.add(self, other)
+    def __radd__(self, other): return np.add(other, self)
+    def __sub__(self, other): return np.subtract(self, other)
+    def __rsub__(self, other): return np.subtract(other, self)
+    def __mul__(self, other): return np.multiply(self, other)
+    def __rmul__(self, other): return np.multiply(other, self)
+    def __truediv__(self, other): return np.true_divide(self, other)
+    def __rtruediv__(self, other): return np.true_divide(other, self)
+    def __pow__(self, other): return np.power(self, other)
+    def __neg__(self): return np.negative(self)
+    def __pos__(self): return self
+    def __abs__(self): return np.absolute(self)
+
+
+def _sum_tangents(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def _zeros(x, n):
+    # tangent of a constant x, for n directions
+    return np.zeros(np.shape(_real(x)) + (n,))
+
+
+def _hull(a, b):
+    # (possibly dual) intervals holding both a and b, tangents included
+    if not isinstance(a, Dual) and not isinstance(b, Dual):
+        return Interval.hull(a, b)
+    top = max((x for x in (a, b) if isinstance(x, Dual)), key=lambda x: x.level)
+    (av, ad), (bv, bd) = top._split(a), top._split(b)
+    n = top.d.shape[-1]
+    ad = _zeros(av, n) if ad is None else ad
+    bd = _zeros(bv, n) if bd is None else bd
+    return Dual(_hull(av, bv), _hull(ad, bd), top.level)
+
+
+def _dual_where(take, a, b):
+    # elementwise choice between (possibly dual) a and b
+    if not isinstance(a, Dual) and not isinstance(b, Dual):
+        return np.where(take, a, b)
+    top = max((x for x in (a, b) if isinstance(x, Dual)), key=lambda x: x.level)
+    (av, ad), (bv, bd) = top._split(a), top._split(b)
+    n = top.d.shape[-1]
+    ad = _zeros(av, n) if ad is None else ad
+    bd = _zeros(bv, n) if bd is None else bd
+    return Dual(_dual_where(take, av, bv), _dual_where(_col(take), ad, bd), top.level)
+
+
+def _dual_stack(arrays, axis=0):
+    arrays = list(arrays)
+    top = max((x for x in arrays if isinstance(x, Dual)), key=lambda x: x.level)
+    n = top.d.shape[-1]
+    shape = np.broadcast_shapes(*[np.shape(_real(x)) for x in arrays])
+
+    vs, ds = [], []
+    for x in arrays:
+        v, d = top._split(x)
+        vs.append(v if isinstance(v, Dual) else np.broadcast_to(v, shape))
+        ds.append(np.zeros(shape + (n,)) if d is None else d)
+    return Dual(_stack_any(vs, axis), _stack_any(ds, _daxis(axis)), top.level)
+
+
+def _stack_any(xs, axis):
+    # np.stack, lifting plain arrays to duals if the others are
+    if any(isinstance(x, Dual) for x in xs):
+        top = max((x for x in xs if isinstance(x, Dual)), key=lambda x: x.level)
+        xs = [x if isinstance(x, Dual) and x.level == top.level
+              else Dual(x, _zeros(x, top.d.shape[-1]), top.level) for x in xs]
+    return np.stack(xs, axis=axis)
+
+
+def _dual_sum(a, axis=None):
+    axis = tuple(range(a.ndim)) if axis is None else tuple(np.atleast_1d(axis))
+    return Dual(np.sum(a.v, axis=axis), np.sum(a.d, axis=tuple(_daxis(x) for x in axis)), a.level)
+
+
+def _dual_extreme(func, a, axis=None):
+    if isinstance(_real(a), Interval):
+        # no single argmax over a box: fold with np.maximum / np.minimum
+        axis = 0 if axis is None else axis
+        pick = (slice(None),) * axis if axis >= 0 else (Ellipsis,)
+        after = () if axis >= 0 else (slice(None),) * (-axis - 1)
+        out = a[pick + (0,) + after]
+        for i in range(1, a.shape[axis]):
+            out = (np.maximum if func is np.max else np.minimum)(out, a[pick + (i,) + after])
+        return out
+
+    arg = np.argmax if func is np.max else np.argmin
+    i = np.expand_dims(arg(_real(a.v), axis=axis), axis)
+    return _take(a, i, axis)
+
+
+def _take(a, i, axis):
+    # take_along_axis for (nested) duals, dropping the axis
+    if not isinstance(a, Dual):
+        return np.squeeze(np.take_along_axis(a, i, axis=axis), axis=axis)
+    return Dual(_take(a.v, i, axis), _take(a.d, _col(i), _daxis(axis)), a.level)
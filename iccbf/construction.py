@@ -0,0 +1,275 @@
+"""
+Recursive construction of input constrained control barrier functions.
+
+For the control affine system xdot = f(x) + g(x) u, u in U, and the safe set
+S = {x : h(x) >= 0}, the functions
+
+    b_0(x)     = h(x)
+    b_{i+1}(x) = inf_{u in U} L_f b_i(x) + L_g b_i(x) u + alpha_i(b_i(x))
+
+are built up to b_N. b_N is an ICCBF if, for all x in C* = S n C_1 n ... n C_N,
+
+    sup_{u in U} L_f b_N(x) + L_g b_N(x) u + alpha_N(b_N(x)) >= 0
+
+Everything works on a batch of M states at once: f(X), g(X) and h(X) take X
+of shape (M, n) and return arrays of shape (M, n), (M, n, m) (or a constant
+(n, m)) and (M,).
+"""
+
+import numpy as np
+
+from .autodiff import Dual, Jet
+from .interval import Interval
+
+
+class ICCBF:
+    """
+    b_0 ... b_N for the system (f, g), safety constraint h and input set U.
+
+    alphas is [alpha_0, ..., alpha_N]: the first N build b_1 ... b_N, and
+    alpha_N is the one used in the ICCBF condition (and by the controller).
+
+    method is how the gradients of b_i are taken:
+
+        "jet"   Taylor mode AD: one pass of f, g and h on jets of order N (N+1
+                for lie) gives every level, sharing the derivatives of the
+                lower levels
+        "dual"  nested first order AD, one level of duals per b_i
+        "fd"    nested central differences, with step `step` (a scalar, or one
+                step per state)
+    """
+
+    def __init__(self, f, g, h, alphas, U, step=1e-3, method="jet"):
+        if method not in ("jet", "dual", "fd"):
+            raise ValueError(f"unknown method {method!r}")
+        self.f = f
+        self.g = g
+        self.h = h
+        self.alphas = list(alphas)
+        self.U = U
+        self.N = len(self.alphas) - 1
+        self.step = step
+        self.method = method
+
+    def _g(self, X):
+        G = np.asarray(self.g(X))
+        return np.broadcast_to(G, (len(X),) + G.shape[-2:])
+
+    def _stencil(self, X):
+        # X and X +- step e_j for every coordinate j: shape (2n+1, M, n)
+        n = X.shape[1]
+        E = np.eye(n) * self.step
+        offsets = np.concatenate([np.zeros((1, n)), E, -E])
+        return X[None] + offsets[:, None, :]
+
+    def _lie(self, X, B):
+        # B: values of some b on the stencil of X, shape (..., 2n+1, M)
+        # returns b, L_f b and L_g b at X
+        n = X.shape[1]
+        step = np.broadcast_to(self.step, (n,))[:, None]
+        grad = (B[..., 1:n + 1, :] - B[..., n + 1:, :]) / (2 * step)
+        Lf = np.einsum("...jm,mj->...m", grad, self.f(X))
+        Lg = np.einsum("...jm,mjk->...mk", grad, self._g(X))
+        return B[..., 0, :], Lf, Lg
+
+    def _levels(self, X, N):
+        # b_0 ... b_N at X, shape (N+1, M)
+        if N == 0:
+            return self.h(X)[None]
+
+        n, M = X.shape[1], X.shape[0]
+        S = self._stencil(X).reshape(-1, n)
+        lower = self._levels(S, N - 1).reshape(N, 2 * n + 1, M)
+
+        b, Lf, Lg = self._lie(X, lower[N - 1])
+        top = Lf + self.U.inf(Lg) + self.alphas[N - 1](b)
+
+        return np.concatenate([lower[:, 0], top[None]])
+
+    def _jet_levels(self, X, N, K):
+        # b_0 ... b_N as jets, b_i of order K - i, from one evaluation of f, g
+        # and h on a jet of order K
+        F, G, b = jet_seed(self.f, self.g, self.h, X, K)
+        out = [b]
+        for i in range(N):
+            b = jet_step(b, F, G, self.U, self.alphas[i])
+            out.append(b)
+        return out
+
+    def _dual_lie(self, X, b, level):
+        # b, L_f b and L_g b at X, from b evaluated on duals of the given level
+        if isinstance(b, Dual) and b.level == level:
+            b, grad = b.v, b.d
+        else:
+            grad = np.zeros(np.shape(b) + (X.shape[-1],))
+        G = self.g(X)
+        Lf = np.sum(grad * self.f(X), axis=-1)
+        Lg = np.sum(_col(grad) * G, axis=-2)
+        return b, Lf, Lg
+
+    def _dual_levels(self, X, N):
+        # b_0 ... b_N at X (an array, or duals of a lower level), each b_i
+        # taking its gradient through one more level of duals
+        if N == 0:
+            return [self.h(X)]
+
+        x = Dual.seed(X)
+        lower = self._dual_levels(x, N - 1)
+        b, Lf, Lg = self._dual_lie(X, lower[-1], x.level)
+        top = Lf + self.U.inf(Lg) + self.alphas[N - 1](b)
+
+        return [l.v if isinstance(l, Dual) and l.level == x.level else l for l in lower] + [top]
+
+    def _dual_lie_levels(self, X):
+        x = Dual.seed(X)
+        lies = [self._dual_lie(X, b, x.level) for b in self._dual_levels(x, self.N)]
+        return tuple(np.stack(part) for part in zip(*lies))
+
+    def levels(self, X, N=None):
+        """
+        b_0(x) ... b_N(x) for a batch of states X (M, n), as an (N+1, M) array.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        N = self.N if N is None else N
+        if self.method == "jet":
+            return np.stack([b.value for b in self._jet_levels(X, N, N)])
+        if self.method == "dual":
+            return np.stack([np.broadcast_to(b, len(X)) for b in self._dual_levels(X, N)])
+        return self._levels(X, N)
+
+    def lie_levels(self, X):
+        """
+        b_i, L_f b_i and L_g b_i for every level i = 0 ... N, from one pass, for
+        a batch of states X (M, n), with shapes (N+1, M), (N+1, M) and
+        (N+1, M, m).
+
+        X may also be an interval.Interval of M boxes (or Duals of one), for
+        enclosures of the three over each box, taken with nested duals
+        whatever the method.
+        """
+        if isinstance(X, (Interval, Dual)):
+            return self._dual_lie_levels(X)
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        n, M = X.shape[1], X.shape[0]
+
+        if self.method == "jet":
+            bs = self._jet_levels(X, self.N, self.N + 1)
+            grad = np.stack([b.gradient() for b in bs])
+            B = np.stack([b.value for b in bs])
+            return B, np.einsum("imj,mj->im", grad, self.f(X)), np.einsum("imj,mjk->imk", grad, self._g(X))
+
+        if self.method == "dual":
+            return self._dual_lie_levels(X)
+
+        S = self._stencil(X).reshape(-1, n)
+        B = self._levels(S, self.N).reshape(self.N + 1, 2 * n + 1, M)
+        return self._lie(X, B)
+
+    def lie(self, X):
+        """
+        b_N, L_f b_N and L_g b_N for a batch of states X (M, n), with shapes
+        (M,), (M,) and (M, m).
+        """
+        B, Lf, Lg = self.lie_levels(X)
+        return B[-1], Lf[-1], Lg[-1]
+
+
+def jet_seed(f, g, h, X, K):
+    """
+    f, g and b_0 = h on jets of order K at the states X (M, n). With
+    jet_step, the levels b_0 ... b_N for any alphas, one level at a time
+    (ICCBF.levels for fixed alphas, tune.search for a tree of them).
+    """
+    x = Jet.seed(X, K)
+    return f(x), g(x), h(x)
+
+
+def jet_step(b, F, G, U, alpha):
+    """
+    The jet of b_{i+1} = L_f b_i + inf_{u in U} L_g b_i u + alpha(b_i), one
+    order lower than the jet b of b_i, with F and G from jet_seed.
+    """
+    k = b.K - 1
+    grad = [b.derivative(j) for j in range(b.n)]
+    Fk = F.truncate(k) if isinstance(F, Jet) else F
+    Gk = G.truncate(k) if isinstance(G, Jet) else G
+    b = b.truncate(k)
+
+    Lf = sum(grad[j] * Fk[..., j] for j in range(len(grad)))
+    Lg = np.stack([sum(grad[j] * Gk[..., j, l] for j in range(len(grad)))
+                   for l in range(Gk.shape[-1])], axis=-1)
+    return Lf + U.inf(Lg) + alpha(b)
+
+
+class Linear:
+    """
+    The class K function alpha(r) = k r. Unlike a lambda it can be pickled,
+    so an ICCBF built from these can be sent to worker processes.
+    """
+
+    def __init__(self, k):
+        self.k = k
+
+    def __call__(self, r):
+        return self.k * r
+
+    def __repr__(self):
+        return f"Linear({self.k})"
+
+
+class Root:
+    """
+    The class K function alpha(r) = k sign(r) sqrt(|r|).
+    """
+
+    def __init__(self, k):
+        self.k = k
+
+    def __call__(self, r):
+        return self.k * np.sign(r) * np.sqrt(np.abs(r))
+
+    def __repr__(self):
+        return f"Root({self.k})"
+
+
+class Analytic:
+    """
+    A function of the state with its gradient written out by hand:
+    gradient(X) returns the values and gradients (M,) and (M, n) for a batch
+    of states, and lie uses it instead of jets. Called like the function it
+    wraps, so it works anywhere the function does (jets and intervals
+    included, e.g. as the h of an ICCBF, whose b_1 ... b_N still need the
+    jets).
+    """
+
+    def __init__(self, fn, gradient):
+        self.fn = fn
+        self.gradient = gradient
+
+    def __call__(self, X):
+        return self.fn(X)
+
+
+def lie(h, f, g, X):
+    """
+    h, L_f h and L_g h for a batch of states X (M, n), like Lie(h, f) and
+    Lie(h, g) in docking.jl, with shapes (M,), (M,) and (M, m). If h has a
+    gradient method (an Analytic), h and its gradient come from it instead
+    of from jets.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    gradient = getattr(h, "gradient", None)
+    if gradient is not None:
+        value, grad = gradient(X)
+        value = value.copy()
+    else:
+        b = h(Jet.seed(X, 1))
+        value, grad = b.value, b.gradient()
+    G = np.asarray(g(X))
+    G = np.broadcast_to(G, (len(X),) + G.shape[-2:])
+    return value, np.einsum("mj,mj->m", grad, f(X)), np.einsum("mj,mjk->mk", grad, G)
+
+
+def _col(x):
+    return x[..., None]
@@ -0,0 +1,94 @@
+"""
+Downsampling of long series for plotting.
+
+lttb is largest-triangle-three-buckets (Steinarsson, 2013): the first and
+last points are kept, the rest are split into n - 2 buckets of equal count,
+and from each bucket the point forming the largest triangle with the point
+kept from the previous bucket and the mean of the next one is kept. Peaks,
+corners and flat stretches survive with a few points per pixel.
+"""
+
+import numpy as np
+
+
+def lttb(x, y, n):
+    """
+    Indices of the n points of (x, y) (each (N,)) that lttb keeps, in order.
+    All points if N <= n.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    N = len(x)
+    if n >= N or n < 3:
+        return np.arange(N) if n >= N else np.linspace(0, N - 1, max(n, 0)).astype(int)
+
+    # bucket i covers [edges[i], edges[i+1]) of the points between the ends
+    edges = np.linspace(1, N - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, N - 1
+
+    # mean of every bucket, for the point after it (the last point for the last)
+    sums_x = np.add.reduceat(x[1:N - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:N - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.r_[sums_x / counts, x[-1]]
+    mean_y = np.r_[sums_y / counts, y[-1]]
+
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - mean_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _extremes(y, k):
+    # indices of the smallest and largest finite y of every k points, in order
+    N = len(y)
+    m = -(-N // k)
+    finite = np.isfinite(y)
+    lo = np.full(m * k, np.inf)
+    hi = np.full(m * k, -np.inf)
+    lo[:N] = np.where(finite, y, np.inf)
+    hi[:N] = np.where(finite, y, -np.inf)
+    base = np.arange(m) * k
+    keep = np.unique(np.r_[base + lo.reshape(m, k).argmin(axis=1), base + hi.reshape(m, k).argmax(axis=1)])
+    return keep[keep < N]
+
+
+def from_store(store, column, n, t0=-np.inf, t1=np.inf, index=(0,), oversample=16, block=1 << 16):
+    """
+    (t, y) with n points of column[:, *index] of a store.TrajectoryStore over
+    the window [t0, t1], for the trajectory index[0]. The window is read
+    block rows at a time and reduced to the smallest and largest y of every
+    k rows (like recorder.MinMax, with k such that about n * oversample
+    points are left), so narrow peaks and dips survive; lttb picks the n
+    points from those. Memory does not grow with the length of the run.
+    """
+    start, stop = store.rows_between(t0, t1)
+
+    # rows after the trajectory stopped hold its final state: keep only one
+    if "status" in store.columns:
+        running = np.flatnonzero(np.asarray(store["status"][start:stop, index[0]]) == 0)
+        if len(running):
+            stop = min(stop, start + running[-1] + 2)
+
+    k = max(1, (stop - start) // max(1, n * oversample // 2))
+    block = max(k, block // k * k)
+    ts, ys = [], []
+    for lo in range(start, stop, block):
+        hi = min(lo + block, stop)
+        t = np.asarray(store["t"][lo:hi, index[0]])
+        y = np.asarray(store[column][(slice(lo, hi),) + tuple(index)], dtype=float)
+        keep = _extremes(y, k)
+        ts.append(t[keep])
+        ys.append(y[keep])
+    if not ts:
+        return np.empty(0), np.empty(0)
+    t, y = np.concatenate(ts), np.concatenate(ys)
+
+    finite = np.isfinite(y)
+    t, y = t[finite], y[finite]
+    keep = lttb(t, y, n)
+    return t[keep], y[keep]
@@ -0,0 +1,127 @@
+"""
+Sampled falsification of the ICCBF condition.
+
+b_N is an ICCBF if, for every x in C* = S n C_1 n ... n C_N,
+
+    margin(x) = sup_{u in U} L_f b_N(x) + L_g b_N(x) u + alpha_N(b_N(x)) >= 0
+
+falsify draws scrambled Sobol points in a box of states, keeps those in C*,
+and evaluates the margin there, in batches spread over a process pool. The
+batches are disjoint blocks of one Sobol sequence, so the points are the same
+for any number of workers. As batches finish, it yields reports with the
+worst points found so far, and it can stop at the first violation.
+
+A counterexample proves b_N is not an ICCBF (up to the sampling density, no
+sample can prove that it is).
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+
+def margin(b, X):
+    """
+    The ICCBF condition's margin at the states X (M, n), and whether each
+    state is in C*: returns (margin (M,), inside (M,)).
+    """
+    B, Lf, Lg = b.lie_levels(X)
+    inside = np.all(B >= 0, axis=0)
+    return Lf[-1] + b.U.sup(Lg[-1]) + b.alphas[-1](B[-1]), inside
+
+
+def sobol(d, seed, start, size):
+    """
+    The points [start, start + size) of the scrambled Sobol sequence in
+    [0, 1)^d with the given seed, (size, d). Blocks of a power of 2 points
+    from a multiple of it keep the sequence's balance. Needs scipy.
+    """
+    from scipy.stats import qmc
+
+    sampler = qmc.Sobol(d, scramble=True, seed=seed)
+    if start:
+        sampler.fast_forward(start)
+    return sampler.random(size)
+
+
+def _batch(b, lo, hi, seed, start, size, tol, keep):
+    # the samples [start, start + size) of the sequence: how many are in C*,
+    # and the worst `keep` of them with margin below -tol
+    X = lo + sobol(len(lo), seed, start, size) * (hi - lo)
+    m, inside = margin(b, X)
+    bad = np.flatnonzero(inside & ~(m >= -tol))
+    worst = bad[np.argsort(m[bad])[:keep]]
+    return start, int(inside.sum()), len(bad), X[worst], m[worst]
+
+
+def _merge(X, m, X_new, m_new, keep):
+    X, m = np.concatenate([X, X_new]), np.concatenate([m, m_new])
+    order = np.argsort(m)[:keep]
+    return X[order], m[order]
+
+
+def falsify(b, bounds, samples=1 << 20, batch=1 << 14, workers=None, seed=0, first=False, tol=0.0, keep=10):
+    """
+    Looks for states in C* where the ICCBF condition of b fails, among the
+    first `samples` points of a Sobol sequence in the box bounds = (lo, hi)
+    (each (n,)). b is sent to the worker processes, so it must pickle (use
+    Linear and Root rather than lambdas for the alphas). workers = 0 runs in
+    this process. batch should be a power of 2.
+
+    A generator of reports, one per finished batch, each a dict with
+        samples     points evaluated so far
+        inside      how many of them were in C*
+        violations  how many had margin < -tol
+        X, margin   the worst `keep` violating points so far, worst first
+        done        True on the last report
+    With first = True it stops after the first batch with a violation.
+
+        for report in falsify(b, ([0, 0], [100, 24]), first=True):
+            print(report["samples"], report["violations"])
+    """
+    lo, hi = (np.asarray(v, dtype=float) for v in bounds)
+    starts = list(range(0, samples, batch))
+    report = dict(samples=0, inside=0, violations=0, X=np.zeros((0, len(lo))), margin=np.zeros(0), done=False)
+
+    def update(result):
+        start, inside, violations, X, m = result
+        report["samples"] += min(batch, samples - start)
+        report["inside"] += inside
+        report["violations"] += violations
+        report["X"], report["margin"] = _merge(report["X"], report["margin"], X, m, keep)
+        stop = (first and report["violations"] > 0) or report["samples"] >= samples
+        report["done"] = stop
+        return dict(report), stop
+
+    if workers == 0:
+        for start in starts:
+            out, stop = update(_batch(b, lo, hi, seed, start, min(batch, samples - start), tol, keep))
+            yield out
+            if stop:
+                return
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as pool:
+        # at most two batches queued per worker, so an early exit wastes little
+        pending, queue = set(), iter(starts)
+        for start in queue:
+            pending.add(pool.submit(_batch, b, lo, hi, seed, start, min(batch, samples - start), tol, keep))
+            if len(pending) >= 2 * workers:
+                break
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                out, stop = update(future.result())
+                if stop:
+                    for p in pending:
+                        p.cancel()
+                    out["done"] = True
+                    yield out
+                    return
+                yield out
+                start = next(queue, None)
+                if start is not None:
+                    pending.add(pool.submit(_batch, b, lo, hi, seed, start, min(batch, samples - start), tol, keep))
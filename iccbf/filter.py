@@ -0,0 +1,230 @@
+"""
+CLF-ICCBF safety filter, as feedback! in docking/docking.jl, for a batch of
+states at once.
+
+For every state x the QP over z = (u, δ, k) is
+
+    min  1/2 |u|^2 + 10 δ + 50 k
+    s.t. L_g V u - δ            <= -c V - L_f V         (CLF)
+         -L_g b_N u - b_N k     <= alpha_N(b_N) + L_f b_N  (ICCBF)
+         lo <= A_U u <= hi                               (u in U)
+         δ >= 0, k >= 0
+
+(OSQP's 1/2 x'Px + q'x with P = diag(1, ..., 1, 0, 0), as in docking.jl.)
+The M problems are solved together as one block diagonal OSQP problem. The
+sparsity pattern is set up once, and every call only overwrites the values
+that depend on x and warm starts from the previous solution.
+
+Needs osqp and scipy, imported when the first problem is set up, so the rest
+of the package works with numpy alone.
+"""
+
+import numpy as np
+
+from .construction import lie
+
+
+# how many times infeasible states are dropped and the rest solved again
+MAX_ROUNDS = 4
+
+
+class SafetyFilter:
+    """
+    The docking controller: b is an ICCBF, V a CLF with rate clf_rate, and
+    weights the costs of the slack variables δ and k.
+
+        filter = SafetyFilter(ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U), sc.V)
+        success, U = filter.solve(X)
+
+    Any other keyword argument is an OSQP setting.
+    """
+
+    def __init__(self, b, V, clf_rate=0.1, weights=(10.0, 50.0), **settings):
+        self.b = b
+        self.V = V
+        self.clf_rate = clf_rate
+        self.weights = weights
+        self.settings = dict(verbose=False)
+        self.settings.update(settings)
+
+        self.m = b.U.m
+        self.AU, self.loU, self.hiU = b.U.rows()
+
+        # per state: variables (u, δ, k), rows (CLF, ICCBF, U..., δ, k)
+        self.nv = self.m + 2
+        self.nr = 4 + len(self.AU)
+
+        self.M = None
+        self.feasible = None
+        self.prob = None
+        self.x = None
+        self.y = None
+        self.status = None
+        self.info = None
+
+    def _block(self):
+        # entries of one block of A: the CLF and ICCBF rows (the first 2m+2)
+        # depend on x, the rest are the same for every state
+        m, r = self.m, len(self.AU)
+        rows = [0] * (m + 1) + [1] * (m + 1)
+        cols = list(range(m + 1)) + list(range(m)) + [m + 1]
+        vals = [0.0] * m + [-1.0] + [0.0] * (m + 1)
+
+        for i in range(r):
+            for j in range(m):
+                if self.AU[i, j] != 0:
+                    rows.append(2 + i)
+                    cols.append(j)
+                    vals.append(self.AU[i, j])
+
+        rows += [2 + r, 3 + r]
+        cols += [m, m + 1]
+        vals += [1.0, 1.0]
+        return np.array(rows), np.array(cols), np.array(vals)
+
+    def _setup(self, M):
+        import osqp
+        import scipy.sparse as sp
+
+        m, nv, nr = self.m, self.nv, self.nr
+
+        rows, cols, vals = self._block()
+        nnz = len(vals)
+        offsets = np.arange(M)[:, None]
+        R = (rows + nr * offsets).ravel()
+        C = (cols + nv * offsets).ravel()
+
+        # tag every entry with its position, so the CSC data order is known
+        A = sp.csc_matrix((np.arange(1, M * nnz + 1, dtype=float), (R, C)), shape=(M * nr, M * nv))
+        self._perm = A.data.astype(int) - 1
+
+        self._vals = np.tile(vals, (M, 1))
+        self._l = np.tile(np.r_[-np.inf, -np.inf, self.loU, 0.0, 0.0], (M, 1))
+        self._u = np.tile(np.r_[np.inf, np.inf, self.hiU, np.inf, np.inf], (M, 1))
+        self._Ax = np.empty(M * nnz)
+
+        P = sp.block_diag([sp.diags(np.r_[np.ones(m), 0.0, 0.0])] * M, format="csc")
+        q = np.tile(np.r_[np.zeros(m), self.weights], M)
+
+        # A shares its data with _Ax, so it follows every update
+        A.data = self._Ax
+        self._Ax_from(self._vals)
+        self._A, self._P, self._q = A, P, q
+
+        self.prob = osqp.OSQP()
+        self.prob.setup(P=sp.triu(P, format="csc"), q=q, A=A, l=self._l.ravel(), u=self._u.ravel(), **self.settings)
+        self.M = M
+        self.x = self.y = None
+
+    def _Ax_from(self, vals):
+        return np.take(vals.ravel(), self._perm, out=self._Ax)
+
+    def update(self, X, active=None):
+        """
+        Writes the constraints for the states X (M, n) into the problem.
+        States where active is False get no CLF or ICCBF rows (their u is 0).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        M, m = len(X), self.m
+        if M != self.M:
+            self._setup(M)
+
+        V, LfV, LgV = lie(self.V, self.b.f, self.b.g, X)
+        b, Lfb, Lgb = self.b.lie(X)
+
+        # each row is divided by its largest coefficient (b_N's included,
+        # and at least 1e-3, so the slacks' stay at most 1e3 when L_g V or
+        # L_g b_N vanish): OSQP scales the problem once, at setup, so the
+        # rows have to arrive well scaled
+        clf = np.maximum(np.abs(LgV).max(axis=1), 1e-3)
+        cbf = np.maximum(np.maximum(np.abs(Lgb).max(axis=1), np.abs(b)), 1e-3)
+
+        vals, u = self._vals, self._u
+        vals[:, :m] = LgV / clf[:, None]
+        vals[:, m] = -1 / clf
+        vals[:, m + 1:2 * m + 1] = -Lgb / cbf[:, None]
+        vals[:, 2 * m + 1] = -b / cbf
+        u[:, 0] = (-self.clf_rate * V - LfV) / clf
+        u[:, 1] = (self.b.alphas[-1](b) + Lfb) / cbf
+
+        # with k free the ICCBF row can always be met when b_N > 0, otherwise
+        # only if the ICCBF condition holds at x
+        self.feasible = (b > 0) | (Lfb + self.b.U.sup(Lgb) + self.b.alphas[-1](b) >= 0)
+
+        if active is not None:
+            self._relax(~np.asarray(active, dtype=bool))
+        self._relax(~self.feasible)
+
+        return b
+
+    def _relax(self, blocks):
+        # drops the CLF and ICCBF rows of the given states
+        self._vals[blocks, :2 * self.m + 2] = 0
+        self._u[blocks, :2] = np.inf
+
+    def _converged(self, x, y):
+        # OSQP's termination criteria, for each state's own block
+        M, nv, nr = self.M, self.nv, self.nr
+        eps_abs = self.settings.get("eps_abs", 1e-3)
+        eps_rel = self.settings.get("eps_rel", 1e-3)
+
+        Ax = self._A @ x
+        prim = np.abs(Ax - np.clip(Ax, self._l.ravel(), self._u.ravel())).reshape(M, nr).max(axis=1)
+        prim_tol = eps_abs + eps_rel * np.abs(Ax).reshape(M, nr).max(axis=1)
+
+        Px, Aty = self._P @ x, self._A.T @ y
+        dual = np.abs(Px + self._q + Aty).reshape(M, nv).max(axis=1)
+        dual_tol = eps_abs + eps_rel * np.max([np.abs(v).reshape(M, nv).max(axis=1) for v in (Px, Aty, self._q)], axis=0)
+
+        return (prim <= prim_tol) & (dual <= dual_tol)
+
+    def solve(self, X, active=None):
+        """
+        u for every state X (M, n): returns (success, U) with shapes (M,) and
+        (M, m), like feedback!. A state fails if its own QP is infeasible, in
+        which case its u is 0.
+
+        Per state status is left in self.status: "solved", "infeasible",
+        "inactive" or "unsolved" (the solver stopped for another reason).
+        """
+        self.update(X, active)
+        M, nv, nr = self.M, self.nv, self.nr
+
+        status = np.full(M, "solved", dtype=object)
+        status[~self.feasible] = "infeasible"
+        if active is not None:
+            status[~np.asarray(active, dtype=bool)] = "inactive"
+
+        import osqp
+
+        iters = 0
+        for _ in range(MAX_ROUNDS):
+            self.prob.update(Ax=self._Ax_from(self._vals), l=self._l.ravel(), u=self._u.ravel())
+            if self.x is not None:
+                self.prob.warm_start(x=self.x, y=self.y)
+            results = self.prob.solve()
+            iters += results.info.iter
+
+            if results.info.status_val == osqp.SolverStatus.OSQP_PRIMAL_INFEASIBLE:
+                # infeasible after all (to the solver's tolerance): the
+                # certificate is only nonzero on the rows of the infeasible states
+                cert = np.abs(results.prim_inf_cert).reshape(M, nr).max(axis=1)
+                bad = cert > 1e-6 * cert.max()
+                status[bad] = "infeasible"
+                self._relax(bad)
+                continue
+
+            self.x, self.y = results.x, results.y
+            if results.info.status_val != osqp.SolverStatus.OSQP_SOLVED:
+                # the iterations only stop once every state has converged, so
+                # check them one by one
+                status[(status == "solved") & ~self._converged(results.x, results.y)] = "unsolved"
+            break
+        else:
+            status[status == "solved"] = "unsolved"
+
+        self.status = status
+        self.info = dict(status=results.info.status, iterations=iters)
+
+        z = results.x.reshape(M, nv)
+        return status == "solved", z[:, :self.m].copy()
@@ -0,0 +1,55 @@
+"""
+Input constraint sets U.
+
+The construction only needs the extreme values of c.u over U, for a batch of
+row vectors c of shape (M, m): inf(c) and sup(c). The controllers also need U
+as rows lo <= A u <= hi: rows().
+"""
+
+from itertools import product
+
+import numpy as np
+
+
+class Box:
+    """
+    lo <= u <= hi, componentwise, e.g. |u| <= 0.25 for the adaptive cruise
+    control example.
+    """
+
+    def __init__(self, lo, hi):
+        self.lo = np.atleast_1d(np.asarray(lo, dtype=float))
+        self.hi = np.atleast_1d(np.asarray(hi, dtype=float))
+        self.m = len(self.lo)
+
+    def inf(self, c):
+        return np.sum(np.minimum(c * self.lo, c * self.hi), axis=-1)
+
+    def sup(self, c):
+        return np.sum(np.maximum(c * self.lo, c * self.hi), axis=-1)
+
+    def rows(self):
+        return np.eye(self.m), self.lo, self.hi
+
+
+class L1Ball:
+    """
+    ||u||_1 <= radius, e.g. |u_x| + |u_y| <= umax for the docking example.
+    """
+
+    def __init__(self, radius, m=2):
+        self.radius = float(radius)
+        self.m = m
+
+    def inf(self, c):
+        return -self.radius * np.max(np.abs(c), axis=-1)
+
+    def sup(self, c):
+        return self.radius * np.max(np.abs(c), axis=-1)
+
+    def rows(self):
+        # |s.u| <= radius for every sign pattern s (up to the sign of s_1),
+        # e.g. |u_x + u_y| <= umax and |u_x - u_y| <= umax as in docking.jl
+        A = np.array([(1,) + s for s in product((1, -1), repeat=self.m - 1)], dtype=float)
+        r = np.full(len(A), self.radius)
+        return A, -r, r
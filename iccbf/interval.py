@@ -0,0 +1,306 @@
+"""
+Interval arithmetic, batched like numpy arrays.
+
+An Interval holds arrays lo <= hi of one shape and works through numpy: the
+functions of the examples (f, g, h, the class K functions and U.inf / U.sup)
+run unchanged on a batch of boxes and return enclosures of every value they
+take over each box. Every result is rounded outward, so the enclosures also
+hold in floating point: by one ulp for the correctly rounded operations
+(+, -, *, /, sqrt), by a few for exp, log, sin and cos (numpy does not
+promise them correctly rounded), and sums by the error bound of the whole
+summation, which holds when the terms cancel.
+
+Nested autodiff.Duals of Intervals give enclosures of the derivatives, which
+is how ICCBF.lie_levels bounds b_i, L_f b_i and L_g b_i over boxes.
+"""
+
+import numpy as np
+
+
+def _down(x):
+    return np.nextafter(x, -np.inf)
+
+
+def _up(x):
+    return np.nextafter(x, np.inf)
+
+
+# ulps outward for exp, log, sin and cos
+_ULPS = 4
+
+
+def _widen(lo, hi, ulps=_ULPS):
+    for _ in range(ulps):
+        lo, hi = _down(lo), _up(hi)
+    return lo, hi
+
+
+def _bounds(x):
+    if isinstance(x, Interval):
+        return x.lo, x.hi
+    x = np.asarray(x, dtype=float)
+    return x, x
+
+
+def _extremes(*products):
+    # the smallest and largest of the endpoint products, with 0 * inf = 0
+    lo, hi = products[0], products[0]
+    for p in products[1:]:
+        lo, hi = np.fmin(lo, p), np.fmax(hi, p)
+    return np.where(np.isnan(lo), 0.0, lo), np.where(np.isnan(hi), 0.0, hi)
+
+
+class Interval:
+    """
+    The boxes [lo, hi], elementwise. Comparisons are not defined; use
+    certainly_ge / certainly_le for decisions that must hold on the whole box.
+
+        X = Interval([[0, 10], [1, 12]], [[1, 12], [2, 14]])   # 2 boxes in 2-D
+        acc.h(X)                                               # Interval (2,)
+    """
+
+    def __init__(self, lo, hi=None):
+        self.lo = np.asarray(lo, dtype=float)
+        self.hi = self.lo if hi is None else np.asarray(hi, dtype=float)
+
+    @classmethod
+    def hull(cls, a, b):
+        # the smallest intervals holding both a and b
+        (alo, ahi), (blo, bhi) = _bounds(a), _bounds(b)
+        return cls(np.minimum(alo, blo), np.maximum(ahi, bhi))
+
+    @property
+    def shape(self):
+        return np.broadcast_shapes(self.lo.shape, self.hi.shape)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def mid(self):
+        return 0.5 * (self.lo + self.hi)
+
+    @property
+    def width(self):
+        return self.hi - self.lo
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        shape = self.shape
+        return Interval(np.broadcast_to(self.lo, shape)[key], np.broadcast_to(self.hi, shape)[key])
+
+    def __repr__(self):
+        return f"Interval(lo={self.lo!r}, hi={self.hi!r})"
+
+    def certainly_ge(self, other):
+        # self >= other for every pair of points of the boxes
+        return self.lo >= _bounds(other)[1]
+
+    def certainly_le(self, other):
+        return self.hi <= _bounds(other)[0]
+
+    # arithmetic
+
+    def _mul(self, other):
+        (alo, ahi), (blo, bhi) = _bounds(self), _bounds(other)
+        with np.errstate(invalid="ignore"):
+            # by a constant (often an exact 0 or 1 of a tangent), two products do
+            if blo is bhi:
+                lo, hi = _extremes(alo * blo, ahi * blo)
+            elif alo is ahi:
+                lo, hi = _extremes(alo * blo, alo * bhi)
+            else:
+                lo, hi = _extremes(alo * blo, alo * bhi, ahi * blo, ahi * bhi)
+        return Interval(_down(lo), _up(hi))
+
+    def _reciprocal(self):
+        lo, hi = self.lo, self.hi
+        with np.errstate(divide="ignore", over="ignore"):
+            rlo, rhi = 1 / hi, 1 / lo
+        # a box holding 0 has an unbounded reciprocal on that side
+        rlo = np.where(lo < 0, np.where(hi >= 0, -np.inf, rlo), np.where(hi == 0, -np.inf, rlo))
+        rhi = np.where(hi > 0, np.where(lo <= 0, np.inf, rhi), np.where(lo == 0, np.inf, rhi))
+        return Interval(_down(rlo), _up(rhi))
+
+    def _pow(self, p):
+        lo, hi = self.lo, self.hi
+        if float(p).is_integer():
+            p = int(p)
+            if p == 0:
+                return Interval(np.ones(self.shape))
+            if p < 0:
+                return self._pow(-p)._reciprocal()
+            if p % 2:
+                return Interval(_down(lo ** p), _up(hi ** p))
+            a = np.abs(self)
+            return Interval(_down(a.lo ** p), _up(a.hi ** p))
+        # x^p is defined for x >= 0 only
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ends = np.maximum(lo, 0) ** p, np.maximum(hi, 0) ** p
+        lo, hi = (ends[0], ends[1]) if p > 0 else (ends[1], ends[0])
+        return Interval(_down(lo), _up(hi))
+
+    def _periodic(self, phi, peak):
+        # sin or cos: maxima at peak + 2k pi and minima at peak + pi + 2k pi.
+        # cos is not shifted into sin, as fl(pi / 2) is off by 6e-17
+        lo, hi = self.lo, self.hi
+        has_max = np.floor((hi - peak) / (2 * np.pi)) >= np.ceil((lo - peak) / (2 * np.pi))
+        has_min = np.floor((hi - peak - np.pi) / (2 * np.pi)) >= np.ceil((lo - peak - np.pi) / (2 * np.pi))
+        a, b = phi(lo), phi(hi)
+        out_lo, out_hi = _widen(np.minimum(a, b), np.maximum(a, b))
+        out_lo = np.where(has_min, -1.0, out_lo)
+        out_hi = np.where(has_max, 1.0, out_hi)
+        return Interval(np.maximum(out_lo, -1.0), np.minimum(out_hi, 1.0))
+
+    def _monotone(self, phi):
+        return Interval(*_widen(phi(self.lo), phi(self.hi)))
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs.get("out") is not None:
+            return NotImplemented
+        if not all(isinstance(x, (Interval, np.ndarray, float, int, np.number)) for x in inputs):
+            return NotImplemented
+
+        if len(inputs) == 1:
+            x = inputs[0]
+            lo, hi = x.lo, x.hi
+            if ufunc is np.negative:
+                return Interval(-hi, -lo)
+            if ufunc is np.positive:
+                return x
+            if ufunc is np.square:
+                return x._pow(2)
+            if ufunc is np.sqrt:
+                return Interval(_down(np.sqrt(np.maximum(lo, 0))), _up(np.sqrt(np.maximum(hi, 0))))
+            if ufunc is np.reciprocal:
+                return x._reciprocal()
+            if ufunc is np.exp:
+                return x._monotone(np.exp)
+            if ufunc is np.log:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    return x._monotone(np.log)
+            if ufunc is np.sin:
+                return x._periodic(np.sin, np.pi / 2)
+            if ufunc is np.cos:
+                return x._periodic(np.cos, 0.0)
+            if ufunc is np.absolute:
+                straddle = (lo < 0) & (hi > 0)
+                return Interval(np.where(straddle, 0.0, np.minimum(np.abs(lo), np.abs(hi))),
+                                np.maximum(np.abs(lo), np.abs(hi)))
+            if ufunc is np.sign:
+                return Interval(np.sign(lo), np.sign(hi))
+            return NotImplemented
+
+        a, b = inputs
+        (alo, ahi), (blo, bhi) = _bounds(a), _bounds(b)
+        if ufunc is np.add:
+            return Interval(_down(alo + blo), _up(ahi + bhi))
+        if ufunc is np.subtract:
+            return Interval(_down(alo - bhi), _up(ahi - blo))
+        if ufunc is np.multiply:
+            return Interval(alo, ahi)._mul(b)
+        if ufunc is np.true_divide:
+            return Interval(alo, ahi)._mul(Interval(blo, bhi)._reciprocal())
+        if ufunc is np.power:
+            if isinstance(b, Interval):
+                return np.exp(b * np.log(a))
+            return Interval(alo, ahi)._pow(b)
+        if ufunc is np.maximum:
+            return Interval(np.maximum(alo, blo), np.maximum(ahi, bhi))
+        if ufunc is np.minimum:
+            return Interval(np.minimum(alo, blo), np.minimum(ahi, bhi))
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func in _FUNCTIONS:
+            return _FUNCTIONS[func](*args, **kwargs)
+        return NotImplemented
+
+    def __add__(self, other): return np.add(self, other)
+    def __radd__(self, other): return np.add(other, self)
+    def __sub__(self, other): return np.subtract(self, other)
+    def __rsub__(self, other): return np.subtract(other, self)
+    def __mul__(self, other): return np.multiply(self, other)
+    def __rmul__(self, other): return np.multiply(other, self)
+    def __truediv__(self, other): return np.true_divide(self, other)
+    def __rtruediv__(self, other): return np.true_divide(other, self)
+    def __pow__(self, other): return np.power(self, other)
+    def __neg__(self): return np.negative(self)
+    def __pos__(self): return self
+    def __abs__(self): return np.absolute(self)
+
+
+def _lift(arrays):
+    return [x if isinstance(x, Interval) else Interval(x) for x in arrays]
+
+
+def _stack(arrays, axis=0):
+    xs = _lift(arrays)
+    shape = np.broadcast_shapes(*[x.shape for x in xs])
+    return Interval(np.stack([np.broadcast_to(x.lo, shape) for x in xs], axis=axis),
+                    np.stack([np.broadcast_to(x.hi, shape) for x in xs], axis=axis))
+
+
+def _concatenate(arrays, axis=0):
+    xs = [x[...] for x in _lift(arrays)]
+    return Interval(np.concatenate([x.lo for x in xs], axis=axis), np.concatenate([x.hi for x in xs], axis=axis))
+
+
+def _slack(x, axis, terms):
+    # a bound on the rounding error of np.sum(x, axis): (terms - 1) eps / 2
+    # times the sum of |x| (doubled, to cover the rounding of the bound
+    # itself), plus a denormal per term for underflow
+    with np.errstate(invalid="ignore", over="ignore"):
+        slack = terms * np.finfo(float).eps * np.sum(np.abs(x), axis=axis) + terms * 5e-324
+    return np.where(np.isfinite(slack), slack, 0.0)
+
+
+def _sum(a, axis=None):
+    shape = a.shape
+    terms = np.prod(shape) if axis is None else np.prod([shape[i] for i in np.atleast_1d(axis)])
+    lo, hi = np.broadcast_to(a.lo, shape), np.broadcast_to(a.hi, shape)
+    return Interval(_down(np.sum(lo, axis=axis) - _slack(lo, axis, terms)),
+                    _up(np.sum(hi, axis=axis) + _slack(hi, axis, terms)))
+
+
+def mean_value(value, grad, centre, offset):
+    """
+    An enclosure of a function over boxes, tightened by the mean value form:
+    value (an enclosure over the boxes) intersected with
+    centre + grad . offset, where grad (..., n) encloses the gradient over
+    the boxes, centre the value at a point of each box, and offset is the
+    box minus that point. Nested Duals of Intervals give value and grad:
+
+        y = fn(Dual.seed(box))
+        mean_value(y.v, y.d, fn(Interval(box.mid)), box - Interval(box.mid))
+    """
+    form = centre + np.sum(grad * offset, axis=-1)
+    return Interval(np.maximum(value.lo, form.lo), np.minimum(value.hi, form.hi))
+
+
+def _extreme(reduce):
+    def extreme(a, axis=None):
+        return Interval(reduce(a.lo, axis=axis), reduce(a.hi, axis=axis))
+    return extreme
+
+
+def _where(cond, a, b):
+    (alo, ahi), (blo, bhi) = _bounds(a), _bounds(b)
+    return Interval(np.where(cond, alo, blo), np.where(cond, ahi, bhi))
+
+
+_FUNCTIONS = {
+    np.shape: lambda a: a.shape,
+    np.ndim: lambda a: a.ndim,
+    np.stack: _stack,
+    np.concatenate: _concatenate,
+    np.sum: _sum,
+    np.max: _extreme(np.max),
+    np.min: _extreme(np.min),
+    np.broadcast_to: lambda a, shape: Interval(np.broadcast_to(a.lo, shape), np.broadcast_to(a.hi, shape)),
+    np.expand_dims: lambda a, axis: Interval(np.expand_dims(a.lo, axis), np.expand_dims(a.hi, axis)),
+    np.where: _where,
+}
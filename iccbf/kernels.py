@@ -0,0 +1,138 @@
+"""
+Batched kernels for the open loop dynamics f of the examples.
+
+Each kernel writes f(X) for a batch of states X (M, n) into a caller's
+buffer out (M, n), with no temporary arrays: compiled with numba when it is
+installed, and with numpy's out= arguments otherwise.
+
+    acc_f(X, out)           [v0 - v, -F(v) / m]
+    spacecraft_f(X, out)    Clohessy-Wiltshire with the nonlinear gravity terms
+
+are Dynamics, which drop in for acc.f and spacecraft.f anywhere: arrays of
+floats go through the kernel, and anything else goes to the model's own f.
+simulate and simulate_adaptive write f into buffers they allocate once (the
+Euler step, and the Runge-Kutta stages), so given a Dynamics their right
+hand sides run through the kernel with no temporaries for f:
+
+    b = ICCBF(kernels.spacecraft_f, sc.g, sc.h, sc.alphas, sc.U)
+    simulate(kernels.spacecraft_f, sc.g, ActiveSetFilter(b, sc.V), X0, 100.0, 0.1)
+
+In the ICCBF only the f(X) of the Lie derivatives' last step (and of lie,
+for the CLF) is an array of floats. The jets of b_1 ... b_N, and the
+intervals of the set evaluators and the verifiers, still go to the model's
+f, so they gain nothing from the kernels.
+"""
+
+import numpy as np
+
+from . import acc, spacecraft as sc
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _acc_numpy(X, out):
+    v, fv, dd = X[:, 1], out[:, 1], out[:, 0]
+    np.subtract(acc.v0, v, out=dd)
+    # -(f0 + f1 v + f2 v^2) / m, by Horner
+    np.multiply(v, acc.f2, out=fv)
+    fv += acc.f1
+    fv *= v
+    fv += acc.f0
+    fv *= -1 / acc.m
+    return out
+
+
+def _acc_loop(X, out):
+    for i in range(X.shape[0]):
+        v = X[i, 1]
+        out[i, 0] = acc.v0 - v
+        out[i, 1] = -(acc.f0 + (acc.f1 + acc.f2 * v) * v) / acc.m
+    return out
+
+
+def _spacecraft_numpy(X, out):
+    px, py, vx, vy = X[:, 0], X[:, 1], X[:, 2], X[:, 3]
+    o0, o1, o2, o3, o4 = (out[:, j] for j in range(5))
+    n, r, mu = sc.n, sc.r, sc.mu
+
+    # k = mu / rc^3, with rc the chaser's distance from the Earth's centre
+    np.add(px, r, out=o4)
+    np.hypot(o4, py, out=o2)
+    np.power(o2, 3, out=o2)
+    np.divide(mu, o2, out=o2)
+    np.multiply(o2, py, out=o3)
+    np.multiply(o2, o4, out=o4)
+
+    # n^2 px + 2 n vy + mu / r^2 - k (r + px)
+    np.multiply(px, n**2, out=o2)
+    np.multiply(vy, 2 * n, out=o0)
+    o2 += o0
+    o2 += mu / r**2
+    o2 -= o4
+
+    # n^2 py - 2 n vx - k py
+    np.multiply(py, n**2, out=o4)
+    np.multiply(vx, 2 * n, out=o0)
+    o4 -= o0
+    np.subtract(o4, o3, out=o3)
+
+    o0[:] = vx
+    o1[:] = vy
+    o4[:] = sc.omega
+    return out
+
+
+def _spacecraft_loop(X, out):
+    n, r, mu = sc.n, sc.r, sc.mu
+    for i in range(X.shape[0]):
+        px, py, vx, vy = X[i, 0], X[i, 1], X[i, 2], X[i, 3]
+        rc = np.sqrt((r + px)**2 + py**2)
+        k = mu / rc**3
+        out[i, 0] = vx
+        out[i, 1] = vy
+        out[i, 2] = n**2 * px + 2 * n * vy + mu / r**2 - k * (r + px)
+        out[i, 3] = n**2 * py - 2 * n * vx - k * py
+        out[i, 4] = sc.omega
+    return out
+
+
+class Dynamics:
+    """
+    f(X, out=None) through a batched kernel for arrays of floats, and
+    through fallback (the model's f) for anything else. out defaults to a
+    new array.
+    """
+
+    def __init__(self, kernel, fallback, n):
+        self.kernel = kernel
+        self.fallback = fallback
+        self.n = n
+
+    def __call__(self, X, out=None):
+        if not (isinstance(X, np.ndarray) and X.dtype == np.float64):
+            return self.fallback(X)
+        X = np.ascontiguousarray(X)
+        if out is None:
+            out = np.empty((len(X), self.n))
+        return self.kernel(X, out)
+
+    def __reduce__(self):
+        # pickled by name, so process pools get the compiled kernel too
+        for name, value in globals().items():
+            if value is self:
+                return name
+        return object.__reduce__(self)
+
+
+if numba is not None:
+    _acc_kernel = numba.njit(cache=True)(_acc_loop)
+    _spacecraft_kernel = numba.njit(cache=True)(_spacecraft_loop)
+else:
+    _acc_kernel = _acc_numpy
+    _spacecraft_kernel = _spacecraft_numpy
+
+acc_f = Dynamics(_acc_kernel, acc.f, 2)
+spacecraft_f = Dynamics(_spacecraft_kernel, sc.f, 5)
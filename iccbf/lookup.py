@@ -0,0 +1,212 @@
+"""
+The ACC's ICCBF safety filter as a lookup table.
+
+With two states the filtered input u(d, v) can be tabulated offline and
+interpolated online. The table is a uniform grid of cells over the operating
+region, each cell with its own uniform grid of 2^k x 2^k subcells (k up to
+max_level), so a lookup is two index computations and a bilinear
+interpolation whatever the depth. Cells are refined where u bends (where the
+ICCBF constraint becomes active, where u_des is clipped).
+
+Interpolating u puts it off the constraint it was solved against, so the
+table holds the solution of the filter with the constraint tightened to
+
+    L_f b_N + L_g b_N u + alpha_N(b_N) >= margin
+
+and every subcell is checked over its whole area: an interval enclosure of
+the left hand side with the interpolated u (nested duals of intervals and
+interval.mean_value, as in verify) must be >= 0. So wherever the table
+answers, the interpolated u satisfies bdot_N + alpha_N(b_N) >= 0 (and is in
+U, as a convex combination of points of U). Subcells that fail at
+max_level, and states outside the region, are solved exactly with
+scalar_filter.
+
+For the ACC of the paper over ([0, 0], [100, 24]) the default table is
+about 230 KB, builds in a couple of seconds, and answers for 97% of the
+states where the filter is feasible (the rest, and the infeasible states,
+fall back).
+"""
+
+import numpy as np
+
+from .activeset import clip, scalar_filter
+from .autodiff import Dual
+from .interval import Interval, mean_value
+
+
+def _tightened(b, X, u_des, margin):
+    # the filter with bdot_N + alpha_N(b_N) >= margin, and the exact one's success
+    B, Lf, Lg = b.lie(X)
+    r = -(Lf + b.alphas[-1](B))
+    u_d = u_des(X)
+    feasible, _ = clip(u_d, Lg[:, 0], r, b.U.lo[0], b.U.hi[0])
+    _, u = clip(u_d, Lg[:, 0], r + margin, b.U.lo[0], b.U.hi[0])
+    return feasible, u
+
+
+def _bilinear(u00, u10, u01, u11, t, s):
+    return u00 + (u10 - u00) * t + ((u01 - u00) + (u11 - u10 - u01 + u00) * t) * s
+
+
+def _condition(b, lo, hi, corners):
+    # lower bounds of bdot_N + alpha_N(b_N) under the interpolated u over the
+    # boxes [lo, hi] (K, 2), with corners (K, 4) the u at the box's corners
+    box = Interval(lo, hi)
+    mid = Interval(box.mid)
+    width = hi - lo
+
+    def condition(X, t, s):
+        B, Lf, Lg = b.lie_levels(X)
+        u = _bilinear(*corners.T, t, s)
+        return Lf[-1] + Lg[-1][:, 0] * u + b.alphas[-1](B[-1])
+
+    X = Dual.seed(box)
+    m = condition(X, (X[:, 0] - lo[:, 0]) / width[:, 0], (X[:, 1] - lo[:, 1]) / width[:, 1])
+    m_mid = condition(mid, 0.5, 0.5)
+    return mean_value(m.v, m.d, m_mid, box - mid).lo
+
+
+class LookupTable:
+    """
+    The table built by build, as a controller for simulate: solve(X) returns
+    (success, U) with shapes (M,) and (M, 1), like ScalarFilter. Per state
+    status is left in self.status: "table", or "exact" for the states solved
+    exactly, and self.info counts the latter.
+
+    Cell (i, j) of the (ny, nx) grid has 2^level[i, j] subcells a side, its
+    (2^k + 1)^2 node values at values[offset[i, j]:] and the flags of its
+    subcells (True where the table answers) at ok[cell_offset[i, j]:], both
+    row by row.
+    """
+
+    def __init__(self, b, u_des, bounds, level, offset, cell_offset, values, ok, margin):
+        self.b = b
+        self.u_des = u_des
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.level = level
+        self.offset = offset
+        self.cell_offset = cell_offset
+        self.values = values
+        self.ok = ok
+        self.margin = margin
+        self.status = None
+        self.info = None
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.level, self.offset, self.cell_offset, self.values, self.ok))
+
+    def coverage(self):
+        # fraction of the region where the table answers
+        sides = 1 << self.level.ravel().astype(int)
+        areas = np.repeat(1.0 / sides**2, sides**2)
+        return float(np.sum(areas * self.ok) / self.level.size)
+
+    def solve(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        (x0, y0), (x1, y1) = self.bounds
+        ny, nx = self.level.shape
+
+        p = (X[:, 0] - x0) / (x1 - x0) * nx
+        q = (X[:, 1] - y0) / (y1 - y0) * ny
+        inside = (p >= 0) & (p <= nx) & (q >= 0) & (q <= ny)
+        p, q = np.where(inside, p, 0.0), np.where(inside, q, 0.0)
+        j, i = np.minimum(p.astype(int), nx - 1), np.minimum(q.astype(int), ny - 1)
+
+        n = 1 << self.level[i, j].astype(int)
+        p, q = (p - j) * n, (q - i) * n
+        a, c = np.minimum(p.astype(int), n - 1), np.minimum(q.astype(int), n - 1)
+        t, s = p - a, q - c
+
+        node = self.offset[i, j] + c * (n + 1) + a
+        v = self.values
+        u = _bilinear(v[node], v[node + 1], v[node + n + 1], v[node + n + 2], t, s)
+
+        success = np.ones(len(X), dtype=bool)
+        exact = ~(inside & self.ok[self.cell_offset[i, j] + c * n + a])
+        if exact.any():
+            success[exact], u[exact] = scalar_filter(self.b, X[exact], self.u_des(X[exact]))
+        self.status = np.where(exact, "exact", "table").astype(object)
+        self.info = dict(fallback=int(exact.sum()))
+        return success, u[:, None]
+
+    def save(self, path):
+        np.savez(path, bounds=self.bounds, level=self.level, offset=self.offset, cell_offset=self.cell_offset,
+                 values=self.values, ok=self.ok, margin=self.margin)
+
+    @classmethod
+    def load(cls, path, b, u_des):
+        data = np.load(path)
+        return cls(b, u_des, data["bounds"], data["level"], data["offset"], data["cell_offset"], data["values"],
+                   data["ok"], float(data["margin"]))
+
+
+def _subcells(lo, hi, n):
+    # nodes (K, n+1, n+1, 2) and subcell corners (K, n, n, 2) of K cells
+    r = np.linspace(0, 1, n + 1)
+    x = lo[:, None, 0] + r * (hi - lo)[:, None, 0]
+    y = lo[:, None, 1] + r * (hi - lo)[:, None, 1]
+    nodes = np.stack(np.broadcast_arrays(x[:, None, :], y[:, :, None]), axis=-1)
+    return nodes, nodes[:, :-1, :-1], nodes[:, 1:, 1:]
+
+
+def build(b, u_des, bounds, shape=(16, 16), max_level=5, margin=0.1, tol=1e-3, verbose=False):
+    """
+    Tabulates the filter of ScalarFilter(b, u_des) (b an ICCBF of the ACC,
+    or any system with two states and a Box U of one input) over the region
+    bounds = ([d_lo, v_lo], [d_hi, v_hi]) with shape = (ny, nx) cells.
+
+    Each cell is refined (halving its subcells) until every subcell passes,
+    up to max_level. A subcell passes if the constraint holds with the
+    interpolated u over all of it, and the interpolated u is within tol of
+    the tightened filter's u at its centre. Cells where the exact filter is
+    infeasible at every node are left to it. margin is in the units of
+    bdot_N: a larger one certifies more of the region, further from the
+    exact filter's u.
+
+        table = build(ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U), acc.u_des, ([0, 0], [100, 24]))
+        success, u = table.solve(X)
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    ny, nx = shape
+    x = np.linspace(bounds[0, 0], bounds[1, 0], nx + 1)
+    y = np.linspace(bounds[0, 1], bounds[1, 1], ny + 1)
+    lo = np.stack(np.meshgrid(x[:-1], y[:-1]), axis=-1).reshape(-1, 2)
+    hi = np.stack(np.meshgrid(x[1:], y[1:]), axis=-1).reshape(-1, 2)
+
+    level = np.zeros(ny * nx, dtype=np.int8)
+    values, ok = [None] * (ny * nx), [None] * (ny * nx)
+    pending = np.arange(ny * nx)
+
+    for k in range(max_level + 1):
+        n = 1 << k
+        K = len(pending)
+        nodes, sub_lo, sub_hi = _subcells(lo[pending], hi[pending], n)
+        feasible, u = _tightened(b, nodes.reshape(-1, 2), u_des, margin)
+        u = u.astype(np.float32).reshape(K, n + 1, n + 1)
+        hopeless = ~feasible.reshape(K, -1).any(axis=1)
+
+        corners = np.stack([u[:, :-1, :-1], u[:, :-1, 1:], u[:, 1:, :-1], u[:, 1:, 1:]], axis=-1).astype(float)
+        passed = _condition(b, sub_lo.reshape(-1, 2), sub_hi.reshape(-1, 2), corners.reshape(-1, 4)) >= 0
+
+        centre = 0.5 * (sub_lo + sub_hi).reshape(-1, 2)
+        _, exact = _tightened(b, centre, u_des, margin)
+        passed &= np.abs(corners.reshape(-1, 4).mean(axis=1) - exact) <= tol
+        passed = passed.reshape(K, n * n)
+
+        done = hopeless | passed.all(axis=1) | (k == max_level)
+        for cell, u_cell, ok_cell, stop, none in zip(pending, u, passed, done, hopeless):
+            if stop:
+                level[cell] = 0 if none else k
+                values[cell] = u_cell[:1, :1].repeat(2, 0).repeat(2, 1).ravel() if none else u_cell.ravel()
+                ok[cell] = np.zeros(1, dtype=bool) if none else ok_cell
+        pending = pending[~done]
+        if verbose:
+            print(f"level {k}: {K} cells, {int(done.sum())} done, {int((~passed).sum())} subcells failed")
+        if not len(pending):
+            break
+
+    offset = np.cumsum([0] + [len(v) for v in values[:-1]]).astype(np.int32)
+    cell_offset = np.cumsum([0] + [len(f) for f in ok[:-1]]).astype(np.int32)
+    return LookupTable(b, u_des, bounds, level.reshape(ny, nx), offset.reshape(ny, nx),
+                       cell_offset.reshape(ny, nx), np.concatenate(values), np.concatenate(ok), margin)
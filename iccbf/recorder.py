@@ -0,0 +1,227 @@
+"""
+Trajectory recording for the ensemble simulations.
+
+simulate in docking.jl push!es every state, input and time into vectors of
+small vectors, and the plots then take every 100th sample. A Recorder
+instead writes rows of columns
+
+    t       (K,)     time of each trajectory (stopped ones keep their last)
+    x       (K, n)   state
+    u       (K, m)   input (nan where the trajectory is not running)
+    h       (K,)     h(x), if h is given
+    b       (K,)     b_N(x), if an ICCBF b is given
+    status  (K,)     index into STATUS
+
+into preallocated chunks of rows, decimated while recording by a rule:
+Every(k) keeps every k-th step, MinMax(window) keeps the elementwise minimum
+and maximum of each window of steps (so the envelope of every signal
+survives). When the rows outgrow max_bytes, the rule is coarsened by 2 and
+the rows recorded so far are merged to match, so memory stays bounded for
+runs of any length. With a sink (e.g. a store.TrajectoryWriter), full chunks
+are handed to the sink instead, and only one chunk is held in memory.
+"""
+
+import numpy as np
+
+
+STATUS = ("running", "done", "failed", "t_max")
+
+
+class Every:
+    """
+    Keeps the rows of every k-th step.
+    """
+
+    def __init__(self, k=1):
+        self.k = k
+
+    def __repr__(self):
+        return f"Every({self.k})"
+
+
+class MinMax:
+    """
+    Keeps two rows per window of steps: the elementwise minimum and maximum
+    of every column over the window (t gives its first and last time).
+    """
+
+    def __init__(self, window=100):
+        self.window = window
+
+    def __repr__(self):
+        return f"MinMax({self.window})"
+
+
+class Recorder:
+    """
+    Rows of a simulation, decimated by rule (Every(1) keeps everything).
+
+        rec = Recorder(h=sc.h, b=iccbf, rule=MinMax(100))
+        simulate(sc.f, sc.g, controller, X0, 300, 1e-3, done=sc.docked, recorder=rec)
+        rec["x"][:, 0]      # (rows, n) states of the first trajectory
+    """
+
+    def __init__(self, h=None, b=None, rule=None, chunk=1024, max_bytes=1 << 28, sink=None):
+        self.h = h
+        self.b = b
+        self.rule = Every(1) if rule is None else rule
+        self.chunk = chunk
+        self.max_bytes = max_bytes
+        self.sink = sink
+
+        self.step = 0
+        self.rows = 0
+        self.shapes = None
+        self._chunks = []
+        self._fill = 0
+        self._lo = self._hi = None
+        self._count = 0
+
+    def _allocate(self):
+        return {name: np.empty((self.chunk,) + shape, dtype=np.int8 if name == "status" else float)
+                for name, shape in self.shapes.items()}
+
+    def _row(self, t, X, U, status):
+        # one row of columns for the states X (K, n)
+        K = len(X)
+        row = dict(t=np.broadcast_to(np.asarray(t, dtype=float), (K,)), x=X, u=U,
+                   status=np.array([STATUS.index(s) for s in status], dtype=np.int8))
+        if self.h is not None:
+            row["h"] = self.h(X)
+        if self.b is not None:
+            row["b"] = self.b.levels(X)[-1]
+        return row
+
+    def record(self, t, X, U, status, force=False):
+        """
+        Records a step: time t (scalar or (K,)), states X (K, n), inputs
+        U (K, m) and status (K,) strings from STATUS. With force, Every keeps
+        the row whatever the step (for the final states).
+        """
+        step = self.step
+        self.step += 1
+
+        # before starting a new chunk past max_bytes, make room instead
+        if self._count == 0 and self.sink is None and self._chunks:
+            rows = 1 if isinstance(self.rule, Every) else 2
+            if self._fill + rows > self.chunk and self.nbytes + self.nbytes // len(self._chunks) > self.max_bytes:
+                self._coarsen()
+
+        if isinstance(self.rule, Every):
+            if force or step % self.rule.k == 0:
+                self._write(self._row(t, X, U, status))
+            return
+
+        # MinMax: fold the step into the window, and write it out when full
+        row = self._row(t, X, U, status)
+        if self._count == 0:
+            self._lo = {name: np.array(v) for name, v in row.items()}
+            self._hi = {name: np.array(v) for name, v in row.items()}
+        else:
+            for name, v in row.items():
+                np.fmin(self._lo[name], v, out=self._lo[name])
+                np.fmax(self._hi[name], v, out=self._hi[name])
+        self._count += 1
+        if self._count == self.rule.window:
+            self._write(self._lo)
+            self._write(self._hi)
+            self._count = 0
+
+    def _write(self, row):
+        if self.shapes is None:
+            self.shapes = {name: np.shape(v) for name, v in row.items()}
+            self._chunks.append(self._allocate())
+
+        if self._fill == self.chunk:
+            if self.sink is not None:
+                self.sink.write(self._chunks[-1])
+            else:
+                self._chunks.append(self._allocate())
+            self._fill = 0
+
+        c = self._chunks[-1]
+        for name, v in row.items():
+            c[name][self._fill] = v
+        self._fill += 1
+        self.rows += 1
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for c in self._chunks for a in c.values())
+
+    def _coarsen(self):
+        # halve the rows in memory and coarsen the rule to match
+        cols = {name: self._gather(name) for name in self.shapes}
+        n = len(cols["t"])
+
+        if isinstance(self.rule, Every):
+            cols = {name: v[::2] for name, v in cols.items()}
+            self.rule = Every(2 * self.rule.k)
+        else:
+            # merge pairs of windows; an unpaired last window becomes the
+            # start of the next one
+            pairs = n // 4
+            lo = {name: v[0::2] for name, v in cols.items()}
+            hi = {name: v[1::2] for name, v in cols.items()}
+            merged = {}
+            for name in cols:
+                a, b = lo[name][:2 * pairs:2], lo[name][1:2 * pairs:2]
+                c, d = hi[name][:2 * pairs:2], hi[name][1:2 * pairs:2]
+                out = np.empty((2 * pairs,) + self.shapes[name], dtype=cols[name].dtype)
+                out[0::2] = np.fmin(a, b)
+                out[1::2] = np.fmax(c, d)
+                merged[name] = out
+
+            if n // 2 > 2 * pairs:
+                self._lo = {name: np.array(v[-1]) for name, v in lo.items()}
+                self._hi = {name: np.array(v[-1]) for name, v in hi.items()}
+                self._count = self.rule.window
+            cols = merged
+            self.rule = MinMax(2 * self.rule.window)
+
+        self._chunks, self._fill, self.rows = [], self.chunk, 0
+        for i in range(0, len(cols["t"]), self.chunk):
+            self._chunks.append(self._allocate())
+            self._fill = min(self.chunk, len(cols["t"]) - i)
+            for name, v in cols.items():
+                self._chunks[-1][name][:self._fill] = v[i:i + self._fill]
+            self.rows += self._fill
+        if not self._chunks:
+            self._chunks.append(self._allocate())
+            self._fill = 0
+
+    def flush(self):
+        """
+        Writes out a partly filled MinMax window, and with a sink, the rows
+        still in memory.
+        """
+        if self._count:
+            self._write(self._lo)
+            self._write(self._hi)
+            self._count = 0
+        if self.sink is not None and self._chunks and self._fill:
+            self.sink.write({name: v[:self._fill] for name, v in self._chunks[-1].items()})
+            self._fill = 0
+
+    def chunks(self, name):
+        """
+        Views of the recorded rows of a column, one per chunk.
+        """
+        for i, c in enumerate(self._chunks):
+            yield c[name][:self._fill if i == len(self._chunks) - 1 else self.chunk]
+
+    def _gather(self, name):
+        parts = list(self.chunks(name))
+        if not parts:
+            return np.empty((0,) + self.shapes[name]) if self.shapes else np.empty(0)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def __getitem__(self, name):
+        """
+        A column as one array of shape (rows, K, ...): a view when it fits in
+        one chunk, otherwise a copy of the (decimated) rows.
+        """
+        return self._gather(name)
+
+    def __len__(self):
+        return self.rows
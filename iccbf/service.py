@@ -0,0 +1,234 @@
+"""
+The safety filter as a local asyncio service.
+
+Clients send states over TCP, one JSON object per line, and get the safe
+inputs back on one line each:
+
+    {"id": 7, "x": [0.1, -0.01, 0, 0, 0]}      ->  {"id": 7, "success": true, "u": [...]}
+    {"id": 8, "x": [[...], [...]]}             ->  {"id": 8, "success": [...], "u": [[...], [...]]}
+    {"id": 9, "stats": true}                   ->  {"id": 9, "stats": {...}}
+
+Requests from every connection go into one queue. The batcher takes what has
+arrived, waits up to `window` seconds (or until max_batch states) for more,
+and solves them all with one controller.solve (a thread, so the loop keeps
+reading requests meanwhile; while a batch is solved the next one fills up).
+A connection may send more requests before the replies come back: replies
+carry the request's id, and can come back out of order.
+
+Latency is timed per request, from the line being read to the reply being
+written, over the last `history` requests: stats has p50, p99 and max (in
+ms), the number of requests, batches and states, and the mean batch size.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+
+def _percentiles(latency):
+    if not latency:
+        return dict(p50=None, p99=None, max=None)
+    p50, p99 = np.percentile(latency, [50, 99])
+    return dict(p50=1e3 * p50, p99=1e3 * p99, max=1e3 * max(latency))
+
+
+class FilterService:
+    """
+    Serves controller.solve (any controller of simulate, e.g. an
+    ActiveSetFilter) for states of n entries.
+
+        service = FilterService(ActiveSetFilter(b, sc.V), 5)
+        asyncio.run(service.serve("127.0.0.1", 8765))
+    """
+
+    def __init__(self, controller, n, window=5e-4, max_batch=4096, history=100000):
+        self.controller = controller
+        self.n = n
+        self.window = window
+        self.max_batch = max_batch
+
+        self.latency = deque(maxlen=history)
+        self.requests = 0
+        self.batches = 0
+        self.states = 0
+        self._queue = None
+
+    def stats(self):
+        return dict(_percentiles(self.latency), requests=self.requests, batches=self.batches, states=self.states,
+                    batch=self.states / max(self.batches, 1))
+
+    async def serve(self, host="127.0.0.1", port=8765, ready=None):
+        """
+        Runs the service until cancelled. ready, if given, is an
+        asyncio.Future set to the bound (host, port) once it is listening
+        (port=0 picks a free port).
+        """
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        server = await asyncio.start_server(self._connection, host, port)
+        if ready is not None:
+            ready.set_result(server.sockets[0].getsockname()[:2])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                pending.append(item)
+                size += len(item[0])
+
+            X = np.concatenate([x for x, _ in pending])
+            try:
+                success, U = await loop.run_in_executor(None, self.controller.solve, X)
+            except Exception as error:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.states += len(X)
+            start = 0
+            for x, future in pending:
+                stop = start + len(x)
+                if not future.done():
+                    future.set_result((success[start:stop], U[start:stop]))
+                start = stop
+
+    async def _request(self, message, writer):
+        start = time.perf_counter()
+        reply = dict(id=None)
+        try:
+            request = json.loads(message)
+            reply["id"] = request.get("id")
+            if request.get("stats"):
+                reply["stats"] = self.stats()
+            else:
+                x = np.asarray(request["x"], dtype=float)
+                X = np.atleast_2d(x)
+                if X.ndim != 2 or X.shape[1] != self.n:
+                    raise ValueError(f"x must have shape ({self.n},) or (k, {self.n}), not {x.shape}")
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put((X, future))
+                success, U = await future
+                if x.ndim == 1:
+                    success, U = success[0], U[0]
+                reply.update(success=np.asarray(success).tolist(), u=U.tolist())
+        except Exception as error:
+            reply = dict(id=reply["id"], error=f"{type(error).__name__}: {error}")
+
+        writer.write(json.dumps(reply).encode() + b"\n")
+        if "u" in reply:
+            self.requests += 1
+            self.latency.append(time.perf_counter() - start)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                message = await reader.readline()
+                if not message:
+                    break
+                task = asyncio.create_task(self._request(message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+class FilterClient:
+    """
+    A connection to a FilterService. Requests can be made concurrently from
+    one client (they are pipelined on the connection):
+
+        client = await FilterClient.connect("127.0.0.1", 8765)
+        success, u = await client.solve(x)
+        print(await client.stats())
+        await client.close()
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next = 0
+        self._pending = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await self.reader.readline()
+                if not message:
+                    break
+                reply = json.loads(message)
+                future = self._pending.pop(reply["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("the service closed the connection"))
+
+    async def _call(self, request):
+        self._next += 1
+        request["id"] = self._next
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next] = future
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        reply = await future
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply
+
+    async def solve(self, x):
+        """
+        (success, u) for the state x (n,), or for the states x (k, n).
+        """
+        reply = await self._call(dict(x=np.asarray(x, dtype=float).tolist()))
+        return np.asarray(reply["success"]), np.asarray(reply["u"])
+
+    async def stats(self):
+        return (await self._call(dict(stats=True)))["stats"]
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._receiver.cancel()
@@ -0,0 +1,269 @@
+"""
+The sets S, C_1, ..., C_N of an ICCBF on a 2D grid, and their boundaries.
+
+evaluate computes b_0 ... b_N over a grid in square tiles, each tile one
+batched call of ICCBF.levels. With a key (anything json serialisable that
+pins down the system, e.g. its parameters) and a cache directory, every tile
+is stored under a hash of the key, the grid and the tile, so changing a
+parameter only recomputes the tiles of the new parameters, and going back
+recomputes nothing.
+
+contours extracts the zero level set of a grid of values with marching
+squares, joined into polylines, and to_svg draws them. refine finds the same
+boundaries as contours on a fine grid, evaluating b_i only near them.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def _tile_key(key, x_range, y_range, shape, N, tile):
+    text = json.dumps(dict(key=key, x_range=list(map(float, x_range)), y_range=list(map(float, y_range)),
+                           shape=list(shape), N=N, tile=list(tile)), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def evaluate(b, x_range, y_range, shape, N=None, to_state=None, key=None, cache_dir=None, tile=256):
+    """
+    b_0 ... b_N at the nodes of a grid over x_range x y_range with shape =
+    (ny, nx) nodes. to_state(x, y) -> (M, n) maps grid points to states (by
+    default the state is (x, y)).
+
+    Returns (xs (nx,), ys (ny,), B (N+1, ny, nx)).
+    """
+    N = b.N if N is None else N
+    ny, nx = shape
+    xs = np.linspace(x_range[0], x_range[1], nx)
+    ys = np.linspace(y_range[0], y_range[1], ny)
+    B = np.empty((N + 1, ny, nx))
+
+    for i in range(0, ny, tile):
+        for j in range(0, nx, tile):
+            path = None
+            if key is not None and cache_dir is not None:
+                name = _tile_key(key, x_range, y_range, shape, N, (i, j, tile))
+                path = os.path.join(cache_dir, name + ".npy")
+                if os.path.exists(path):
+                    B[:, i:i + tile, j:j + tile] = np.load(path)
+                    continue
+
+            x, y = np.meshgrid(xs[j:j + tile], ys[i:i + tile])
+            X = np.column_stack([x.ravel(), y.ravel()]) if to_state is None else to_state(x.ravel(), y.ravel())
+            values = b.levels(X, N).reshape((N + 1,) + x.shape)
+            B[:, i:i + tile, j:j + tile] = values
+
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.save(path, values)
+    return xs, ys, B
+
+
+# marching squares: for each case (corners above the level as bits
+# 1 = (i, j), 2 = (i, j+1), 4 = (i+1, j+1), 8 = (i+1, j)), the pairs of cell
+# edges crossed (0 bottom, 1 right, 2 top, 3 left). 5 and 10 are saddles,
+# split by the value at the centre
+_SEGMENTS = {
+    1: [(3, 0)], 2: [(0, 1)], 3: [(3, 1)], 4: [(1, 2)], 6: [(0, 2)], 7: [(3, 2)],
+    8: [(2, 3)], 9: [(2, 0)], 11: [(2, 1)], 12: [(1, 3)], 13: [(1, 0)], 14: [(0, 3)],
+    5: [(3, 0), (1, 2)], 10: [(0, 1), (2, 3)],
+}
+_SADDLES = {5: [(3, 2), (1, 0)], 10: [(0, 3), (2, 1)]}
+
+
+def _march(i, j, z, nx, ny):
+    # marching squares on the cells (i, j) of a grid of ny x nx nodes, with
+    # corner values z (4, K) in the order of the case bits. Returns the ids of
+    # the two grid edges each segment joins, and the crossing point on every
+    # such edge in grid coordinates (column, row)
+    above = z > 0
+    case = above[0] * 1 + above[1] * 2 + above[2] * 4 + above[3] * 8
+    valid = np.all(np.isfinite(z), axis=0)
+    centre = z.mean(axis=0)
+
+    # edges: horizontal (i, j)-(i, j+1) first, then vertical (i, j)-(i+1, j),
+    # with the crossing as a fraction s along the edge
+    def edge(e, i, j, zc):
+        ids = np.select([e == 0, e == 1, e == 2], [i * (nx - 1) + j, ny * (nx - 1) + i * nx + j + 1,
+                                                   (i + 1) * (nx - 1) + j], ny * (nx - 1) + i * nx + j)
+        a = np.select([e == 0, e == 1, e == 2], [zc[0], zc[1], zc[3]], zc[0])
+        b = np.select([e == 0, e == 1, e == 2], [zc[1], zc[2], zc[2]], zc[3])
+        s = a / (a - b)
+        col = j + np.select([e == 0, e == 1, e == 2], [s, 1, s], 0)
+        row = i + np.select([e == 0, e == 1, e == 2], [0, s, 1], s)
+        return ids, np.column_stack([col, row])
+
+    starts, ends, points = [], [], {}
+    for c, segments in _SEGMENTS.items():
+        k = np.flatnonzero((case == c) & valid)
+        if len(k) == 0:
+            continue
+        if c in _SADDLES:
+            # with the centre above, the corners above are joined through it
+            flip = centre[k] > 0
+            pairs = [(np.where(flip, a2, a), np.where(flip, b2, b)) for (a, b), (a2, b2) in zip(segments, _SADDLES[c])]
+        else:
+            pairs = [(np.full(len(k), a), np.full(len(k), b)) for a, b in segments]
+        for ea, eb in pairs:
+            for e, out in ((ea, starts), (eb, ends)):
+                ids, p = edge(e, i[k], j[k], z[:, k])
+                out.append(ids)
+                points.update(zip(ids.tolist(), p))
+    if not starts:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), points
+    return np.concatenate(starts), np.concatenate(ends), points
+
+
+def _join(starts, ends, points):
+    # chains the segments (every edge is shared by at most two) into
+    # polylines of the points of their edges
+    neighbours = {}
+    for a, b in zip(starts.tolist(), ends.tolist()):
+        neighbours.setdefault(a, []).append(b)
+        neighbours.setdefault(b, []).append(a)
+
+    lines, seen = [], set()
+    # open curves start at edges with one neighbour, then the closed ones
+    order = [e for e, n in neighbours.items() if len(n) == 1] + list(neighbours)
+    for first in order:
+        if first in seen:
+            continue
+        line, prev, cur = [first], None, first
+        seen.add(first)
+        while True:
+            nxt = [e for e in neighbours[cur] if e != prev and e not in seen]
+            if not nxt:
+                if prev is not None and first in neighbours[cur] and len(line) > 2:
+                    line.append(first)
+                break
+            prev, cur = cur, nxt[0]
+            seen.add(cur)
+            line.append(cur)
+        lines.append(np.array([points[e] for e in line]))
+    return lines
+
+
+def _to_xy(lines, xs, ys):
+    # grid coordinates (column, row) to (x, y) on a uniform grid
+    dx, dy = xs[1] - xs[0], ys[1] - ys[0]
+    return [np.column_stack([xs[0] + line[:, 0] * dx, ys[0] + line[:, 1] * dy]) for line in lines]
+
+
+def contours(xs, ys, Z, level=0.0):
+    """
+    The curves where Z (ny, nx) = level, as a list of (k, 2) arrays of (x, y)
+    points; closed curves repeat their first point.
+    """
+    Z = np.asarray(Z, dtype=float) - level
+    ny, nx = Z.shape
+    i, j = np.meshgrid(np.arange(ny - 1), np.arange(nx - 1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    z = np.stack([Z[i, j], Z[i, j + 1], Z[i + 1, j + 1], Z[i + 1, j]])
+
+    # only the cells the curves go through
+    crossed = (z.min(axis=0) <= 0) & (z.max(axis=0) > 0)
+    i, j, z = i[crossed], j[crossed], z[:, crossed]
+    return _to_xy(_join(*_march(i, j, z, nx, ny)), xs, ys)
+
+
+class _Nodes:
+    # b_0 ... b_N at nodes of the finest grid, evaluated on demand: sorted
+    # node ids and their values (N+1, K)
+
+    def __init__(self, b, N, xs, ys, to_state):
+        self.b, self.N, self.xs, self.ys, self.to_state = b, N, xs, ys, to_state
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros((N + 1, 0))
+
+    def __call__(self, i, j):
+        ids = i.astype(np.int64) * len(self.xs) + j
+        new = np.setdiff1d(ids, self.ids)
+        if len(new):
+            ni, nj = new // len(self.xs), new % len(self.xs)
+            x, y = self.xs[nj], self.ys[ni]
+            X = np.column_stack([x, y]) if self.to_state is None else self.to_state(x, y)
+            ids_all = np.r_[self.ids, new]
+            values = np.concatenate([self.values, self.b.levels(X, self.N)], axis=1)
+            order = np.argsort(ids_all)
+            self.ids, self.values = ids_all[order], values[:, order]
+        return self.values[:, np.searchsorted(self.ids, ids)]
+
+
+def refine(b, x_range, y_range, resolution=4096, coarse=16, N=None, to_state=None):
+    """
+    The boundaries of S, C_1, ..., C_N and C* over x_range x y_range, as
+    contours would find them on a uniform grid of resolution^2 cells, from a
+    quadtree: starting from coarse^2 cells, a cell is split while some b_i
+    changes sign over its corners and centre, or its centre value is within
+    the spread of its corner values of zero. resolution / coarse must be a
+    power of 2.
+
+    Returns (lines, stats): lines[i] the curves of b_i = 0 and lines[N+1]
+    those of C* (as lists of (k, 2) arrays), and stats the evaluations, the
+    uniform grid's (resolution+1)^2 and the cells at each level.
+    """
+    N = b.N if N is None else N
+    step = resolution // coarse
+    if step * coarse != resolution or step & (step - 1):
+        raise ValueError("resolution / coarse must be a power of 2")
+
+    xs = np.linspace(x_range[0], x_range[1], resolution + 1)
+    ys = np.linspace(y_range[0], y_range[1], resolution + 1)
+    nodes = _Nodes(b, N, xs, ys, to_state)
+
+    i, j = np.meshgrid(np.arange(coarse) * step, np.arange(coarse) * step, indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    cells = []
+
+    while step > 1:
+        cells.append(len(i))
+        h = step // 2
+        corners = np.stack([nodes(i, j), nodes(i, j + step), nodes(i + step, j + step), nodes(i + step, j)])
+        centre = nodes(i + h, j + h)
+
+        # (4, N+1, K) and (N+1, K): with C* as one more level
+        corners = np.concatenate([corners, corners.min(axis=1, keepdims=True)], axis=1)
+        centre = np.concatenate([centre, centre.min(axis=0, keepdims=True)])
+        lo = np.minimum(corners.min(axis=0), centre)
+        hi = np.maximum(corners.max(axis=0), centre)
+        spread = np.abs(corners - centre).max(axis=0)
+        split = np.any(((lo <= 0) & (hi > 0)) | (np.abs(centre) <= spread), axis=0)
+
+        i, j = i[split], j[split]
+        i = np.concatenate([i, i, i + h, i + h])
+        j = np.concatenate([j, j + h, j, j + h])
+        step = h
+    cells.append(len(i))
+
+    # the finest cells: marching squares on each level set
+    z = np.stack([nodes(i, j), nodes(i, j + 1), nodes(i + 1, j + 1), nodes(i + 1, j)])
+    z = np.concatenate([z, z.min(axis=1, keepdims=True)], axis=1)
+    n = resolution + 1
+    lines = [_to_xy(_join(*_march(i, j, z[:, level], n, n)), xs, ys) for level in range(N + 2)]
+
+    stats = dict(evaluations=len(nodes.ids), uniform=n * n, cells=cells)
+    return lines, stats
+
+
+def to_svg(layers, x_range, y_range, width=600, height=400):
+    """
+    An svg drawing of layers, a list of (lines, style) with lines from
+    contours and style a dict of svg attributes (e.g. stroke="blue"), with
+    x_range x y_range filling the width x height picture.
+    """
+    sx = width / (x_range[1] - x_range[0])
+    sy = height / (y_range[1] - y_range[0])
+
+    paths = []
+    for lines, style in layers:
+        attrs = " ".join(f'{k.replace("_", "-")}="{v}"' for k, v in dict(dict(fill="none", stroke="black"), **style).items())
+        for line in lines:
+            px = (line[:, 0] - x_range[0]) * sx
+            py = height - (line[:, 1] - y_range[0]) * sy
+            d = "M" + " L".join(f"{x:.2f},{y:.2f}" for x, y in zip(px, py))
+            paths.append(f'<path d="{d}" {attrs}/>')
+
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n' + "\n".join(paths) + "\n</svg>\n")
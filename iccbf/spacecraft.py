@@ -0,0 +1,243 @@
+"""
+Spacecraft docking example, a port of docking/spacecraft.jl
+
+states:
+    x[0] - x position of chaser [km]
+    x[1] - y position of chaser [km]
+    x[2] - x velocity of chaser [km/s]
+    x[3] - y velocity of chaser [km/s]
+    x[4] - angle of port
+
+control inputs:
+    u[0] - x force [N]
+    u[1] - y force [N]
+
+safety constraint:
+    line of sight constraint
+"""
+
+import numpy as np
+
+from .construction import Analytic, Linear
+from .inputs import L1Ball
+
+
+mu = 398600.0          # gravitational parameter of Earth [km^3/s^2]
+r = 6371 + 400         # orbital radius [km]
+n = np.sqrt(mu / r**3) # angular velocity of target around Earth [rad/s]
+
+mc = 1000.0            # mass of chaser [kg]
+mcinv = 1.0 / mc
+
+umax = 0.25
+U = L1Ball(umax)
+
+rp = 2.4e-3            # port radius [km]
+rf = 3.0e-3            # finish sims when you get this far [km]
+
+# control matrix
+B = np.zeros((5, 2))
+B[2, 0] = mcinv
+B[3, 1] = mcinv
+
+gamma = 10 * np.pi / 180  # LOS constraint angle
+cosgamma = np.cos(gamma)
+
+omega = 0.6 * np.pi / 180 # rotation rate of ISS
+
+
+def f(X):
+    # open-loop dynamics
+    px, py, vx, vy = X[:, 0], X[:, 1], X[:, 2], X[:, 3]
+
+    rc = np.sqrt((r + px)**2 + py**2)
+
+    return np.stack([
+        vx,
+        vy,
+        n**2 * px + 2 * n * vy + mu / r**2 - mu * (r + px) / rc**3,
+        n**2 * py - 2 * n * vx - mu * py / rc**3,
+        omega + 0 * px,
+    ], axis=-1)
+
+
+def g(X):
+    # constant
+    return B
+
+
+def h(X):
+    # line of sight constraint: the angle θ between the port axis and the
+    # chaser's position relative to the port must be below γ, so
+    # h(x) = cos(θ) - cos(γ) >= 0, rescaled by 100
+    c, s = np.cos(X[:, 4]), np.sin(X[:, 4])
+
+    # chaser relative to the port
+    dx = X[:, 0] - rp * c
+    dy = X[:, 1] - rp * s
+
+    return 100 * ((dx * c + dy * s) / np.sqrt(dx**2 + dy**2) - cosgamma)
+
+
+def port_distance(X):
+    # |p|^2 - rf^2: negative within rf of the port
+    return X[:, 0]**2 + X[:, 1]**2 - rf**2
+
+
+def docked(X):
+    # within rf of the port: the simulations stop here
+    return port_distance(X) < 0
+
+
+def V(X):
+    # the desired velocity is -0.1 times the position relative to the port
+    px, py, vx, vy, theta = X[:, 0], X[:, 1], X[:, 2], X[:, 3], X[:, 4]
+
+    ex = px - rp * np.cos(theta)
+    ey = py - rp * np.sin(theta)
+
+    # rescaled
+    return 1e4 * ((vx + 0.1 * ex)**2 + (vy + 0.1 * ey)**2)
+
+
+# gains used in docking.jl
+alphas = [Linear(0.25), Linear(0.85), Linear(0.05)]
+
+
+class LineOfSight:
+    """
+    h and V with their analytic gradients, for batches of states, computed
+    in buffers allocated once instead of in temporaries (the h of
+    docking.jl allocates vhat, dr and drhat on every call). Values and
+    gradients are written to out / grad if given, and are otherwise views of
+    the buffers, overwritten by the next call.
+
+        los = LineOfSight(1024)
+        h, dh = los.h_gradient(X)    # (M,) and (M, 5)
+
+    h_analytic and V_analytic wrap these for lie, so the filters take the
+    CLF's L_f V and L_g V from V_gradient:
+
+        ActiveSetFilter(ICCBF(f, g, h, alphas, U), V_analytic)
+
+    h_gradient only replaces the jets where h itself is differentiated
+    (lie(h_analytic, f, g, X), ClippedCBFQP): b_1 ... b_N of an ICCBF need
+    higher derivatives of h, which still come from the jets.
+    """
+
+    def __init__(self, M=1):
+        self.size = 0
+        self._grow(M)
+
+    def _grow(self, M):
+        self.size = M
+        self._work = np.empty((10, M))
+        self._value = np.empty(M)
+        self._grad = np.empty((M, 5))
+
+    def _relative(self, X):
+        # cos and sin of the port angle, and the chaser relative to the port
+        M = len(X)
+        if M > self.size:
+            self._grow(M)
+        c, s, dx, dy = self._work[:4, :M]
+        np.cos(X[:, 4], out=c)
+        np.sin(X[:, 4], out=s)
+        np.multiply(c, rp, out=dx)
+        np.subtract(X[:, 0], dx, out=dx)
+        np.multiply(s, rp, out=dy)
+        np.subtract(X[:, 1], dy, out=dy)
+        return M, c, s, dx, dy
+
+    def _los(self, X, out):
+        # h, with the terms its gradient reuses
+        M, c, s, dx, dy = self._relative(X)
+        rho, q, tmp = self._work[4:7, :M]
+        np.hypot(dx, dy, out=rho)
+        np.multiply(dx, c, out=q)
+        np.multiply(dy, s, out=tmp)
+        q += tmp
+
+        value = self._value[:M] if out is None else out
+        np.divide(q, rho, out=value)
+        value -= cosgamma
+        value *= 100
+        return value, (M, c, s, dx, dy, rho, q)
+
+    def h(self, X, out=None):
+        return self._los(X, out)[0]
+
+    def h_gradient(self, X, out=None, grad=None):
+        """
+        h and dh/dx, (M,) and (M, 5). With rho = |p - p_port| and q the
+        distance along the port axis, h = 100 (q / rho - cos(gamma)).
+        """
+        value, (M, c, s, dx, dy, rho, q) = self._los(X, out)
+        r2, r3, w, tmp = self._work[6:10, :M]
+        np.multiply(rho, rho, out=r2)
+        np.multiply(r2, rho, out=r3)
+
+        grad = self._grad[:M] if grad is None else grad
+        grad[:, 2:4] = 0
+
+        # d(q/rho)/dp = (axis rho^2 - q (p - p_port)) / rho^3
+        for j, (axis, d) in enumerate(((c, dx), (s, dy))):
+            column = grad[:, j]
+            np.multiply(axis, r2, out=column)
+            np.multiply(q, d, out=tmp)
+            column -= tmp
+            column /= r3
+            column *= 100
+
+        # d(q/rho)/dtheta = w (rho^2 + rp q) / rho^3, with w = dy cos - dx sin
+        np.multiply(dy, c, out=w)
+        np.multiply(dx, s, out=tmp)
+        w -= tmp
+        np.multiply(q, rp, out=tmp)
+        tmp += r2
+        tmp *= w
+        tmp /= r3
+        np.multiply(tmp, 100, out=grad[:, 4])
+        return value, grad
+
+    def _cost(self, X, out):
+        # V, with a, b = v + 0.1 (p - p_port) for its gradient
+        M, c, s, dx, dy = self._relative(X)
+        a, b, tmp = self._work[4:7, :M]
+        np.multiply(dx, 0.1, out=a)
+        a += X[:, 2]
+        np.multiply(dy, 0.1, out=b)
+        b += X[:, 3]
+
+        value = self._value[:M] if out is None else out
+        np.multiply(a, a, out=value)
+        np.multiply(b, b, out=tmp)
+        value += tmp
+        value *= 1e4
+        return value, (c, s, a, b, tmp)
+
+    def V(self, X, out=None):
+        return self._cost(X, out)[0]
+
+    def V_gradient(self, X, out=None, grad=None):
+        """
+        V and dV/dx, (M,) and (M, 5).
+        """
+        value, (c, s, a, b, tmp) = self._cost(X, out)
+        grad = self._grad[:len(value)] if grad is None else grad
+
+        np.multiply(a, 2e3, out=grad[:, 0])
+        np.multiply(b, 2e3, out=grad[:, 1])
+        np.multiply(a, 2e4, out=grad[:, 2])
+        np.multiply(b, 2e4, out=grad[:, 3])
+        # the port moves by rp (-sin, cos) per radian
+        np.multiply(a, s, out=grad[:, 4])
+        np.multiply(b, c, out=tmp)
+        grad[:, 4] -= tmp
+        grad[:, 4] *= 2e3 * rp
+        return value, grad
+
+
+# one LineOfSight each, so that h's values are not overwritten by V's
+h_analytic = Analytic(h, LineOfSight().h_gradient)
+V_analytic = Analytic(V, LineOfSight().V_gradient)
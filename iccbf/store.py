@@ -0,0 +1,192 @@
+"""
+On disk trajectories, readable a window at a time.
+
+A store is a directory with
+
+    meta.json    the columns (dtype and shape of one row), any attrs, and once
+                 the writer is closed, the rows and whether it finished
+                 (complete is False if it was closed by an exception)
+    <name>.bin   each column's rows, back to back, in C order
+    index.bin    one float64 row per chunk written: first row, end row, and
+                 the smallest and largest t in the chunk (see _row_times)
+
+Columns open as np.memmap, so reading a time window or every k-th row of a
+run with millions of rows only touches the pages it needs. Rows are appended
+a chunk at a time (a TrajectoryWriter is a sink for recorder.Recorder), and
+the index is written after the data, so a store can be read while it is
+still being written.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .recorder import STATUS
+
+
+def _row_times(t, status=None):
+    """
+    The smallest and largest t of each row (rows, ...). Trajectories that
+    have stopped keep their last t, so only the running ones count for the
+    smallest (rows where none is running take the row's largest). Both grow
+    with the row, as every trajectory's t does.
+    """
+    t = np.asarray(t, dtype=float).reshape(len(t), -1)
+    tmax = np.nanmax(t, axis=1)
+    if status is None:
+        return np.nanmin(t, axis=1), tmax
+    running = np.asarray(status).reshape(len(t), -1) == STATUS.index("running")
+    tmin = np.min(np.where(running, t, np.inf), axis=1)
+    return np.where(running.any(axis=1), tmin, tmax), tmax
+
+
+class TrajectoryWriter:
+    """
+    Appends chunks of rows, dicts of column name -> (rows, ...) arrays that
+    include t, to the store at path.
+
+        with TrajectoryWriter("run", attrs=dict(dt=1e-3)) as sink:
+            rec = Recorder(h=sc.h, sink=sink)
+            simulate(..., recorder=rec)
+    """
+
+    def __init__(self, path, attrs=None):
+        self.path = path
+        self.attrs = {} if attrs is None else dict(attrs)
+        self.rows = 0
+        self.columns = None
+        self._files = None
+        os.makedirs(path, exist_ok=True)
+
+    def _open(self, chunk):
+        self.columns = {name: dict(dtype=np.asarray(v).dtype.str, shape=list(np.shape(v)[1:]))
+                        for name, v in chunk.items()}
+        self._meta(complete=False)
+        self._files = {name: open(os.path.join(self.path, name + ".bin"), "wb") for name in self.columns}
+        self._files["index"] = open(os.path.join(self.path, "index.bin"), "wb")
+
+    def write(self, chunk):
+        """
+        Appends a chunk of rows.
+        """
+        if self.columns is None:
+            self._open(chunk)
+
+        rows = len(chunk["t"])
+        if rows == 0:
+            return
+        for name, column in self.columns.items():
+            np.ascontiguousarray(chunk[name], dtype=column["dtype"]).tofile(self._files[name])
+            self._files[name].flush()
+
+        tmin, tmax = _row_times(chunk["t"], chunk.get("status"))
+        np.array([self.rows, self.rows + rows, tmin.min(), tmax.max()], dtype=float).tofile(self._files["index"])
+        self._files["index"].flush()
+        self.rows += rows
+
+    def _meta(self, complete):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(dict(columns=self.columns, attrs=self.attrs, rows=self.rows, complete=complete), f, indent=2)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def close(self, complete=True):
+        """
+        Closes the files, and marks the store complete (or not) in meta.json.
+        """
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+            self._meta(complete)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(complete=exc_type is None)
+
+
+def save(path, recorder, attrs=None):
+    """
+    Writes the rows of a recorder.Recorder to a new store at path.
+    """
+    with TrajectoryWriter(path, attrs) as writer:
+        columns = {name: list(recorder.chunks(name)) for name in recorder.shapes or ()}
+        for i in range(len(columns.get("t", ()))):
+            writer.write({name: parts[i] for name, parts in columns.items()})
+
+
+class TrajectoryStore:
+    """
+    A store opened for reading.
+
+        store = TrajectoryStore("run")
+        store["x"]                      # (rows, K, n) memmap
+        store.window(100, 120)["h"]     # rows with t in [100, 120], a view
+        store.window(step=1000)         # every 1000th row of every column
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.columns = meta["columns"]
+        self.attrs = meta["attrs"]
+        self.complete = meta.get("complete", False)
+
+        index = np.fromfile(os.path.join(path, "index.bin"), dtype=float).reshape(-1, 4)
+        self.starts = index[:, 0].astype(int)
+        self.stops = index[:, 1].astype(int)
+        self.tmin = index[:, 2]
+        self.tmax = index[:, 3]
+        self.rows = int(self.stops[-1]) if len(self.stops) else 0
+        self._maps = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        """
+        A column as a read only memmap of shape (rows, ...).
+        """
+        if name not in self._maps:
+            column = self.columns[name]
+            shape = (self.rows,) + tuple(column["shape"])
+            if self.rows == 0:
+                self._maps[name] = np.empty(shape, dtype=column["dtype"])
+            else:
+                self._maps[name] = np.memmap(os.path.join(self.path, name + ".bin"), dtype=column["dtype"],
+                                             mode="r", shape=shape)
+        return self._maps[name]
+
+    def rows_between(self, t0=-np.inf, t1=np.inf):
+        """
+        The rows [start, stop) with some t in [t0, t1] (of a running
+        trajectory, if there is a status column). Only the t of the chunks at
+        the two ends of the window is read.
+        """
+        chunks = np.flatnonzero((self.tmax >= t0) & (self.tmin <= t1))
+        if len(chunks) == 0:
+            return 0, 0
+
+        # the smallest and largest t of a row grow with the row
+        status = self["status"] if "status" in self.columns else None
+        first, last = chunks[0], chunks[-1]
+        lo, hi = self.starts[first], self.stops[first]
+        _, tmax = _row_times(self["t"][lo:hi], None if status is None else status[lo:hi])
+        start = lo + np.searchsorted(tmax, t0, side="left")
+        lo, hi = self.starts[last], self.stops[last]
+        tmin, _ = _row_times(self["t"][lo:hi], None if status is None else status[lo:hi])
+        stop = lo + np.searchsorted(tmin, t1, side="right")
+        return int(start), int(stop)
+
+    def window(self, t0=-np.inf, t1=np.inf, step=1, columns=None):
+        """
+        Every step-th row with some t in [t0, t1], as a dict of views of the
+        given columns (all by default).
+        """
+        start, stop = self.rows_between(t0, t1)
+        names = self.columns if columns is None else columns
+        return {name: self[name][start:stop:step] for name in names}
@@ -0,0 +1,117 @@
+"""
+Search over class K functions for the largest C*.
+
+A candidate is one parameter per level, alpha_i = families[i](grid[i][j]),
+e.g. families = [Linear, Root, Linear] for the ACC's k0 r, k1 sqrt(r), k2 r.
+Every candidate of the grid is scored at the same Sobol points of a box of
+states by
+
+    volume      the volume of C* (the box's volume times the fraction of
+                points in C*)
+    violations  points of C* where the ICCBF condition fails
+
+The candidates form a tree: b_1 depends only on alpha_0, b_2 only on alpha_0
+and alpha_1, and alpha_N only enters the condition. So b_0 is evaluated
+once, b_1 once per alpha_0, and so on, with the jets of each level reused
+by every candidate below it. The points are split across a process pool,
+each worker scoring the whole tree on its share.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from .construction import jet_seed, jet_step
+from .falsify import sobol
+
+
+def _score(f, g, h, U, families, grid, X, tol):
+    # points in C* and violations of every candidate, and the worst margin
+    shape = tuple(len(params) for params in grid)
+    inside = np.zeros(shape, dtype=int)
+    violations = np.zeros(shape, dtype=int)
+    worst = np.full(shape, np.inf)
+
+    N = len(families) - 1
+    Fx, Gx = f(X), np.asarray(g(X))
+    Gx = np.broadcast_to(Gx, (len(X),) + Gx.shape[-2:])
+    F, G, b0 = jet_seed(f, g, h, X, N + 1)
+
+    def descend(level, jet, mask, index):
+        if level == N:
+            grad = jet.gradient()
+            Lf = np.einsum("mj,mj->m", grad, Fx)
+            Lg = np.einsum("mj,mjk->mk", grad, Gx)
+            sup = Lf + U.sup(Lg)
+            inside[index] = mask.sum()
+            for j, param in enumerate(grid[N]):
+                m = sup + families[N](param)(jet.value)
+                violations[index + (j,)] = np.sum(mask & ~(m >= -tol))
+                worst[index + (j,)] = m[mask].min(initial=np.inf)
+            return
+        for j, param in enumerate(grid[level]):
+            below = jet_step(jet, F, G, U, families[level](param))
+            descend(level + 1, below, mask & (below.value >= 0), index + (j,))
+
+    descend(0, b0, b0.value >= 0, ())
+    return inside, violations, worst
+
+
+def _chunk(f, g, h, U, families, grid, lo, hi, seed, start, size, tol):
+    X = lo + sobol(len(lo), seed, start, size) * (hi - lo)
+    return _score(f, g, h, U, families, grid, X, tol)
+
+
+def search(f, g, h, U, families, grid, bounds, samples=1 << 16, workers=None, seed=0, tol=0.0, verbose=False):
+    """
+    Scores every class K candidate of grid (one list of parameters per
+    level) for the system (f, g, h, U), at `samples` Sobol points of the box
+    bounds = (lo, hi). f, g, h and families must pickle (module functions,
+    Linear, Root) unless workers = 0.
+
+    Returns the candidates as dicts with params, volume, fraction (of the
+    points in C*), violations and worst (the smallest margin in C*), those
+    without violations first, then by volume:
+
+        best = search(acc.f, acc.g, acc.h, acc.U, [Linear, Root, Linear],
+                      [[1, 2, 4, 8], [1, 3, 7, 10], [0.5, 1, 2, 5]],
+                      ([0, 0], [100, 24]))[0]
+
+    A sampled pass is not a proof: verify.certify the candidates chosen.
+    """
+    lo, hi = (np.asarray(v, dtype=float) for v in bounds)
+    workers = os.cpu_count() if workers is None else workers
+    size = max(samples // max(workers, 1), 1)
+    size = 1 << (size.bit_length() - 1)  # power of 2 blocks of the sequence
+    starts = range(0, samples, size)
+    args = [(f, g, h, U, families, grid, lo, hi, seed, start, min(size, samples - start), tol) for start in starts]
+
+    if workers == 0:
+        results = [_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_chunk, *zip(*args)))
+
+    inside = sum(r[0] for r in results)
+    violations = sum(r[1] for r in results)
+    worst = np.min([r[2] for r in results], axis=0)
+
+    volume = np.prod(hi - lo)
+    ranked = []
+    for index in product(*[range(len(params)) for params in grid]):
+        ranked.append(dict(
+            params=tuple(params[i] for params, i in zip(grid, index)),
+            volume=float(volume * inside[index] / samples),
+            fraction=float(inside[index] / samples),
+            violations=int(violations[index]),
+            worst=float(worst[index]),
+        ))
+    ranked.sort(key=lambda c: (c["violations"] > 0, -c["volume"]))
+
+    if verbose:
+        for c in ranked[:10]:
+            print(f"{c['params']}: volume {c['volume']:.4g} ({100 * c['fraction']:.1f}%), "
+                  f"{c['violations']} violations, worst margin {c['worst']:.3g}")
+    return ranked
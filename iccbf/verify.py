@@ -0,0 +1,280 @@
+"""
+Certified verification of the ICCBF condition by interval branch and bound.
+
+certify proves
+
+    sup_{u in U} L_f b_N(x) + L_g b_N(x) u + alpha_N(b_N(x)) >= 0  on C*
+
+over a box of states, up to boxes it could not decide. Each open box gets
+interval enclosures of b_0 ... b_N and of the margin (the left hand side)
+over the box, from nested duals of intervals, tightened with the mean value
+form about the box's centre. A box is
+
+    proved      if the margin is >= 0 on all of it, or some b_i < 0 on all of
+                it (it misses C*)
+    violated    if its centre is in C* and has a negative margin: a
+                counterexample, the box is not split further
+    undecided   if it is narrower than min_width (relative to the bounds) in
+                every state
+    split       in half across its widest state otherwise
+
+Open boxes are handed to a process pool largest first (the boxes are halves
+of halves, so the largest are the shallowest), a batch at a time to
+whichever worker is free. Progress is yielded after every batch, and the
+open boxes can be checkpointed to a file and picked up from there.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .autodiff import Dual
+from .falsify import margin
+from .interval import Interval, mean_value
+
+
+def _margin(b, X):
+    # b_0 ... b_N and the margin, on boxes X (Intervals or Duals of them)
+    B, Lf, Lg = b.lie_levels(X)
+    return B, Lf[-1] + b.U.sup(Lg[-1]) + b.alphas[-1](B[-1])
+
+
+def enclose(b, lo, hi):
+    """
+    Enclosures of b_0 ... b_N (N+1, K) and of the margin (K,) over the K
+    boxes [lo, hi] (each (K, n)), as Intervals.
+    """
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    box = Interval(lo, hi)
+    mid = Interval(box.mid)
+
+    B, m = _margin(b, Dual.seed(box))
+    B_mid, m_mid = _margin(b, mid)
+    offset = box - mid
+    return mean_value(B.v, B.d, B_mid, offset), mean_value(m.v, m.d, m_mid, offset)
+
+
+def _work(b, lo, hi, depth, scale, min_width):
+    # decides a batch of boxes, and splits the rest
+    B, m = enclose(b, lo, hi)
+    volume = np.prod(hi - lo, axis=1)
+    outside = np.any(B.hi < 0, axis=0)
+    proved = ~outside & (m.lo >= 0)
+
+    centre = 0.5 * (lo + hi)
+    m_centre, inside = margin(b, centre)
+    violated = ~outside & ~proved & inside & (m_centre < 0)
+
+    width = (hi - lo) / scale
+    rest = ~(outside | proved | violated)
+    undecided = rest & (width.max(axis=1) < min_width)
+    split = rest & ~undecided
+
+    # halves across the widest (relative) state
+    axis = np.argmax(width[split], axis=1)
+    rows = np.arange(len(axis))
+    lo_split, hi_split = lo[split], hi[split]
+    cut = 0.5 * (lo_split[rows, axis] + hi_split[rows, axis])
+    lower_hi, upper_lo = hi_split.copy(), lo_split.copy()
+    lower_hi[rows, axis] = cut
+    upper_lo[rows, axis] = cut
+
+    return dict(
+        outside=float(volume[outside].sum()),
+        proved=float(volume[proved].sum()),
+        violated=(centre[violated], m_centre[violated]),
+        undecided=(lo[undecided], hi[undecided]),
+        children=(np.concatenate([lo_split, upper_lo]), np.concatenate([lower_hi, hi_split]),
+                  np.tile(depth[split] + 1, 2)),
+        boxes=len(lo),
+    )
+
+
+_WORKER = {}
+
+
+def _init(b, scale, min_width):
+    _WORKER.update(b=b, scale=scale, min_width=min_width)
+
+
+def _pool_work(lo, hi, depth):
+    return _work(_WORKER["b"], lo, hi, depth, _WORKER["scale"], _WORKER["min_width"])
+
+
+class _Queue:
+    """
+    Open boxes in buckets by depth, taken shallowest (largest) first.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.buckets = {}
+        self.count = 0
+        self.volume = 0.0
+
+    def push(self, lo, hi, depth):
+        self.count += len(lo)
+        self.volume += float(np.prod(hi - lo, axis=1).sum())
+        for d in np.unique(depth):
+            at = depth == d
+            self.buckets.setdefault(int(d), []).append((lo[at], hi[at]))
+
+    def pop(self, k):
+        lo, hi, depth = [], [], []
+        while self.buckets and len(lo) < k:
+            d = min(self.buckets)
+            bucket = self.buckets[d]
+            part_lo, part_hi = bucket.pop()
+            take = min(k - len(lo), len(part_lo))
+            if take < len(part_lo):
+                bucket.append((part_lo[take:], part_hi[take:]))
+            elif not bucket:
+                del self.buckets[d]
+            lo.extend(part_lo[:take])
+            hi.extend(part_hi[:take])
+            depth.extend([d] * take)
+
+        lo, hi = np.array(lo).reshape(-1, self.n), np.array(hi).reshape(-1, self.n)
+        self.count -= len(lo)
+        self.volume -= float(np.prod(hi - lo, axis=1).sum())
+        return lo, hi, np.array(depth, dtype=int)
+
+    def boxes(self):
+        parts = [(lo, hi, np.full(len(lo), d)) for d, bucket in self.buckets.items() for lo, hi in bucket]
+        if not parts:
+            return np.zeros((0, self.n)), np.zeros((0, self.n)), np.zeros(0, dtype=int)
+        return tuple(np.concatenate(part) for part in zip(*parts))
+
+    def __len__(self):
+        return self.count
+
+
+def _save(path, bounds, min_width, report, queue, in_flight):
+    # open boxes (queued or being worked on), and the totals so far
+    lo, hi, depth = queue.boxes()
+    for batch in in_flight:
+        lo, hi, depth = (np.concatenate([a, c]) for a, c in zip((lo, hi, depth), batch))
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, bounds=np.array(bounds), min_width=min_width, lo=lo, hi=hi, depth=depth,
+             **{key: report[key] for key in ("outside", "proved", "boxes", "seconds", "undecided_volume")},
+             undecided=report["undecided"], counterexamples=report["counterexamples"], margin=report["margin"])
+    os.replace(tmp, path)
+
+
+def _load(path, bounds, min_width):
+    data = np.load(path)
+    if not (np.allclose(data["bounds"], bounds) and data["min_width"] == min_width):
+        raise ValueError(f"checkpoint {path!r} is of a run with other bounds or min_width")
+    report = {key: float(data[key]) for key in ("outside", "proved", "seconds", "undecided_volume")}
+    report.update(boxes=int(data["boxes"]), undecided=int(data["undecided"]),
+                  counterexamples=data["counterexamples"], margin=data["margin"])
+    return report, (data["lo"], data["hi"], data["depth"])
+
+
+def certify(b, bounds, workers=None, batch=256, min_width=1e-3, first=False, checkpoint=None, checkpoint_every=60.0):
+    """
+    Proves the ICCBF condition of b on C* within the box bounds = (lo, hi)
+    (each (n,)), up to the boxes it cannot decide. b is sent to the worker
+    processes once, so its alphas must pickle (Linear, Root). workers = 0
+    runs in this process.
+
+    A generator of reports, one per batch of boxes, each a dict with
+        volume            of the bounds
+        proved            volume where the condition holds (outside C*
+                          included)
+        outside           volume of the boxes found to miss C*
+        open, open_volume boxes left to decide
+        undecided, undecided_volume
+                          boxes narrower than min_width left undecided
+        counterexamples, margin
+                          (k, n) states in C* with a negative margin, and
+                          the margins there
+        boxes, seconds    boxes evaluated and time taken so far
+        done              True on the last report
+    With first = True it stops at the first counterexample.
+
+    With checkpoint (a path to a .npz file), the open boxes and totals are
+    saved every checkpoint_every seconds and at the end, and a run started
+    with an existing checkpoint continues from it.
+
+        for report in certify(b, ([0, 0], [100, 24]), checkpoint="acc.npz"):
+            print(report["proved"] / report["volume"], report["open"])
+    """
+    lo, hi = (np.asarray(v, dtype=float) for v in bounds)
+    bounds, scale = np.stack([lo, hi]), hi - lo
+    queue = _Queue(len(lo))
+    report = dict(volume=float(np.prod(scale)), proved=0.0, outside=0.0, undecided=0, undecided_volume=0.0,
+                  counterexamples=np.zeros((0, len(lo))), margin=np.zeros(0), boxes=0, seconds=0.0)
+
+    if checkpoint is not None and os.path.exists(checkpoint):
+        saved, boxes = _load(checkpoint, bounds, min_width)
+        report.update(saved)
+        queue.push(*boxes)
+    else:
+        queue.push(lo[None], hi[None], np.zeros(1, dtype=int))
+
+    start, saved_at = time.perf_counter() - report["seconds"], time.perf_counter()
+    in_flight = {}
+
+    def update(result):
+        nonlocal saved_at
+        report["outside"] += result["outside"]
+        report["proved"] += result["proved"] + result["outside"]
+        undecided_lo, undecided_hi = result["undecided"]
+        report["undecided"] += len(undecided_lo)
+        report["undecided_volume"] += float(np.prod(undecided_hi - undecided_lo, axis=1).sum())
+        points, m = result["violated"]
+        report["counterexamples"] = np.concatenate([report["counterexamples"], points])
+        report["margin"] = np.concatenate([report["margin"], m])
+        report["boxes"] += result["boxes"]
+        report["seconds"] = time.perf_counter() - start
+        queue.push(*result["children"])
+
+        stop = (first and len(report["counterexamples"]) > 0) or (len(queue) == 0 and not in_flight)
+        if checkpoint is not None and (stop or time.perf_counter() - saved_at > checkpoint_every):
+            _save(checkpoint, bounds, min_width, report, queue, in_flight.values())
+            saved_at = time.perf_counter()
+        return snapshot(stop), stop
+
+    def snapshot(done):
+        boxes = in_flight.values()
+        return dict(report, open=len(queue) + sum(len(box[0]) for box in boxes),
+                    open_volume=queue.volume + sum(float(np.prod(box[1] - box[0], axis=1).sum()) for box in boxes),
+                    done=done)
+
+    if not len(queue):
+        # resumed from the checkpoint of a finished run
+        yield snapshot(True)
+        return
+
+    if workers == 0:
+        while len(queue):
+            out, stop = update(_work(b, *queue.pop(batch), scale, min_width))
+            yield out
+            if stop:
+                return
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers, initializer=_init, initargs=(b, scale, min_width)) as pool:
+        def submit():
+            # the largest open boxes to the next free worker
+            while len(queue) and len(in_flight) < 2 * workers:
+                boxes = queue.pop(batch)
+                in_flight[pool.submit(_pool_work, *boxes)] = boxes
+
+        submit()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del in_flight[future]
+                out, stop = update(future.result())
+                if stop:
+                    for pending in in_flight:
+                        pending.cancel()
+                    yield out
+                    return
+                yield out
+            submit()
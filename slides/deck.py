@@ -0,0 +1,287 @@
+"""
+Parallel deck builds.
+
+`_Slides` in slides2.py renders every scene of the `slides` list one after the
+other in a single process. This script renders each entry in its own worker
+process instead (with the same page number overlay, for decks that have one:
+those that import page_number, like slides2), and then stitches the per-slide
+pptx files together, in order, into one deck.
+
+From inside this folder:
+
+    python deck.py slides2 -j 8 -q l
+
+writes pptx/_Slides.pptx. The per-slide decks are kept in pptx/parts/, along
+with a manifest of what each was rendered from: a hash of the scene's
+construct source, the module level settings it reads (e.g. titleKwargs), the
+files it loads (drawings/*.png, *.svg), the source of every module of the repo
+the deck imports (results.py, mobjects.py, iccbf/...) and the parameters of
+the data the slides are drawn from (the cache_key() of any such module, e.g.
+the runs and sets of results.py). On the next build only the slides whose
+hash changed are rendered again; pass --force to render everything.
+"""
+
+import argparse
+import copy
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from manim import *
+from manim_pptx import *
+
+import pptx
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+import texcache
+
+
+PARTS_DIR = os.path.join("pptx", "parts")
+MANIFEST = os.path.join(PARTS_DIR, "manifest.json")
+TEMP_DIR = "temp"
+
+# file names in a construct's source that count as assets
+ASSET = re.compile(r"""["']([^"']+\.(?:png|jpg|jpeg|svg|gif))["']""")
+
+QUALITIES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+
+
+def page_number(n):
+    # the page number drawn in the bottom right of every slide
+    pageNum = Tex(str(n), font_size=24, fill_opacity=0.8)
+    pageNum.to_edge(DOWN).to_edge(RIGHT).shift(0.25*DOWN)
+    return pageNum
+
+
+def has_page_numbers(module):
+    # decks that number their pages import page_number (slides2's _Slides)
+    return callable(getattr(module, "page_number", None))
+
+
+def numbered(scene, n, pages=True):
+    # subclass of scene for slide n, adding the page number first if the
+    # deck has them, as _Slides does
+    def construct(self):
+        if pages:
+            self.add(page_number(n))
+        scene.construct(self)
+
+    return type(f"{scene.__name__}_{n:02d}", (scene,), {"construct": construct})
+
+
+def local_modules(module):
+    """
+    The modules of this repo that module imports, directly or through each
+    other, itself included: the ones whose file is under the repo's root.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    found, stack = {}, [module]
+    while stack:
+        m = stack.pop()
+        path = getattr(m, "__file__", None)
+        if m.__name__ in found or path is None or not os.path.abspath(path).startswith(root + os.sep):
+            continue
+        found[m.__name__] = m
+        for value in vars(m).values():
+            dep = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if dep is not None:
+                stack.append(dep)
+    return [found[name] for name in sorted(found)]
+
+
+@functools.lru_cache(maxsize=None)
+def modules_hash(module):
+    # the source of the repo's modules the deck uses, and their data's
+    # parameters. The deck's own module is hashed scene by scene, and of this
+    # file only page_number goes into a slide
+    h = hashlib.sha256()
+    h.update(inspect.getsource(page_number).encode())
+    for m in local_modules(module):
+        h.update(f"{m.__name__}\n".encode())
+        if m is not module and os.path.abspath(m.__file__) != os.path.abspath(__file__):
+            with open(m.__file__, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        if callable(getattr(m, "cache_key", None)):
+            h.update(json.dumps(m.cache_key(), sort_keys=True, default=repr).encode())
+    return h.hexdigest()
+
+
+def scene_hash(module, scene, n, quality):
+    # hash of everything slide n is rendered from
+
+    construct = scene.construct
+    source = inspect.getsource(construct)
+
+    h = hashlib.sha256()
+    h.update(f"{scene.__name__} {n} {quality} {has_page_numbers(module)}\n".encode())
+    h.update(source.encode())
+    h.update(modules_hash(module).encode())
+
+    # module level settings the construct (or a lambda inside it) reads,
+    # e.g. titleKwargs
+    names, codes = set(), [construct.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(c for c in code.co_consts if inspect.iscode(c))
+
+    for name in sorted(names):
+        value = vars(module).get(name)
+        if isinstance(value, (dict, list, tuple, str, int, float)):
+            h.update(f"{name} = {value!r}\n".encode())
+
+    # drawings it loads
+    folder = os.path.dirname(module.__file__)
+    for asset in sorted(set(ASSET.findall(source))):
+        h.update(asset.encode())
+        with open(os.path.join(folder, asset), "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+
+    return h.hexdigest()
+
+
+def render_part(module_name, index, quality):
+    # runs inside a worker process: render slides[index] to its own pptx
+
+    module = importlib.import_module(module_name)
+    scene = numbered(module.slides[index], index + 1, has_page_numbers(module))
+
+    config.input_file = module.__file__
+    config.quality = QUALITIES[quality]
+
+    # each worker gets its own folder for the video thumbnails
+    temporary_dir = os.path.join(TEMP_DIR, scene.__name__)
+    os.makedirs(temporary_dir, exist_ok=True)
+
+    scene(output_folder=PARTS_DIR, temporary_dir=temporary_dir).render()
+
+    return os.path.join(PARTS_DIR, scene.__name__ + ".pptx")
+
+
+def copy_slide(prs, src):
+    # appends a copy of the slide src (from another presentation) to prs
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    package = slide.part.package
+
+    # relate the new slide to the same media and images, renaming the parts
+    # so they do not collide with the ones already in prs
+    rIds = {}
+    for rId in list(src.part.rels):
+        rel = src.part.rels[rId]
+        if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        if rel.is_external:
+            rIds[rId] = slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            continue
+
+        target = rel.target_part
+        if not getattr(target, "_stitched", False):
+            ext = target.partname.ext
+            if rel.reltype == RT.IMAGE:
+                target.partname = package.next_image_partname(ext)
+            else:
+                target.partname = package.next_media_partname(ext)
+            target._stitched = True
+        rIds[rId] = slide.part.relate_to(target, rel.reltype)
+
+    # copy the shapes, transition and timing, pointing at the new rIds
+    for child in list(slide.element):
+        slide.element.remove(child)
+    for child in src.element:
+        slide.element.append(copy.deepcopy(child))
+
+    r = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    for el in slide.element.iter():
+        for key, value in el.attrib.items():
+            if key.startswith(r) and value in rIds:
+                el.set(key, rIds[value])
+
+    if src.has_notes_slide:
+        slide.notes_slide.notes_text_frame.text = src.notes_slide.notes_text_frame.text
+
+    return slide
+
+
+def stitch(parts, filename):
+    # joins the pptx files in parts, in order, into one pptx
+
+    prs = pptx.Presentation(parts[0])
+    for part in parts[1:]:
+        for slide in pptx.Presentation(part).slides:
+            copy_slide(prs, slide)
+
+    prs.save(filename)
+    return filename
+
+
+def build(module_name, jobs=None, quality="h", name="_Slides", force=False):
+    module = importlib.import_module(module_name)
+    n = len(module.slides)
+
+    # manim_pptx creates these with os.mkdir, which races between workers
+    os.makedirs(PARTS_DIR, exist_ok=True)
+    os.makedirs(TEMP_DIR, exist_ok=True)
+
+    manifest = {}
+    if os.path.exists(MANIFEST) and not force:
+        with open(MANIFEST) as f:
+            manifest = json.load(f)
+
+    pages = has_page_numbers(module)
+    parts = [None] * n
+    hashes = [scene_hash(module, s, i + 1, quality) for i, s in enumerate(module.slides)]
+    todo = []
+    for i, s in enumerate(module.slides):
+        part = os.path.join(PARTS_DIR, numbered(s, i + 1, pages).__name__ + ".pptx")
+        if manifest.get(part) == hashes[i] and os.path.exists(part):
+            parts[i] = part
+        else:
+            todo.append(i)
+
+    logger.info(f"Rendering {len(todo)} of {n} slides")
+
+    if todo:
+        # compile all the tex once, up front, so the workers only hit the cache
+        texcache.prefetch([numbered(module.slides[i], i + 1, pages) for i in todo])
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {i: pool.submit(render_part, module_name, i, quality) for i in todo}
+            for i, future in futures.items():
+                parts[i] = future.result()
+                manifest[parts[i]] = hashes[i]
+
+                # saved after every slide, so a failed build keeps the finished ones
+                with open(MANIFEST, "w") as f:
+                    json.dump(manifest, f, indent=1)
+
+    logger.info(f"Stitching {n} slides")
+    return stitch(parts, os.path.join("pptx", name + ".pptx"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="render each slide in its own process and stitch them into one pptx")
+    parser.add_argument("module", help="module with the `slides` list, e.g. slides2")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of cpus)")
+    parser.add_argument("-q", "--quality", choices=QUALITIES.keys(), default="h")
+    parser.add_argument("-n", "--name", default="_Slides", help="name of the stitched pptx")
+    parser.add_argument("-f", "--force", action="store_true", help="render every slide, even if unchanged")
+    args = parser.parse_args()
+
+    build(args.module, jobs=args.jobs, quality=args.quality, name=args.name, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Mobjects for animated plots that are cheaper to draw than always_redraw.
+"""
+
+from manim import *
+import numpy as np
+
+
+class _Shared:
+    # holds precomputed arrays, so that copying the mobject (which manim does
+    # for most animations) shares them instead of deep copying them
+    def __init__(self, **arrays):
+        self.__dict__.update(arrays)
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class CurveFamily(VMobject):
+    """
+    The curve y = func(t, *params) on `axes`, where each param follows a
+    ValueTracker.
+
+    `trackers` is a list of (tracker, [min, max, step]). The whole family is
+    evaluated once, as one array, on a grid over the trackers' ranges. Every
+    frame the curve is interpolated from the two nearest grid points of each
+    tracker, writing into the existing points. Parameters that enter func
+    linearly are exact with a single step over their range.
+
+        func = CurveFamily(ax, lambda t, a: np.exp(-a*t), [(alpha, [0, 1, 0.01])], x_range=[0, 10])
+    """
+
+    def __init__(self, axes, func, trackers, x_range, num_samples=201, **kwargs):
+        super().__init__(**kwargs)
+
+        self.trackers = [tr for tr, _ in trackers]
+
+        grids = []
+        for _, (lo, hi, step) in trackers:
+            n = max(int(np.ceil((hi - lo) / step - 1e-9)), 1) + 1
+            grids.append(np.linspace(lo, hi, n))
+
+        t = np.linspace(x_range[0], x_range[1], num_samples)
+        params = np.meshgrid(*grids, indexing="ij")
+        y = func(t, *[p[..., None] for p in params])
+        y = np.broadcast_to(y, params[0].shape + t.shape)
+
+        # smooth cubic bezier through the samples: every anchor and handle is
+        # a fixed linear combination of the samples
+        bezier = self._bezier_matrix(num_samples)
+
+        # axes are linear, so the screen point is origin + t*ex + y*ey
+        origin = axes.c2p(0, 0)
+        ex = axes.c2p(1, 0) - origin
+        ey = axes.c2p(0, 1) - origin
+
+        self._family = _Shared(
+            grids=grids,
+            y=np.ascontiguousarray(y @ bezier.T),
+            base=origin + np.outer(bezier @ t, ex),
+            ey=ey,
+        )
+
+        # scratch buffers for the per frame update
+        self._y = np.zeros(self._family.base.shape[0])
+        self._term = np.zeros_like(self._y)
+
+        self.set_points(self._family.base.copy())
+        self.update_curve()
+        self.add_updater(lambda m: m.update_curve())
+
+    @staticmethod
+    def _bezier_matrix(n):
+        # (4(n-1), n) matrix taking n samples to the bezier points of a
+        # Catmull-Rom spline through them
+        M = np.zeros((4 * (n - 1), n))
+        for i in range(n - 1):
+            prev, nxt = max(i - 1, 0), min(i + 2, n - 1)
+            rows = M[4 * i : 4 * i + 4]
+            rows[0, i] = 1
+            rows[1, i] += 1
+            rows[1, i + 1] += 1 / 6
+            rows[1, prev] -= 1 / 6
+            rows[2, i + 1] += 1
+            rows[2, nxt] -= 1 / 6
+            rows[2, i] += 1 / 6
+            rows[3, i + 1] = 1
+        return M
+
+    def update_curve(self):
+        family = self._family
+
+        # if an animation replaced the points, get an array of the right shape back
+        if self.points.shape != family.base.shape:
+            self.points = family.base.copy()
+
+        # index and weight of the lower grid point, per tracker
+        corners = [((), 1.0)]
+        for tracker, grid in zip(self.trackers, family.grids):
+            s = (tracker.get_value() - grid[0]) / (grid[-1] - grid[0]) * (len(grid) - 1)
+            s = min(max(s, 0.0), len(grid) - 1.0)
+            i = min(int(s), len(grid) - 2)
+            w = s - i
+            corners = [(idx + (j,), c * wj) for idx, c in corners for j, wj in ((i, 1 - w), (i + 1, w))]
+
+        self._y.fill(0)
+        for idx, c in corners:
+            if c != 0:
+                np.multiply(family.y[idx], c, out=self._term)
+                self._y += self._term
+
+        # one column at a time: broadcasting into `out` would allocate a buffer
+        for k in range(3):
+            np.multiply(self._y, family.ey[k], out=self.points[:, k])
+        self.points += family.base
+        return self
+
+
+class NumericLabel(VGroup):
+    """
+    MathTex of the form `before` <number> `after`, where the number follows
+    get_value() every frame without compiling any TeX.
+
+    The label is compiled once with a placeholder number (e.g. 0.00), and the
+    digits 0-9 once per font size. Every frame each digit of the placeholder
+    is swapped for the cached glyph of the digit it should show.
+
+        label = NumericLabel(r"\alpha(r) = ", r"r", lambda: tracker.get_value())
+    """
+
+    # font size -> glyphs of 0123456789, shared by every label in the process
+    _digits = {}
+
+    def __init__(self, before, after, get_value, num_decimal_places=2, num_integer_places=1,
+                 font_size=DEFAULT_FONT_SIZE, **kwargs):
+        self.num_decimal_places = num_decimal_places
+        self.num_integer_places = num_integer_places
+
+        number = "0" * num_integer_places
+        if num_decimal_places > 0:
+            number += "." + "0" * num_decimal_places
+
+        tex = MathTex(before, number, after, font_size=font_size, **kwargs)
+        super().__init__(*tex)
+
+        # the placeholder glyphs that get swapped, one per digit
+        self.slots = [glyph for glyph, c in zip(self[1], number) if c != "."]
+
+        self.get_value = get_value
+        digits = NumericLabel._digits.get(font_size)
+        if digits is None:
+            digits = MathTex("0123456789", font_size=font_size)[0]
+            if len(digits) < 10:
+                # texcache.prefetch is probing the scene and the TeX is a
+                # placeholder: nothing to measure, and nothing to keep
+                return
+            NumericLabel._digits[font_size] = digits
+
+        # digits in TeX all have the same advance, so each glyph's offset
+        # from its cell centre is measured from the compiled 0123456789
+        width = (digits[9].get_center()[0] - digits[0].get_center()[0]) / 9
+        cells = digits[0].get_center()[0] + width * np.arange(10)
+
+        # points of every digit in every slot, relative to the label's corner
+        # (the placeholder 0 marks each slot's cell centre and baseline)
+        self._corner = self[0].get_corner(DL)
+        self._width = self[0].width
+        self._glyphs = []
+        for slot in self.slots:
+            shift = np.array([slot.get_center()[0], slot.get_bottom()[1] - digits[0].get_bottom()[1], 0])
+            self._glyphs.append([
+                digits[d].points + shift - [cells[d], 0, 0] - self._corner
+                for d in range(10)
+            ])
+
+        self.set_value(get_value())
+        self.add_updater(lambda m: m.set_value(m.get_value()))
+
+    def set_value(self, value):
+        text = f"{value:.{self.num_decimal_places}f}".replace(".", "")
+        if value < 0 or len(text) > len(self.slots):
+            raise ValueError(f"{value} does not fit a label with {self.num_integer_places} integer places")
+        text = text.rjust(len(self.slots), " ")
+
+        # no leading zeros, apart from the one before the decimal point
+        leading = len(text) - self.num_decimal_places - 1
+        text = text[:leading].lstrip("0").rjust(leading, " ") + text[leading:]
+
+        # follow the label if it has been moved or scaled since it was made
+        scale = self[0].width / self._width
+        corner = self[0].get_corner(DL)
+
+        for slot, glyphs, c in zip(self.slots, self._glyphs, text):
+            if c == " ":
+                slot.set_points(np.zeros((0, 3)))
+            else:
+                slot.set_points(corner + scale * glyphs[int(c)])
+        return self
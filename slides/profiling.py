@@ -0,0 +1,225 @@
+"""
+Opt-in render profiling for the deck.
+
+With PROFILE_SLIDES set (to 1, or to a .json path to also save the numbers),
+rendering _Slides ends with a report of where the time went:
+
+    PROFILE_SLIDES=1 manim -ql slides2.py _Slides
+
+Every slide (a scene's construct up to each endSlide) and every play call
+records
+
+    wall        seconds
+    frames      frames written to the video
+    tex         texcache lookups (hits / misses), and seconds compiling
+                (latex and dvisvgm)
+    svg         seconds turning svgs into mobjects (Tex, MathTex, SVGMobject)
+    raster      seconds drawing frames (Camera.capture_mobjects)
+    encode      seconds in the video writer
+    build       seconds outside play: building mobjects, and the rest of
+                construct (slides only)
+    rss         peak resident memory so far, MB
+
+The time spent before the first scene (texcache.prefetch) is the "(setup)"
+slide. Nothing is patched unless PROFILE_SLIDES is set.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from functools import wraps
+
+
+ENV = "PROFILE_SLIDES"
+
+# what is timed: (module, class, methods) -> timer
+TIMED = [
+    ("manim.camera.camera", "Camera", ("capture_mobjects",), "raster"),
+    ("manim.scene.scene_file_writer", "SceneFileWriter",
+     ("write_frame", "close_partial_movie_stream", "close_movie_pipe", "combine_to_movie",
+      "combine_to_section_videos"), "encode"),
+    ("manim.mobject.svg.svg_mobject", "SVGMobject", ("generate_mobject",), "svg"),
+    ("texcache", None, ("_run_latex", "_dvisvgm"), "tex"),
+]
+
+_profiler = None
+
+
+def _rss():
+    # peak resident memory of this process, MB (ru_maxrss is KB, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class _Profiler:
+    def __init__(self):
+        self.timers = {"raster": 0.0, "encode": 0.0, "svg": 0.0, "tex": 0.0}
+        self.frames = 0
+        self.depth = {name: 0 for name in self.timers}
+        self.slides = []
+        self.plays = []
+        self.scene = "(setup)"
+        self.index = 0
+        self._open()
+
+    def snapshot(self):
+        import texcache
+
+        return dict(self.timers, frames=self.frames, hits=texcache.stats["hits"],
+                    misses=texcache.stats["misses"], time=time.perf_counter(), play=self.play_time())
+
+    def play_time(self):
+        return sum(p["wall"] for p in self.plays)
+
+    def delta(self, before):
+        now = self.snapshot()
+        out = {key: now[key] - before[key] for key in ("frames", "hits", "misses", *self.timers)}
+        out["wall"] = now["time"] - before["time"]
+        out["rss"] = _rss()
+        return out, now
+
+    def name(self):
+        return f"{self.scene}[{self.index}]"
+
+    def _open(self):
+        self.start = self.snapshot()
+
+    def close(self):
+        # ends the current slide
+        record, now = self.delta(self.start)
+        record["build"] = record["wall"] - (now["play"] - self.start["play"])
+        if record["wall"] > 0 and (record["frames"] or record["build"] > 1e-3 or self.scene == "(setup)"):
+            self.slides.append(dict(slide=self.name(), **record))
+        self.index += 1
+        self._open()
+
+    def timed(self, owner, method, timer):
+        fn = getattr(owner, method, None)
+        if fn is None:
+            return
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.depth[timer]:
+                return fn(*args, **kwargs)
+            self.depth[timer] += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.depth[timer] -= 1
+                self.timers[timer] += time.perf_counter() - start
+                if method == "write_frame":
+                    self.frames += 1
+
+        setattr(owner, method, wrapper)
+
+
+def enabled():
+    return bool(os.environ.get(ENV))
+
+
+def install(slides):
+    """
+    Patches manim, texcache and the scenes in slides (classes) to record the
+    profile, if PROFILE_SLIDES is set. Call before texcache.prefetch.
+    """
+    global _profiler
+    if not enabled() or _profiler is not None:
+        return
+
+    import importlib
+
+    from manim_pptx import PPTXScene
+
+    profiler = _profiler = _Profiler()
+    for module, cls, methods, timer in TIMED:
+        try:
+            owner = importlib.import_module(module)
+        except ImportError:
+            continue
+        owner = getattr(owner, cls, None) if cls else owner
+        for method in methods:
+            if owner is not None:
+                profiler.timed(owner, method, timer)
+
+    play, end_slide = PPTXScene.play, PPTXScene.endSlide
+
+    @wraps(play)
+    def profiled_play(self, *animations, **kwargs):
+        before = profiler.snapshot()
+        try:
+            return play(self, *animations, **kwargs)
+        finally:
+            record, _ = profiler.delta(before)
+            names = ", ".join(getattr(a, "__name__", type(a).__name__) for a in animations)
+            profiler.plays.append(dict(slide=profiler.name(), animations=names, **record))
+
+    @wraps(end_slide)
+    def profiled_end_slide(self, *args, **kwargs):
+        out = end_slide(self, *args, **kwargs)
+        profiler.close()
+        return out
+
+    PPTXScene.play, PPTXScene.endSlide = profiled_play, profiled_end_slide
+
+    for scene in slides:
+        construct = scene.__dict__.get("construct")
+        if construct is None:
+            continue
+
+        def profiled_construct(self, construct=construct, name=scene.__name__):
+            # texcache.prefetch runs construct on a stand in: not profiled
+            if not isinstance(self, PPTXScene):
+                return construct(self)
+            profiler.close()
+            profiler.scene, profiler.index = name, 0
+            profiler._open()
+            try:
+                return construct(self)
+            finally:
+                profiler.close()
+
+        scene.construct = wraps(construct)(profiled_construct)
+
+
+def _row(name, r, width):
+    return (f"{name:<{width}} {r['wall']:>8.2f} {r['frames']:>7d} {r['hits']:>5d}/{r['misses']:<5d}"
+            f"{r['tex']:>7.2f} {r['svg']:>7.2f} {r['raster']:>7.2f} {r['encode']:>7.2f} "
+            f"{r.get('build', float('nan')):>7.2f} {r['rss']:>8.0f}")
+
+
+def report(top=15, file=sys.stdout):
+    """
+    Prints the slides and the `top` slowest play calls, slowest first, and
+    saves everything to PROFILE_SLIDES if it is a .json path.
+    """
+    if _profiler is None:
+        return
+    _profiler.close()
+
+    slides = sorted(_profiler.slides, key=lambda r: -r["wall"])
+    plays = sorted(_profiler.plays, key=lambda r: -r["wall"])
+    header = "{:<{w}} {:>8} {:>7} {:>11} {:>7} {:>7} {:>7} {:>7} {:>7} {:>8}"
+    columns = ("wall s", "frames", "tex h/m", "tex s", "svg s", "raster", "encode", "build", "rss MB")
+
+    width = max([len(r["slide"]) for r in slides] + [10])
+    print(header.format("slide", *columns, w=width), file=file)
+    for r in slides:
+        print(_row(r["slide"], r, width), file=file)
+    total = {key: sum(r[key] for r in slides) for key in ("wall", "frames", "hits", "misses", "tex", "svg",
+                                                          "raster", "encode", "build")}
+    print(_row("total", dict(total, rss=_rss()), width), file=file)
+
+    print(file=file)
+    width = max([len(f"{r['slide']} {r['animations']}"[:60]) for r in plays[:top]] + [10])
+    print(header.format("play", *columns, w=width), file=file)
+    for r in plays[:top]:
+        print(_row(f"{r['slide']} {r['animations']}"[:60], r, width), file=file)
+
+    path = os.environ.get(ENV, "")
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(dict(slides=_profiler.slides, plays=_profiler.plays), f, indent=2)
@@ -0,0 +1,202 @@
+"""
+Simulation results for the result slides, drawn from trajectory data.
+
+The ACC runs of adaptive_cruise_control/ACC_example_detailed.nb (x0 = [100,
+20], 20 s) are simulated with the iccbf package the first time they are
+needed, and kept in runs/ as trajectory stores. A run that did not finish
+(its store is not marked complete) is simulated again. Delete runs/ after
+changing a controller or parameter.
+
+Every curve is read back as at most a screen's width of points: a strided
+window of the store, reduced with largest-triangle-three-buckets. Drawing a
+plot costs the same for a run of any length.
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from manim import *
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from iccbf import ICCBF, Box, ClippedCBFQP, ScalarFilter, acc  # noqa: E402
+from iccbf.downsample import from_store  # noqa: E402
+from iccbf.recorder import Recorder  # noqa: E402
+from iccbf.sets import contours, evaluate  # noqa: E402
+from iccbf.simulate import simulate  # noqa: E402
+from iccbf.store import TrajectoryStore, TrajectoryWriter  # noqa: E402
+
+
+RUNS_DIR = Path(os.environ.get("RUNS_DIR", Path(__file__).parent / "runs"))
+SETS_DIR = Path(os.environ.get("SETS_DIR", Path(__file__).parent / ".setcache"))
+ACC_DT = 1e-3
+
+# the ACC sets: class K gains, input bound and grid (d, v nodes)
+ACC_SETS = dict(k0=4.0, k1=7.0, k2=2.0, umax=acc.umax)
+ACC_SETS_GRID = (512, 512)
+
+CLF_CBF_QP = "acc_clf_cbf_qp"
+ICCBF_QP = "acc_iccbf_qp"
+
+# colors of acc_results_*.png and acc_sets_*.png
+COLORS = {CLF_CBF_QP: "#5EC4E6", ICCBF_QP: "#139A43"}
+SET_COLORS = ["#5EC4E6", "#E8541E", "#006B35", "#D60F57"]
+LABELS = {CLF_CBF_QP: "CLF-CBF-QP", ICCBF_QP: "ICCBF-QP"}
+
+
+def cache_key():
+    """
+    The parameters of the data the result slides are drawn from, for
+    deck.py's hashes (the code they are computed with is hashed there).
+    """
+    return dict(runs=str(RUNS_DIR), dt=ACC_DT, x0=acc.x0.tolist(), t_max=acc.t_max, sets_dir=str(SETS_DIR),
+                sets=ACC_SETS, grid=ACC_SETS_GRID)
+
+
+def _acc_controller(name):
+    if name == CLF_CBF_QP:
+        return ClippedCBFQP(acc.f, acc.g, acc.h, acc.V, acc.U)
+    return ScalarFilter(ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U), acc.u_des)
+
+
+def acc_run(name):
+    """
+    The store of an ACC run (CLF_CBF_QP or ICCBF_QP), simulated if missing
+    or incomplete.
+    """
+    path = RUNS_DIR / name
+    # a run that was interrupted is not marked complete, and is run again
+    if not ((path / "index.bin").exists() and TrajectoryStore(str(path)).complete):
+        shutil.rmtree(path, ignore_errors=True)
+        with TrajectoryWriter(str(path), attrs=dict(controller=name, dt=ACC_DT)) as sink:
+            recorder = Recorder(h=acc.h, sink=sink)
+            simulate(acc.f, acc.g, _acc_controller(name), acc.x0[None], acc.t_max, ACC_DT, recorder=recorder)
+    return TrajectoryStore(str(path))
+
+
+def point_budget(axes):
+    # one point per pixel across the axes
+    return max(int(config.pixel_width * axes.x_length / config.frame_width), 3)
+
+
+def series_curve(axes, store, column, index=(0,), **kwargs):
+    """
+    The curve of column[:, *index] against t of a store, on axes.
+    """
+    t, y = from_store(store, column, point_budget(axes), index=index)
+
+    # axes are linear, so the screen point is origin + t*ex + y*ey
+    origin = axes.c2p(0, 0)
+    ex = axes.c2p(1, 0) - origin
+    ey = axes.c2p(0, 1) - origin
+
+    curve = VMobject(**kwargs)
+    curve.set_points_as_corners(origin + np.outer(t, ex) + np.outer(y, ey))
+    return curve
+
+
+def acc_panels(width=4.2, height=2.4):
+    """
+    Axes for speed, control and safety against time, side by side as in
+    acc_results_*.png, with their reference lines and labels.
+    """
+    t_range = [0, acc.t_max, 5]
+    specs = [
+        (r"x_2\text{: Speed (m/s)}", [12, 25, 2], [(acc.vmax, r"v_{max}"), (acc.v0, r"v_0")]),
+        (r"u\text{: Control (g's)}", [-0.3, 0.3, 0.1], [(acc.umax, None), (-acc.umax, None)]),
+        (r"h\text{: Safety}", [-10, 70, 20], [(0, None)]),
+    ]
+
+    panels = VGroup()
+    for label, y_range, refs in specs:
+        axes = Axes(x_range=t_range, y_range=y_range, x_length=width, y_length=height,
+                    tips=False, axis_config=dict(include_numbers=True, font_size=18))
+        xlabel = MathTex(r"t\text{: Time (s)}", font_size=24).next_to(axes, DOWN, buff=0.15)
+        ylabel = MathTex(label, font_size=24).rotate(PI / 2).next_to(axes, LEFT, buff=0.15)
+        lines = VGroup()
+        for y, name in refs:
+            line = DashedLine(axes.c2p(0, y), axes.c2p(acc.t_max, y), stroke_width=1.5, color=GRAY)
+            lines.add(line)
+            if name is not None:
+                lines.add(MathTex(name, font_size=24, color=GRAY).next_to(line, UP if y == acc.vmax else DOWN, buff=0.05).align_to(line, RIGHT))
+        panels.add(VGroup(axes, xlabel, ylabel, lines))
+
+    panels.arrange(RIGHT, buff=0.8)
+    return panels
+
+
+def acc_curves(panels, name):
+    """
+    The speed, control and safety curves of an ACC run, one per panel.
+    """
+    store = acc_run(name)
+    style = dict(color=COLORS[name], stroke_width=3)
+    return VGroup(
+        series_curve(panels[0][0], store, "x", index=(0, 1), **style),
+        series_curve(panels[1][0], store, "u", index=(0, 0), **style),
+        series_curve(panels[2][0], store, "h", index=(0,), **style),
+    )
+
+
+def acc_legend(names):
+    rows = VGroup(*[
+        VGroup(Line(ORIGIN, 0.5 * RIGHT, color=COLORS[name], stroke_width=4),
+               Tex(LABELS[name], font_size=24)).arrange(RIGHT, buff=0.15)
+        for name in names
+    ]).arrange(DOWN, aligned_edge=LEFT, buff=0.1)
+    return rows
+
+
+def acc_set_axes(width=6, height=6):
+    """
+    Distance and speed axes for the ACC sets, as in acc_sets_*.png.
+    """
+    axes = Axes(x_range=[0, 100, 20], y_range=[0, 24, 5], x_length=width, y_length=height,
+                tips=False, axis_config=dict(include_numbers=True, font_size=18))
+    xlabel = MathTex(r"x_1\text{: Distance (m)}", font_size=24).next_to(axes, DOWN, buff=0.15)
+    ylabel = MathTex(r"x_2\text{: Speed (m/s)}", font_size=24).rotate(PI / 2).next_to(axes, LEFT, buff=0.15)
+    v0 = DashedLine(axes.c2p(0, acc.v0), axes.c2p(100, acc.v0), stroke_width=1.5, color=GRAY)
+    return VGroup(axes, xlabel, ylabel, v0)
+
+
+def acc_sets(axes, k0=None, k1=None, k2=None, umax=None):
+    """
+    S, C_1, C_2 and C* (parameters from ACC_SETS unless given) on axes: each
+    a Group of the shaded set and its boundary. The values of b_0, b_1 and
+    b_2 are cached per grid tile in .setcache/, keyed on the parameters.
+    """
+    params = dict(ACC_SETS)
+    params.update({k: v for k, v in dict(k0=k0, k1=k1, k2=k2, umax=umax).items() if v is not None})
+    U = Box(-params["umax"], params["umax"])
+    b = ICCBF(acc.f, acc.g, acc.h, acc.class_k(params["k0"], params["k1"], params["k2"]), U)
+
+    x_range, y_range = [0, 100], [0, 24]
+    xs, ys, B = evaluate(b, x_range, y_range, ACC_SETS_GRID, N=2, key=dict(system="acc", **params),
+                         cache_dir=str(SETS_DIR))
+    inside = list(B >= 0) + [np.all(B >= 0, axis=0)]
+    values = list(B) + [B.min(axis=0)]
+
+    # axes are linear, so the screen point is origin + x*ex + y*ey
+    origin = axes.c2p(0, 0)
+    ex = axes.c2p(1, 0) - origin
+    ey = axes.c2p(0, 1) - origin
+
+    groups = []
+    for mask, Z, color in zip(inside, values, SET_COLORS):
+        rgba = np.zeros(mask.shape + (4,), dtype=np.uint8)
+        rgba[mask] = [int(color[i:i + 2], 16) for i in (1, 3, 5)] + [110]
+        shade = ImageMobject(rgba[::-1])
+        shade.stretch_to_fit_width(axes.c2p(100, 0)[0] - origin[0])
+        shade.stretch_to_fit_height(axes.c2p(0, 24)[1] - origin[1])
+        shade.move_to(axes.c2p(50, 12))
+
+        boundary = VGroup()
+        for line in contours(xs, ys, Z):
+            curve = VMobject(color=color, stroke_width=4)
+            curve.set_points_as_corners(origin + np.outer(line[:, 0], ex) + np.outer(line[:, 1], ey))
+            boundary.add(curve)
+        groups.append(Group(shade, boundary))
+    return groups
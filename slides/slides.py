@@ -1,6 +1,10 @@
 from manim import *
 from manim_pptx import *
 
+import texcache
+
+texcache.install()
+
 class TitleSlide(PPTXScene):
   def construct(self):
       title = Tex(r"Safe Control Synthesis via \\ Input Constrained \\ Control Barrier Functions")#, font_size=144)
@@ -925,6 +929,7 @@ slides = [
 class Together(*slides):
     
     def setup(self):
+        texcache.prefetch(slides)
         for s in slides:
             s.setup(self)
 
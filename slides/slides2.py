@@ -2,6 +2,14 @@ from manim import *
 from manim_pptx import *
 import numpy as np
 
+import profiling
+import results
+import texcache
+from deck import page_number
+from mobjects import CurveFamily, NumericLabel
+
+texcache.install()
+
 titleKwargs = {'font_size': 36, 'include_underline':True, 'underline_buff': 0.125}
 
 class TitleSlide(PPTXScene):
@@ -105,17 +113,18 @@ class BackgroundSlide_CBFs(PPTXScene):
       return np.cos(a)**2
 
 
-    func = always_redraw(
-        lambda: ax.plot(
-          lambda t: 8.0 * np.exp(-get_a(alpha.get_value()) * t) - offset.get_value()*t, 
-          x_range=[0,10],
-          color=MAROON
-        )
+    # the family is evaluated once for the whole alpha sweep;
+    # the offset enters linearly, so one step over its range is exact
+    func = CurveFamily(
+        ax,
+        lambda t, a, c: 8.0 * np.exp(-get_a(a) * t) - c*t,
+        [(alpha, [0, 3*np.pi, np.pi/240]), (offset, [0, 0.2, 0.2])],
+        x_range=[0,10],
+        color=MAROON
     )
 
-    func_label = always_redraw(
-      lambda: Tex(fr"$\alpha(r) = {get_a(alpha.get_value()):.2f}r$").next_to(ax, DOWN)
-    )
+    func_label = NumericLabel(r"\alpha(r) = ", r"r", lambda: get_a(alpha.get_value()))
+    func_label.next_to(ax, DOWN)
 
     motivation = Tex(r"Let $\alpha \in \mathcal{K}$.\\",
     r"If $\forall x \in \mathcal{S}$, $\exists u \in \mathcal{U}$", r" such that \\",
@@ -579,9 +588,12 @@ class SimulationResultsACC_res1(PPTXScene):
         title = Title("Simulation Results: Adaptive Cruise Control", **titleKwargs)
         self.add(title)
         self.endSlide()
-        cbf_standard = ImageMobject("drawings/acc_results_1.png")
-        cbf_standard.width = 15
-        cbf_standard.shift(DOWN)
+        panels = results.acc_panels()
+        panels.width = 14
+        panels.shift(DOWN)
+        curves = results.acc_curves(panels, results.CLF_CBF_QP)
+        legend = results.acc_legend([results.CLF_CBF_QP])
+        legend.move_to(panels[2][0].get_corner(UR), UR).shift(0.1*DL)
 
         cite = Tex(r"[Ames, 2019]", font_size=26)
         cite.to_corner(DL)
@@ -594,7 +606,8 @@ class SimulationResultsACC_res1(PPTXScene):
         desc = Tex(r"Applying clipped CLF-CBF-QP controller is not safe\\since $h(x)$ is not a valid CBF, with input constraints", color=BLUE)
         desc.shift(2.5*DOWN)
         
-        self.play(FadeIn(qp, cite, cbf_standard))
+        self.play(FadeIn(qp, cite, panels, legend))
+        self.play(Create(curves))
         self.play(FadeIn(desc))
         self.endSlide()
 
@@ -603,13 +616,11 @@ class SimulationResultsACC_res2(PPTXScene):
         title = Title("Simulation Results: Adaptive Cruise Control", **titleKwargs)
         self.add(title)
         
-        s1 = ImageMobject("drawings/acc_sets_1.png")
-        s2 = ImageMobject("drawings/acc_sets_2.png")
-        s3 = ImageMobject("drawings/acc_sets_3.png")
-        s4 = ImageMobject("drawings/acc_sets_4.png")
-        for s in [s1,s2,s3,s4]:
-            s.width = 6
-            s.shift(0.5*DOWN + 3*LEFT)
+        plot = results.acc_set_axes()
+        plot.shift(0.5*DOWN + 3*LEFT)
+        sets = results.acc_sets(plot[0])
+        s1 = Group(plot, sets[0])
+        s2, s3, s4 = sets[1:]
             
         self.add(s1)
         
@@ -624,9 +635,9 @@ class SimulationResultsACC_res2(PPTXScene):
                         r"b_1(x) &= \inf_{u \in \mathcal{U}} \dot h + ",r"\alpha_0(h(x))\\",
                         r"&{}\quad\quad \quad (\alpha_0(r) = 4 r)")
         cond2.set_color_by_tex(r"4", BLUE)
-        cond2.next_to(s2, RIGHT)
+        cond2.next_to(s1, RIGHT)
         self.play(TransformMatchingTex(cond1, cond2))
-        self.play(FadeOut(s1), FadeIn(s2))
+        self.play(FadeIn(s2))
         self.endSlide()
         self.remove(cond1)
         self.add(cond2)
@@ -637,9 +648,9 @@ class SimulationResultsACC_res2(PPTXScene):
                         r"b_2(x) &= \inf_{u \in \mathcal{U}} \dot b_1 + ", r"\alpha_1(b_1(x))\\",
                         r"&{}\quad\quad \quad (\alpha_1(r) = 7 \sqrt{r})")
         cond3.set_color_by_tex(r"7", BLUE)
-        cond3.next_to(s3, RIGHT)
+        cond3.next_to(s1, RIGHT)
         self.play(TransformMatchingTex(cond2, cond3))
-        self.play(FadeOut(s2), FadeIn(s3))
+        self.play(FadeIn(s3))
 
         self.endSlide()
         self.remove(cond2)
@@ -651,9 +662,9 @@ class SimulationResultsACC_res2(PPTXScene):
                         r"b_2(x) &= \inf_{u \in \mathcal{U}} \dot b_1 + ", r"7\sqrt{b_1(x)}\\",
                         r"\mathcal{C}^* &= \mathcal{S} \cap \mathcal{C}_1 \cap \mathcal{C}_2")
         cond4.set_color_by_tex(r"\mathcal{C}", BLUE)
-        cond4.next_to(s4, RIGHT).shift(0.5*UP)
+        cond4.next_to(s1, RIGHT).shift(0.5*UP)
         self.play(TransformMatchingTex(cond3, cond4))
-        self.play(FadeOut(s3), FadeIn(s4))
+        self.play(FadeIn(s4))
         self.endSlide()
         self.remove(cond3)
         self.add(cond4)
@@ -669,16 +680,19 @@ class SimulationResultsACC_res3(PPTXScene):
         title = Title("Simulation Results: Adaptive Cruise Control", **titleKwargs)
         self.add(title)
         
-        cbf1 = ImageMobject("drawings/acc_results_1.png")
-        cbf1.width = 15
-        cbf1.shift(DOWN)
-        self.add(cbf1)
+        panels = results.acc_panels()
+        panels.width = 14
+        panels.shift(DOWN)
+        cbf1 = results.acc_curves(panels, results.CLF_CBF_QP)
+        legend1 = results.acc_legend([results.CLF_CBF_QP])
+        legend1.move_to(panels[2][0].get_corner(UR), UR).shift(0.1*DL)
+        self.add(panels, cbf1, legend1)
         
-        cbf2 = ImageMobject("drawings/acc_results_2.png")
-        cbf2.width = 15
-        cbf2.shift(DOWN)
+        cbf2 = results.acc_curves(panels, results.ICCBF_QP)
+        legend2 = results.acc_legend([results.CLF_CBF_QP, results.ICCBF_QP])
+        legend2.move_to(legend1, UR)
         
-        self.play(ReplacementTransform(cbf1, cbf2))
+        self.play(ReplacementTransform(legend1, legend2), Create(cbf2))
         
         
         desc = Tex(r"Using the ICCBF, the controller starts\\ braking earlier to maintain safety", color=BLUE)
@@ -796,9 +810,14 @@ slides = [
 ]
 
 
+# renders the whole deck in one process.
+# `python deck.py slides2` renders each slide in its own process instead, and
+# PROFILE_SLIDES=1 ends the run with a report of where the time went
 class _Slides(*slides):
     
     def setup(self):
+        profiling.install(slides)
+        texcache.prefetch(slides)
         for s in slides:
             s.setup(self)
 
@@ -807,13 +826,13 @@ class _Slides(*slides):
 
         for s in slides:
             # self.endSlide()
-            pageNum = Tex(counter, font_size=24, fill_opacity=0.8)
-            pageNum.to_edge(DOWN).to_edge(RIGHT).shift(0.25*DOWN)
-            self.add(pageNum)
+            self.add(page_number(counter))
             counter += 1
             s.construct(self)
 
             if len(self.mobjects) >= 1:
                 self.remove(*self.mobjects)
+
+        profiling.report()
             
             
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""
+Persistent, content-addressed cache for compiled TeX.
+
+manim compiles every Tex/MathTex on its own and leaves the .tex/.log/.aux/.dvi
+files behind in media/Tex. Once `install()` has been called, the svg for an
+expression is instead looked up in a shared cache directory, keyed on the hash
+of the full .tex file (expression, environment and template) and the font size
+of the Tex. The cache is trimmed to `TEX_CACHE_MB` megabytes, dropping the
+least recently used files.
+
+`prefetch(slides)` runs each scene's construct without rendering to collect
+the expressions the deck uses, then compiles all the missing ones in a single
+LaTeX run, and splits the pages into one svg per expression. If the document
+does not come out with one page per expression (or latex fails on one of
+them), the expressions are compiled one at a time instead.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from manim import *
+
+
+CACHE_DIR = Path(os.environ.get("TEX_CACHE_DIR", Path(__file__).parent / ".texcache"))
+MAX_BYTES = int(float(os.environ.get("TEX_CACHE_MB", 256)) * 2**20)
+
+# counters for this process
+stats = {"hits": 0, "misses": 0, "compiles": 0}
+
+# while probing, missing expressions are collected here instead of compiled
+_probing = None
+
+# font size of the Tex being built, set by the __init__ that install() wraps
+_font_size = None
+
+_PROBE_SVG = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1 1"><path d="M0 0h1v1h-1z"/></svg>'
+_PAGE = "\0PAGE\0"
+
+
+def _texcode(expression, environment, tex_template):
+    if environment is not None:
+        return tex_template.get_texcode_for_expression_in_env(expression, environment)
+    return tex_template.get_texcode_for_expression(expression)
+
+
+def _key(texcode, font_size=None):
+    return hashlib.sha256(f"{font_size}\0{texcode}".encode()).hexdigest()[:32]
+
+
+def tex_to_svg_file(expression, environment=None, tex_template=None):
+    # drop-in replacement for manim.utils.tex_file_writing.tex_to_svg_file
+
+    if tex_template is None:
+        tex_template = config["tex_template"]
+
+    texcode = _texcode(expression, environment, tex_template)
+    key = _key(texcode, _font_size)
+    svg = CACHE_DIR / (key + ".svg")
+
+    if svg.exists():
+        stats["hits"] += 1
+        os.utime(svg)
+        return svg
+
+    if _probing is not None:
+        _probing[key] = (expression, environment, tex_template)
+        probe = CACHE_DIR / "_probe.svg"
+        if not probe.exists():
+            probe.write_text(_PROBE_SVG)
+        return probe
+
+    stats["misses"] += 1
+    _compile({key: (expression, environment, tex_template)})
+    evict()
+    return svg
+
+
+def install():
+    # makes every Tex/MathTex in this process go through the cache
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    sys.modules[SingleStringMathTex.__module__].tex_to_svg_file = tex_to_svg_file
+
+    init = SingleStringMathTex.__init__
+    if getattr(init, "texcache", False):
+        return
+
+    def __init__(self, *args, font_size=DEFAULT_FONT_SIZE, **kwargs):
+        global _font_size
+        outer, _font_size = _font_size, font_size
+        try:
+            init(self, *args, font_size=font_size, **kwargs)
+        finally:
+            _font_size = outer
+
+    __init__.texcache = True
+    SingleStringMathTex.__init__ = __init__
+
+
+class _Probe:
+    # stands in for a scene: every method is a no-op, so construct only
+    # builds its mobjects
+    mobjects = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def prefetch(slides):
+    # compiles every uncached expression used by the scenes in one latex run
+    global _probing
+
+    _probing = {}
+    try:
+        for scene in slides:
+            try:
+                scene.construct(_Probe())
+            except Exception as e:
+                # anything missed here is compiled on its own during the render
+                logger.debug(f"texcache: could not probe {scene.__name__}: {e}")
+        missing = _probing
+    finally:
+        _probing = None
+
+    if missing:
+        logger.info(f"texcache: compiling {len(missing)} expressions in one batch")
+        stats["misses"] += len(missing)
+        # an expression that does not compile is left for the render to report
+        _compile(missing, strict=False)
+        evict()
+
+    return len(missing)
+
+
+def _compile(jobs, strict=True):
+    # jobs: {key: (expression, environment, tex_template)}
+    # expressions that share a template are compiled as pages of one document
+
+    groups = {}
+    for key, (expression, environment, tex_template) in jobs.items():
+        prefix, suffix = _texcode(_PAGE, None, tex_template).split(_PAGE)
+        page = _texcode(expression, environment, tex_template)[len(prefix):-len(suffix) or None]
+        group = (prefix, suffix, tex_template.tex_compiler, tex_template.output_format)
+        groups.setdefault(group, []).append((key, page))
+
+    for (prefix, suffix, compiler, output_format), pages in groups.items():
+        if len(pages) > 1 and "{standalone}" in prefix:
+            try:
+                pages = _compile_batch(prefix, suffix, compiler, output_format, pages)
+            except (RuntimeError, OSError) as e:
+                logger.warning(f"texcache: batch compile failed ({e}), compiling one at a time")
+
+        for key, page in pages:
+            try:
+                _compile_one(prefix + page + suffix, compiler, output_format, key)
+            except ValueError as e:
+                if strict:
+                    raise
+                logger.warning(f"texcache: {e}")
+
+
+def _run_latex(texcode, compiler, output_format, workdir):
+    tex_file = Path(workdir) / "expr.tex"
+    tex_file.write_text(texcode, encoding="utf-8")
+
+    command = [compiler, "-interaction=batchmode", "-halt-on-error", f"-output-directory={workdir}"]
+    if compiler == "xelatex":
+        if output_format == ".xdv":
+            command.append("-no-pdf")
+    else:
+        command.append(f"-output-format={output_format[1:]}")
+
+    stats["compiles"] += 1
+    subprocess.run(command + [str(tex_file)], cwd=workdir, stdout=subprocess.DEVNULL)
+
+    result = tex_file.with_suffix(output_format)
+    if not result.exists():
+        log = tex_file.with_suffix(".log")
+        errors = [l for l in log.read_text(errors="replace").splitlines() if l.startswith("!")] if log.exists() else []
+        raise RuntimeError(f"{compiler} error: {' '.join(errors) or 'no output'}")
+    return result
+
+
+def _dvisvgm(dvi, output_format, pattern, pages="1"):
+    command = ["dvisvgm", f"--page={pages}", "-n", "-v", "0", "-o", pattern, str(dvi)]
+    if output_format == ".pdf":
+        command.insert(1, "--pdf")
+    subprocess.run(command, stdout=subprocess.DEVNULL)
+
+
+def _compile_one(texcode, compiler, output_format, key):
+    # work inside the cache so the final move is an atomic rename
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR) as workdir:
+        try:
+            dvi = _run_latex(texcode, compiler, output_format, workdir)
+        except RuntimeError as e:
+            raise ValueError(f"{e}\n{texcode}") from None
+        svg = Path(workdir) / "expr.svg"
+        _dvisvgm(dvi, output_format, str(svg))
+        if not svg.exists():
+            raise ValueError("dvisvgm could not convert the compiled tex to svg")
+        shutil.move(str(svg), CACHE_DIR / (key + ".svg"))
+
+
+def _compile_batch(prefix, suffix, compiler, output_format, pages):
+    # every expression becomes one page of a multi page standalone document;
+    # returns the pages that still have to be compiled on their own
+    prefix = re.sub(r"\\documentclass\[([^\]]*)\]\{standalone\}",
+                    r"\\documentclass[\1,multi=texcachepage]{standalone}", prefix, count=1)
+    prefix = prefix.replace(r"\begin{document}", "\\newenvironment{texcachepage}{}{}\n\\begin{document}", 1)
+    body = "".join(f"\\begin{{texcachepage}}\n{page}\n\\end{{texcachepage}}\n" for _, page in pages)
+
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR) as workdir:
+        dvi = _run_latex(prefix + body + suffix, compiler, output_format, workdir)
+        _dvisvgm(dvi, output_format, str(Path(workdir) / "page-%p.svg"), pages="1-")
+
+        svgs = {int(re.search(r"(\d+)\.svg$", p.name).group(1)): p for p in Path(workdir).glob("page-*.svg")}
+        if sorted(svgs) != list(range(1, len(pages) + 1)):
+            # an expression that spans pages (or has none) shifts every page
+            # after it, so none of them can be trusted
+            logger.warning(f"texcache: expected {len(pages)} pages, got {len(svgs)}, compiling one at a time")
+            return pages
+
+        for i, (key, _) in enumerate(pages):
+            shutil.move(str(svgs[i + 1]), CACHE_DIR / (key + ".svg"))
+        return []
+
+
+def evict(max_bytes=MAX_BYTES):
+    # removes the least recently used svgs until the cache fits in max_bytes
+    # (other render processes may be evicting at the same time)
+    files = []
+    for p in CACHE_DIR.glob("*.svg"):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, p))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the tests import iccbf (and the slides' modules) from the repo, like the benchmarks
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "slides"))
@@ -0,0 +1,37 @@
+import numpy as np
+
+from iccbf import ICCBF, ActiveSetFilter, SafetyFilter, spacecraft as sc
+
+
+def docking_states(M, rng):
+    return np.column_stack([
+        rng.uniform(5e-3, 0.1, M),
+        rng.uniform(-2e-2, 2e-2, M),
+        rng.uniform(-1e-3, 1e-3, M),
+        rng.uniform(-1e-3, 1e-3, M),
+        np.zeros(M),
+    ])
+
+
+def test_active_set_matches_osqp():
+    X = docking_states(500, np.random.default_rng(0))
+    b = ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U)
+
+    success, U = ActiveSetFilter(b, sc.V).solve(X)
+    osqp_success, osqp_U = SafetyFilter(b, sc.V, eps_abs=1e-10, eps_rel=1e-10, max_iter=200000,
+                                        polishing=True).solve(X)
+
+    assert np.array_equal(success, osqp_success)
+    assert np.abs(U - osqp_U)[success].max() < 1e-6
+
+
+def test_safety_filter_rows_are_scaled():
+    X = docking_states(500, np.random.default_rng(1))
+    # L_g V = 0 where v = -0.1 (p - p_port)
+    X[::2, 2] = -0.1 * (X[::2, 0] - sc.rp)
+    X[::2, 3] = -0.1 * X[::2, 1]
+    b = ICCBF(sc.f, sc.g, sc.h, sc.alphas, sc.U)
+    controller = SafetyFilter(b, sc.V)
+    controller.update(X)
+    m = controller.m
+    assert np.abs(controller._vals[:, :2 * m + 2]).max() <= 1e3
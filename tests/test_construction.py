@@ -0,0 +1,62 @@
+import numpy as np
+
+from iccbf import ICCBF, acc
+from iccbf.autodiff import Jet
+
+
+def _states():
+    rng = np.random.default_rng(0)
+    return np.column_stack([rng.uniform(40, 100, 64), rng.uniform(5, 20, 64)])
+
+
+def test_acc_b1_closed_form():
+    # b_1 = L_f h + inf_u L_g h u + 4 h with h = d - 1.8 v and |u| <= umax
+    X = _states()
+    d, v = X.T
+    F = acc.f0 + acc.f1 * v + acc.f2 * v**2
+    b1 = (acc.v0 - v) + 1.8 * F / acc.m - 1.8 * acc.g0 * acc.umax + 4 * (d - 1.8 * v)
+
+    for method in ("jet", "dual", "fd"):
+        B = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U, method=method).levels(X)
+        assert B.shape == (3, len(X))
+        np.testing.assert_allclose(B[0], d - 1.8 * v, rtol=1e-12)
+        np.testing.assert_allclose(B[1], b1, rtol=1e-9)
+
+
+def test_methods_agree_on_every_level():
+    X = _states()
+    jet = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U).levels(X)
+    dual = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U, method="dual").levels(X)
+    fd = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U, method="fd").levels(X)
+    np.testing.assert_allclose(dual, jet, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(fd, jet, rtol=1e-6, atol=1e-6)
+
+
+def test_lie_levels_match_finite_differences():
+    X = _states()
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    B, Lf, Lg = b.lie_levels(X)
+
+    step = np.array([1e-4, 1e-5]) * np.abs(X).max(axis=0)
+    grad = np.stack([(b.levels(X + s) - b.levels(X - s)) / (2 * s[j])
+                     for j, s in enumerate(np.diag(step))], axis=-1)
+    np.testing.assert_allclose(B, b.levels(X), rtol=1e-12)
+    np.testing.assert_allclose(Lf, np.einsum("imj,mj->im", grad, acc.f(X)), rtol=1e-5, atol=1e-8)
+    np.testing.assert_allclose(Lg[..., 0], grad @ acc.B[:, 0], rtol=1e-5, atol=1e-8)
+
+    dual = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U, method="dual").lie_levels(X)
+    for a, c in zip(dual, (B, Lf, Lg)):
+        np.testing.assert_allclose(a, c, rtol=1e-12, atol=1e-12)
+
+
+def test_jet_derivatives_of_a_known_function():
+    X = _states() / 10
+    y = Jet.seed(X, 3)
+    p = y[:, 0]**2 * np.sin(y[:, 1]) + np.exp(y[:, 0] * y[:, 1])
+    x0, x1 = X.T
+    e = np.exp(x0 * x1)
+    np.testing.assert_allclose(p.value, x0**2 * np.sin(x1) + e)
+    np.testing.assert_allclose(p.derivative(0).derivative(1).value,
+                               2 * x0 * np.cos(x1) + e * (1 + x0 * x1))
+    np.testing.assert_allclose(p.derivative(1).derivative(1).derivative(1).value,
+                               -x0**2 * np.cos(x1) + x0**3 * e)
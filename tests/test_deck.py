@@ -0,0 +1,31 @@
+import types
+
+import pytest
+
+pytest.importorskip("manim")
+pytest.importorskip("manim_pptx")
+
+import deck  # noqa: E402
+
+
+class _Scene:
+    def __init__(self):
+        self.added = []
+
+    def add(self, mobject):
+        self.added.append(mobject)
+
+    def construct(self):
+        pass
+
+
+def test_only_decks_with_page_numbers_get_them():
+    plain = types.ModuleType("plain")
+    paged = types.ModuleType("paged")
+    paged.page_number = deck.page_number
+    assert not deck.has_page_numbers(plain) and deck.has_page_numbers(paged)
+
+    for pages, count in ((False, 0), (True, 1)):
+        scene = deck.numbered(_Scene, 3, pages)()
+        scene.construct()
+        assert len(scene.added) == count
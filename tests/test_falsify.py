@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from iccbf import ICCBF, Box, Linear
+
+pytest.importorskip("scipy")
+
+from iccbf.falsify import falsify, margin  # noqa: E402
+
+# h = 1 - x_0 with a bump in f_0 around CENTRE that no input can cancel:
+# margin(x) = 1 - x_0 - 2 exp(-|x - CENTRE|^2 / WIDTH^2) < 0 only near CENTRE
+CENTRE = np.array([0.3, 0.6])
+WIDTH = 0.03
+BOUNDS = ([0, 0], [2, 1])
+
+
+def f(X):
+    bump = np.exp(-np.sum((X - CENTRE)**2, axis=-1) / WIDTH**2)
+    return np.stack([2 * bump, -X[:, 1]], axis=-1)
+
+
+def f_safe(X):
+    return np.stack([0 * X[:, 0], -X[:, 1]], axis=-1)
+
+
+def g(X):
+    return np.array([[0.0], [1.0]])
+
+
+def h(X):
+    return 1 - X[:, 0]
+
+
+def _iccbf(f):
+    return ICCBF(f, g, h, [Linear(1.0)], Box(-1, 1))
+
+
+def _last(reports):
+    reports = list(reports)
+    assert reports[-1]["done"] and not any(r["done"] for r in reports[:-1])
+    return reports, reports[-1]
+
+
+def test_finds_the_planted_violation():
+    b = _iccbf(f)
+    reports, report = _last(falsify(b, BOUNDS, samples=1 << 14, batch=1 << 10, workers=0))
+    assert [r["samples"] for r in reports] == list(range(1 << 10, (1 << 14) + 1, 1 << 10))
+
+    X = report["X"]
+    assert report["violations"] > 0 and len(X) == min(10, report["violations"])
+    assert np.all(np.diff(report["margin"]) >= 0) and np.all(report["margin"] < 0)
+    np.testing.assert_allclose(margin(b, X)[0], report["margin"])
+    assert np.all(np.linalg.norm(X - CENTRE, axis=1) < 2 * WIDTH)
+    # the worst point is close to the worst margin, 1 - 0.3 - 2
+    assert report["margin"][0] < -1.2
+    # about half the box is in C* = {x_0 <= 1}
+    assert abs(report["inside"] / report["samples"] - 0.5) < 0.01
+
+
+def test_no_violation_without_the_bump():
+    _, report = _last(falsify(_iccbf(f_safe), BOUNDS, samples=1 << 12, batch=1 << 10, workers=0))
+    assert report["samples"] == 1 << 12 and report["violations"] == 0 and len(report["X"]) == 0
+
+
+def test_first_stops_early():
+    _, report = _last(falsify(_iccbf(f), BOUNDS, samples=1 << 16, batch=1 << 9, workers=0, first=True))
+    assert report["violations"] > 0 and report["samples"] < 1 << 16
+
+
+def test_pool_finds_the_same_points():
+    b = _iccbf(f)
+    _, serial = _last(falsify(b, BOUNDS, samples=1 << 13, batch=1 << 10, workers=0))
+    _, pooled = _last(falsify(b, BOUNDS, samples=1 << 13, batch=1 << 10, workers=2))
+    for key in ("samples", "inside", "violations"):
+        assert pooled[key] == serial[key]
+    np.testing.assert_array_equal(pooled["margin"], serial["margin"])
+    np.testing.assert_array_equal(pooled["X"], serial["X"])
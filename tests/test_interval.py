@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+
+from iccbf import ICCBF, acc, spacecraft as sc
+from iccbf.falsify import margin
+from iccbf.interval import Interval
+from iccbf.verify import enclose
+
+
+def random_boxes(rng, lo, hi, K):
+    a, b = rng.uniform(lo, hi, (2, K, len(lo)))
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def samples(rng, lo, hi, S):
+    # the corners' neighbourhood matters most: half the points are on the faces
+    t = rng.uniform(0, 1, (S,) + lo.shape)
+    t[: S // 2] = np.round(t[: S // 2])
+    return np.clip(lo + t * (hi - lo), lo, hi)
+
+
+def inside(values, enclosure):
+    return np.all((enclosure.lo <= values) & (values <= enclosure.hi))
+
+
+@pytest.mark.parametrize("terms", [[1, 1e-17, -1], [1e20, 1, -1e20], [0.1, 0.2, -0.3], [1e-300, -1e-300, 1e-320]])
+def test_cancelling_sums(terms):
+    s = np.sum(Interval(terms))
+    assert s.lo <= math.fsum(terms) <= s.hi
+
+
+def test_random_cancelling_sums():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        x = rng.standard_normal(50) * 10.0 ** rng.integers(-20, 20, 50)
+        x = np.append(x, -math.fsum(x) + rng.standard_normal() * 1e-25)
+        s = np.sum(Interval(x))
+        assert s.lo <= math.fsum(x) <= s.hi
+
+
+@pytest.mark.parametrize("fn", [np.exp, np.log, np.sin, np.cos, np.sqrt, np.square, np.reciprocal, np.abs,
+                                lambda x: x ** 3, lambda x: x ** 0.5, lambda x: x * x - 2 * x,
+                                lambda x: np.sum(x * x - x, axis=-1)])
+def test_elementary_functions(fn):
+    rng = np.random.default_rng(1)
+    lo, hi = random_boxes(rng, [0.01, 0.01], [20.0, 20.0], 500)
+    enclosure = fn(Interval(lo, hi))
+    for x in samples(rng, lo, hi, 50):
+        assert inside(fn(x), enclosure)
+
+
+def test_cos_near_its_zero():
+    assert inside(np.cos(np.pi / 2), np.cos(Interval(np.pi / 2)))
+    assert inside(np.sin(np.pi), np.sin(Interval(np.pi)))
+
+
+def test_model_functions():
+    rng = np.random.default_rng(2)
+    for model, lo, hi in ((acc, [0, 0], [100, 24]),
+                          (sc, [5e-3, -2e-2, -1e-3, -1e-3, -0.5], [0.1, 2e-2, 1e-3, 1e-3, 0.5])):
+        lo, hi = random_boxes(rng, lo, hi, 200)
+        box = Interval(lo, hi)
+        h, f = model.h(box), model.f(box)
+        for x in samples(rng, lo, hi, 20):
+            assert inside(model.h(x), h)
+            assert inside(model.f(x), f)
+
+
+def test_enclose_holds_the_margin():
+    rng = np.random.default_rng(3)
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    lo, hi = random_boxes(rng, [0, 0], [100, 24], 200)
+    hi = np.minimum(hi, lo + [5.0, 1.0])
+    B, m = enclose(b, lo, hi)
+    for x in samples(rng, lo, hi, 20):
+        assert inside(b.lie_levels(x)[0], B)
+        assert inside(margin(b, x)[0], m)
@@ -0,0 +1,62 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from iccbf import acc, kernels, spacecraft as sc
+from iccbf.autodiff import Jet
+from iccbf.simulate import simulate, simulate_adaptive
+from test_activeset import docking_states
+
+
+def _states(model, rng):
+    if model is acc:
+        return np.column_stack([rng.uniform(0, 100, 500), rng.uniform(0, 30, 500)])
+    X = docking_states(500, rng)
+    X[:, 4] = rng.uniform(-np.pi, np.pi, len(X))
+    return X
+
+
+@pytest.mark.parametrize("model, kernel, numpy_kernel, loop", [
+    (acc, kernels.acc_f, kernels._acc_numpy, kernels._acc_loop),
+    (sc, kernels.spacecraft_f, kernels._spacecraft_numpy, kernels._spacecraft_loop),
+])
+def test_kernels_match_the_model(model, kernel, numpy_kernel, loop):
+    X = _states(model, np.random.default_rng(0))
+    expected = model.f(X)
+    for fn in (numpy_kernel, loop, kernel.kernel):
+        out = np.full(X.shape, np.nan)
+        assert fn(X, out) is out
+        np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-12 * np.abs(expected).max())
+
+    out = np.empty(X.shape)
+    assert kernel(X, out) is out
+    np.testing.assert_allclose(kernel(X), expected, rtol=1e-12, atol=1e-12 * np.abs(expected).max())
+    # strided input is made contiguous
+    np.testing.assert_allclose(kernel(np.asfortranarray(X)), expected, rtol=1e-12, atol=1e-12 * np.abs(expected).max())
+
+
+def test_non_arrays_go_to_the_model():
+    X = _states(acc, np.random.default_rng(1))
+    jet = kernels.acc_f(Jet.seed(X, 2))
+    assert isinstance(jet, Jet)
+    np.testing.assert_allclose(jet.value, acc.f(X), rtol=1e-14)
+
+
+def test_pickled_by_name():
+    assert pickle.loads(pickle.dumps(kernels.spacecraft_f)) is kernels.spacecraft_f
+
+
+class Constant:
+    def solve(self, X):
+        return np.ones(len(X), dtype=bool), np.full((len(X), 1), 0.1)
+
+
+def test_simulators_run_the_kernel():
+    X0 = np.array([[100.0, 20.0], [80.0, 10.0]])
+    for run in (lambda f: simulate(f, acc.g, Constant(), X0, 5.0, 1e-2),
+                lambda f: simulate_adaptive(f, acc.g, Constant(), X0, 5.0, control_period=0.1)):
+        _, t, X, _ = run(kernels.acc_f)
+        _, t_model, X_model, _ = run(acc.f)
+        np.testing.assert_allclose(t, t_model)
+        np.testing.assert_allclose(X, X_model, rtol=1e-12)
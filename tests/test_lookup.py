@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from iccbf import ICCBF, ScalarFilter, acc
+from iccbf.lookup import LookupTable, build
+
+
+BOUNDS = ([0, 0], [100, 24])
+
+
+@pytest.fixture(scope="module")
+def table():
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    return build(b, acc.u_des, BOUNDS, shape=(8, 8), max_level=4)
+
+
+def accepted_subcells(table):
+    # lo and hi corners of every subcell where the table answers
+    (x0, y0), (x1, y1) = table.bounds
+    ny, nx = table.level.shape
+    w, h = (x1 - x0) / nx, (y1 - y0) / ny
+    lo, hi = [], []
+    for i in range(ny):
+        for j in range(nx):
+            n = 1 << int(table.level[i, j])
+            ok = table.ok[table.cell_offset[i, j]:][:n * n].reshape(n, n)
+            c, a = np.nonzero(ok)
+            lo.append(np.column_stack([x0 + (j + a / n) * w, y0 + (i + c / n) * h]))
+            hi.append(np.column_stack([x0 + (j + (a + 1) / n) * w, y0 + (i + (c + 1) / n) * h]))
+    return np.concatenate(lo), np.concatenate(hi)
+
+
+def test_table_u_satisfies_the_constraint(table):
+    lo, hi = accepted_subcells(table)
+    assert len(lo) > 1000
+
+    rng = np.random.default_rng(0)
+    for _ in range(8):
+        # a point of every accepted subcell, away from its edges (which it
+        # shares with subcells the table may not answer for)
+        X = lo + rng.uniform(0.01, 0.99, lo.shape) * (hi - lo)
+        success, u = table.solve(X)
+        assert np.all(table.status == "table")
+        B, Lf, Lg = table.b.lie(X)
+        assert np.all(Lf + Lg[:, 0] * u[:, 0] + table.b.alphas[-1](B) >= -1e-9)
+        assert np.all((u >= acc.U.lo[0]) & (u <= acc.U.hi[0]))
+
+
+def test_fallback_outside_the_region(table):
+    X = np.array([[-5.0, 10.0], [120.0, 5.0], [50.0, 30.0], [50.0, -1.0]])
+    success, u = table.solve(X)
+    assert np.all(table.status == "exact")
+    assert table.info["fallback"] == len(X)
+    exact_success, exact_u = ScalarFilter(table.b, acc.u_des).solve(X)
+    np.testing.assert_array_equal(success, exact_success)
+    np.testing.assert_allclose(u, exact_u)
+
+
+def test_save_and_load(table, tmp_path):
+    table.save(tmp_path / "table.npz")
+    loaded = LookupTable.load(tmp_path / "table.npz", table.b, acc.u_des)
+    X = np.column_stack([np.linspace(1, 99, 200), np.linspace(1, 23, 200)])
+    np.testing.assert_array_equal(loaded.solve(X)[1], table.solve(X)[1])
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("manim")
+
+import texcache  # noqa: E402
+from manim import DEFAULT_FONT_SIZE  # noqa: E402
+from mobjects import NumericLabel  # noqa: E402
+
+
+class _Scene:
+    def construct(self):
+        NumericLabel(r"\alpha(r) = ", r"r", lambda: 1.23)
+
+
+def test_numeric_label_after_prefetch(tmp_path, monkeypatch):
+    # prefetch builds the label from placeholder TeX, the render from the real one
+    monkeypatch.setattr(texcache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(NumericLabel, "_digits", {})
+    texcache.install()
+
+    texcache.prefetch([_Scene])
+    label = NumericLabel(r"\alpha(r) = ", r"r", lambda: 1.23)
+
+    assert len(NumericLabel._digits[DEFAULT_FONT_SIZE]) == 10
+    assert len(label.slots) == 3
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from iccbf.recorder import STATUS, Every, MinMax, Recorder
+
+
+def _run(rec, steps=1000, K=3):
+    # a random walk of K trajectories, all running
+    rng = np.random.default_rng(1)
+    X = np.cumsum(rng.normal(size=(steps, K, 2)), axis=0)
+    U = rng.normal(size=(steps, K, 1))
+    for i in range(steps):
+        rec.record(i * 0.1, X[i], U[i], ["running"] * K)
+    rec.flush()
+    return np.arange(steps) * 0.1, X, U
+
+
+def _windows(a, w):
+    # the elementwise minimum and maximum of every window of w rows,
+    # interleaved, the last window may be short
+    out = []
+    for i in range(0, len(a), w):
+        out += [a[i:i + w].min(axis=0), a[i:i + w].max(axis=0)]
+    return np.array(out)
+
+
+def test_every():
+    rec = Recorder(rule=Every(7), chunk=16, h=lambda X: X[:, 0] - X[:, 1])
+    t, X, U = _run(rec)
+    np.testing.assert_array_equal(rec["t"][:, 0], t[::7])
+    np.testing.assert_array_equal(rec["x"], X[::7])
+    np.testing.assert_array_equal(rec["u"], U[::7])
+    np.testing.assert_array_equal(rec["h"], X[::7, :, 0] - X[::7, :, 1])
+    assert np.all(rec["status"] == STATUS.index("running"))
+
+
+def test_minmax_keeps_the_envelope():
+    rec = Recorder(rule=MinMax(30), chunk=16)
+    t, X, U = _run(rec)
+    # 1000 steps: 33 full windows and a short one, flushed
+    assert len(rec) == 2 * 34
+    np.testing.assert_array_equal(rec["x"], _windows(X, 30))
+    np.testing.assert_array_equal(rec["u"], _windows(U, 30))
+    np.testing.assert_array_equal(rec["t"][:, 0], _windows(t, 30))
+
+
+@pytest.mark.parametrize("rule", [Every(1), Every(3), MinMax(5), MinMax(8)])
+def test_coarsen_matches_the_coarser_rule(rule):
+    # rows past max_bytes are merged in place; the result must be what the
+    # coarser rule gives from the start
+    rec = Recorder(rule=rule, chunk=16, max_bytes=4000)
+    t, X, U = _run(rec)
+    assert rec.nbytes <= 4000
+    assert type(rec.rule) is type(rule) and rec.rule.__dict__ != rule.__dict__
+
+    fresh = Recorder(rule=rec.rule, chunk=16)
+    _run(fresh)
+    for name in ("t", "x", "u", "status"):
+        np.testing.assert_array_equal(rec[name], fresh[name])
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from iccbf.service import FilterClient, FilterService
+
+
+class Gain:
+    # u = -2 x_0, failing for x_0 < 0; remembers each batch, and raises on x_0 = 999
+    def __init__(self):
+        self.batches = []
+
+    def solve(self, X):
+        if np.any(X[:, 0] == 999):
+            raise RuntimeError("bad state")
+        self.batches.append(len(X))
+        return X[:, 0] >= 0, -2 * X[:, :1]
+
+
+def _serve(controller, main, **kwargs):
+    # runs main(service, host, port) against a service on a free port
+    async def run():
+        service = FilterService(controller, 2, **kwargs)
+        ready = asyncio.get_running_loop().create_future()
+        server = asyncio.create_task(service.serve("127.0.0.1", 0, ready))
+        try:
+            return await main(service, *await ready)
+        finally:
+            server.cancel()
+    return asyncio.run(run())
+
+
+def test_round_trip():
+    async def main(service, host, port):
+        client = await FilterClient.connect(host, port)
+        one = await client.solve([1.5, 0.0])
+        many = await client.solve([[1.0, 2.0], [-3.0, 4.0]])
+        await client.close()
+        return one, many
+
+    (success, u), (successes, U) = _serve(Gain(), main)
+    assert success.shape == () and success and u.tolist() == [-3.0]
+    assert successes.tolist() == [True, False] and U.tolist() == [[-2.0], [6.0]]
+
+
+def test_concurrent_requests_share_batches():
+    controller = Gain()
+    X = np.random.default_rng(0).normal(size=(60, 2))
+
+    async def main(service, host, port):
+        clients = [await FilterClient.connect(host, port) for _ in range(6)]
+        replies = await asyncio.gather(*(clients[i % 6].solve(x) for i, x in enumerate(X)))
+        stats = await clients[0].stats()
+        for client in clients:
+            await client.close()
+        return replies, stats
+
+    replies, stats = _serve(controller, main, window=0.05)
+    for x, (success, u) in zip(X, replies):
+        assert success == (x[0] >= 0) and u.tolist() == [-2 * x[0]]
+
+    assert sum(controller.batches) == 60 and len(controller.batches) < 60
+    assert stats["requests"] == 60 and stats["states"] == 60
+    assert stats["batches"] == len(controller.batches)
+    assert stats["batch"] == 60 / len(controller.batches)
+    assert 0 <= stats["p50"] <= stats["p99"] <= stats["max"]
+
+
+def test_max_batch():
+    controller = Gain()
+
+    async def main(service, host, port):
+        client = await FilterClient.connect(host, port)
+        await asyncio.gather(*(client.solve([[i, 0.0]] * 3) for i in range(10)))
+        await client.close()
+
+    _serve(controller, main, window=0.05, max_batch=7)
+    # requests are not split: a batch stops at the first to reach max_batch
+    assert sum(controller.batches) == 30 and max(controller.batches) <= 9
+
+
+def test_errors():
+    async def main(service, host, port):
+        client = await FilterClient.connect(host, port)
+        with pytest.raises(ValueError, match="x must have shape"):
+            await client.solve([1.0, 2.0, 3.0])
+        with pytest.raises(ValueError, match="RuntimeError: bad state"):
+            await client.solve([999.0, 0.0])
+        # the service carries on after a failed batch
+        success, u = await client.solve([1.0, 0.0])
+        await client.close()
+
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"not json\n")
+        reply = json.loads(await reader.readline())
+        writer.close()
+        return success, u, reply, service.stats()
+
+    success, u, reply, stats = _serve(Gain(), main)
+    assert success and u.tolist() == [-2.0]
+    assert reply["id"] is None and reply["error"].startswith("JSONDecodeError")
+    assert stats["requests"] == 1
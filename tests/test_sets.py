@@ -0,0 +1,96 @@
+import numpy as np
+
+from iccbf import ICCBF, acc
+from iccbf.sets import contours, evaluate, refine, to_svg
+
+
+def _area(line):
+    x, y = line.T
+    return 0.5 * abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def test_contours_of_a_circle():
+    xs = ys = np.linspace(-2, 2, 201)
+    x, y = np.meshgrid(xs, ys)
+    (line,) = contours(xs, ys, x**2 + y**2, level=1.0)
+
+    np.testing.assert_array_equal(line[0], line[-1])
+    np.testing.assert_allclose(np.hypot(*line.T), 1, atol=1e-3)
+    np.testing.assert_allclose(_area(line), np.pi, rtol=1e-3)
+    # one point on every grid edge the circle crosses, each used once
+    above = x**2 + y**2 > 1
+    crossed = np.sum(above[:, 1:] != above[:, :-1]) + np.sum(above[1:] != above[:-1])
+    assert len(line) - 1 == crossed
+
+
+def test_contours_open_and_disjoint():
+    xs = np.linspace(0, 4, 81)
+    ys = np.linspace(0, 2, 41)
+    x, y = np.meshgrid(xs, ys)
+
+    # two circles, and a line that leaves the grid at both ends
+    circles = np.minimum(np.hypot(x - 1, y - 1), np.hypot(x - 3, y - 1)) - 0.5
+    lines = contours(xs, ys, circles)
+    assert len(lines) == 2
+    assert all(np.array_equal(line[0], line[-1]) for line in lines)
+    np.testing.assert_allclose(sorted(line[:, 0].mean() for line in lines), [1, 3], atol=1e-2)
+
+    (line,) = contours(xs, ys, y - 0.3 * x - 0.5)
+    assert not np.array_equal(line[0], line[-1])
+    np.testing.assert_allclose(line[:, 1], 0.3 * line[:, 0] + 0.5, atol=1e-12)
+    assert set(np.round(line[[0, -1], 0], 12)) == {0.0, 4.0}
+
+
+class Counting(ICCBF):
+    # counts the states b_i is evaluated at
+    states = 0
+
+    def levels(self, X, N=None):
+        Counting.states += len(X)
+        return super().levels(X, N)
+
+
+def test_evaluate_tiles_and_cache(tmp_path):
+    b = Counting(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    xs, ys, B = evaluate(b, [0, 100], [0, 24], (50, 70), tile=16, key="acc", cache_dir=str(tmp_path))
+    x, y = np.meshgrid(xs, ys)
+    np.testing.assert_allclose(B, b.levels(np.column_stack([x.ravel(), y.ravel()])).reshape(B.shape),
+                               rtol=1e-12, atol=1e-12)
+
+    Counting.states = 0
+    _, _, cached = evaluate(b, [0, 100], [0, 24], (50, 70), tile=16, key="acc", cache_dir=str(tmp_path))
+    assert Counting.states == 0
+    np.testing.assert_array_equal(cached, B)
+
+    evaluate(b, [0, 100], [0, 24], (50, 70), tile=16, key="other", cache_dir=str(tmp_path))
+    assert Counting.states == 50 * 70
+
+
+def test_to_svg():
+    xs = ys = np.linspace(-2, 2, 41)
+    x, y = np.meshgrid(xs, ys)
+    svg = to_svg([(contours(xs, ys, x**2 + y**2 - 1), dict(stroke="red")),
+                  (contours(xs, ys, y), dict(stroke_width=2))], [-2, 2], [-2, 2])
+    assert svg.count("<path") == 2
+    assert 'stroke="red"' in svg and 'stroke-width="2"' in svg
+
+
+def _points(lines):
+    return np.unique(np.round(np.concatenate(lines), 9), axis=0) if lines else np.zeros((0, 2))
+
+
+def test_refine_matches_a_dense_grid():
+    b = Counting(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    xs, ys, B = evaluate(b, [0, 100], [0, 24], (257, 257))
+
+    Counting.states = 0
+    lines, stats = refine(b, [0, 100], [0, 24], resolution=256, coarse=16)
+    assert stats["evaluations"] == Counting.states < stats["uniform"] / 10
+    assert stats["uniform"] == 257**2 and stats["cells"][0] == 16**2
+
+    levels = list(B) + [B.min(axis=0)]
+    assert len(lines) == len(levels)
+    for found, Z in zip(lines, levels):
+        dense = contours(xs, ys, Z)
+        assert len(found) == len(dense)
+        np.testing.assert_allclose(_points(found), _points(dense), atol=1e-9)
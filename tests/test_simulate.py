@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from iccbf.simulate import simulate, simulate_adaptive
+
+
+class Feedback:
+    # u = -k x, one solve per call
+    def __init__(self, k):
+        self.k = k
+
+    def solve(self, X):
+        return np.ones(len(X), dtype=bool), -self.k * X[:, :1]
+
+
+class Damping:
+    # u = -k v, failing once the position passes xmax
+    def __init__(self, k, xmax):
+        self.k = k
+        self.xmax = xmax
+
+    def solve(self, X):
+        return X[:, 0] < self.xmax, -self.k * X[:, 1:]
+
+
+def docked(X):
+    return np.hypot(X[:, 0], X[:, 1]) < 0.2
+
+
+def f(X):
+    return np.column_stack([X[:, 1], -X[:, 0]])
+
+
+def g(X):
+    return np.array([[0.0], [1.0]])
+
+
+def test_first_same_as_last():
+    X0 = np.array([[1.0, 0.0], [0.5, 0.5], [0.0, 2.0]])
+    for control_period in (None, 0.5):
+        status, t, X, info = simulate_adaptive(f, g, Feedback(0.3), X0, 10.0, control_period=control_period)
+        attempts = info["steps"] + info["rejected"]
+        updates = 0 if control_period is None else len(X0) * 20
+        assert info["rhs_evals"] <= 6 * attempts + len(X0) + updates
+        assert np.all(status == "t_max") and np.allclose(t, 10.0)
+
+
+def _euler(x, controller, t_max, dt):
+    # one trajectory at a time, like simulate in docking.jl
+    steps, t = 0, 0.0
+    while t < t_max:
+        ok, u = controller.solve(x[None])
+        if not ok[0]:
+            return "failed", t, x, steps
+        x = x + dt * (f(x[None])[0] + g(x[None]) @ u[0])
+        steps += 1
+        t = steps * dt
+        if docked(x[None])[0]:
+            return "done", t, x, steps
+    return "t_max", t, x, steps
+
+
+def test_ensemble_matches_one_at_a_time():
+    X0 = np.array([[1.0, 0.0], [3.0, 0.0], [0.0, 1.0], [2.0, 2.0], [0.5, -0.5]])
+    controller = Damping(0.8, 2.5)
+    status, t, X, info = simulate(f, g, controller, X0, 4.0, 1e-3, done=docked)
+
+    expected = [_euler(x, controller, 4.0, 1e-3) for x in X0]
+    assert list(status) == [e[0] for e in expected]
+    assert {"done", "failed", "t_max"} <= set(status)
+    np.testing.assert_allclose(t, [e[1] for e in expected], rtol=1e-12)
+    np.testing.assert_allclose(X, [e[2] for e in expected], rtol=1e-12, atol=1e-15)
+    assert info["trajectory_steps"] == sum(e[3] for e in expected)
+
+
+def test_event_times():
+    # undamped: x = cos t, v = -sin t, so v = -1/2 at pi/6 and x = 1/2 at pi/3
+    X0 = np.array([[1.0, 0.0], [2.0, 0.0]])
+    status, t, X, info = simulate_adaptive(f, g, Feedback(0.0), X0, 10.0,
+                                           done=lambda X: X[:, 0] - 0.5, safety=lambda X: X[:, 1] + 0.5)
+    assert np.all(status == "done")
+    np.testing.assert_allclose(t, [np.pi / 3, np.arccos(0.25)], rtol=1e-8)
+    np.testing.assert_allclose(X[:, 0], 0.5, rtol=1e-8)
+    np.testing.assert_allclose(info["t_unsafe"], [np.pi / 6, np.arcsin(0.25)], rtol=1e-8)
+
+
+def test_event_times_match_a_fine_reference():
+    solve_ivp = pytest.importorskip("scipy.integrate").solve_ivp
+
+    def done(X):
+        return np.hypot(X[:, 0], X[:, 1]) - 0.2
+
+    X0 = np.array([[1.0, 0.0], [0.0, 1.0], [2.0, 2.0]])
+    status, t, X, info = simulate_adaptive(f, g, Damping(0.8, np.inf), X0, 10.0, done=done)
+
+    def event(t, x):
+        return done(x[None])[0]
+    event.terminal = True
+
+    for i, x0 in enumerate(X0):
+        ref = solve_ivp(lambda t, x: [x[1], -x[0] - 0.8 * x[1]], (0, 10), x0, method="DOP853",
+                        rtol=1e-13, atol=1e-14, events=event)
+        assert status[i] == "done"
+        np.testing.assert_allclose(t[i], ref.t_events[0][0], rtol=1e-7)
+        np.testing.assert_allclose(X[i], ref.y_events[0][0], atol=1e-7)
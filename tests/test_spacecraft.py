@@ -0,0 +1,14 @@
+import numpy as np
+
+from iccbf import lie, spacecraft as sc
+from test_activeset import docking_states
+
+
+def test_analytic_lie_matches_jets():
+    rng = np.random.default_rng(0)
+    X = docking_states(500, rng)
+    X[:, 4] = rng.uniform(-np.pi, np.pi, len(X))
+
+    for fn, analytic in ((sc.h, sc.h_analytic), (sc.V, sc.V_analytic)):
+        for jet, exact in zip(lie(fn, sc.f, sc.g, X), lie(analytic, sc.f, sc.g, X)):
+            np.testing.assert_allclose(exact, jet, rtol=1e-10, atol=1e-12 * np.abs(jet).max())
@@ -0,0 +1,121 @@
+import numpy as np
+
+from iccbf.recorder import Recorder
+from iccbf.simulate import simulate, simulate_adaptive
+from iccbf.store import TrajectoryStore, TrajectoryWriter, save
+
+
+class Constant:
+    def solve(self, X):
+        return np.ones(len(X), dtype=bool), np.zeros((len(X), 1))
+
+
+def f(X):
+    return np.ones_like(X)
+
+
+def g(X):
+    return np.zeros((1, 1))
+
+
+def test_round_trip(tmp_path):
+    X0 = np.array([[0.0], [-10.0], [3.0]])
+    rec = Recorder(h=lambda X: 1 - X[:, 0], chunk=8)
+    simulate(f, g, Constant(), X0, 4.0, 0.1, done=lambda X: X[:, 0] >= 0.1 - 1e-9, recorder=rec)
+    save(str(tmp_path / "saved"), rec, attrs=dict(dt=0.1))
+
+    with TrajectoryWriter(str(tmp_path / "streamed"), attrs=dict(dt=0.1)) as sink:
+        streamed = Recorder(h=lambda X: 1 - X[:, 0], chunk=8, sink=sink)
+        simulate(f, g, Constant(), X0, 4.0, 0.1, done=lambda X: X[:, 0] >= 0.1 - 1e-9, recorder=streamed)
+
+    for name in ("saved", "streamed"):
+        store = TrajectoryStore(str(tmp_path / name))
+        assert store.complete and store.attrs == dict(dt=0.1) and len(store) == len(rec)
+        for column in ("t", "x", "u", "h", "status"):
+            assert isinstance(store[column], np.memmap)
+            assert store[column].dtype == rec[column].dtype
+            np.testing.assert_array_equal(store[column], rec[column])
+
+
+def test_incomplete_store_is_readable(tmp_path):
+    t = np.arange(100.0)
+    try:
+        with TrajectoryWriter(str(tmp_path)) as writer:
+            writer.write(dict(t=t[:60]))
+            np.testing.assert_array_equal(TrajectoryStore(str(tmp_path))["t"], t[:60])
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    store = TrajectoryStore(str(tmp_path))
+    assert not store.complete and len(store) == 60
+
+
+def test_rows_between_and_window(tmp_path):
+    # chunks of uneven size, t repeated across rows as a decimated run has it
+    rng = np.random.default_rng(2)
+    t = np.sort(rng.choice(np.arange(0, 50, 0.25), 1000))
+    x = rng.normal(size=(1000, 3))
+    with TrajectoryWriter(str(tmp_path)) as writer:
+        cuts = np.r_[0, np.sort(rng.choice(np.arange(1, 1000), 40, replace=False)), 1000]
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            writer.write(dict(t=t[a:b], x=x[a:b]))
+
+    store = TrajectoryStore(str(tmp_path))
+    for t0, t1 in [(-5, -1), (60, 70), (-1, 100), *np.sort(rng.uniform(-2, 52, (50, 2)))]:
+        inside = np.flatnonzero((t >= t0) & (t <= t1))
+        expected = (inside[0], inside[-1] + 1) if len(inside) else None
+        start, stop = store.rows_between(t0, t1)
+        assert (start, stop) == expected or (expected is None and start == stop)
+
+        window = store.window(t0, t1, step=3)
+        np.testing.assert_array_equal(window["x"], x[start:stop:3])
+        np.testing.assert_array_equal(window["t"], t[start:stop:3])
+
+
+def test_rows_between_with_trajectories_that_stop_early(tmp_path):
+    # the first trajectory is done at t = 0.1, the second runs to t = 4
+    X0 = np.array([[0.0], [-10.0]])
+    with TrajectoryWriter(str(tmp_path)) as sink:
+        rec = Recorder(chunk=8, sink=sink)
+        simulate(f, g, Constant(), X0, 4.0, 0.1, done=lambda X: X[:, 0] >= 0.1 - 1e-9, recorder=rec)
+
+    store = TrajectoryStore(str(tmp_path))
+    t = store["t"]
+    assert np.all(np.diff(t, axis=0) >= 0)
+    assert store.rows_between(0, 2.0) == (0, 21)
+    assert store.rows_between(3.5, 3.95) == (35, 40)
+
+
+def test_rows_between_adaptive(tmp_path):
+    X0 = np.array([[0.0], [-10.0]])
+    with TrajectoryWriter(str(tmp_path)) as sink:
+        rec = Recorder(chunk=8, sink=sink)
+        simulate_adaptive(f, g, Constant(), X0, 4.0, control_period=0.1, done=lambda X: 0.1 - X[:, 0],
+                          recorder=rec)
+
+    store = TrajectoryStore(str(tmp_path))
+    t, running = store["t"][:, 1], store["status"][:, 1] == 0
+    for t0, t1 in ((0, 2.0), (3.5, 3.9), (1.05, 1.25)):
+        start, stop = store.rows_between(t0, t1)
+        inside = np.flatnonzero(running & (t >= t0) & (t <= t1))
+        assert (start, stop) == (inside[0], inside[-1] + 1)
+
+
+def test_from_store_keeps_narrow_dips(tmp_path):
+    from iccbf.downsample import from_store
+
+    # 50 one row dips to near 0 in 200000 rows of a slowly varying h
+    rows = 200000
+    t = np.arange(rows) * 1e-3
+    h = 1 + 0.5 * np.sin(t / 20)
+    dips = np.arange(2000, rows, 4000)
+    h[dips] = np.linspace(1e-3, 5e-2, len(dips))
+    with TrajectoryWriter(str(tmp_path)) as writer:
+        for i in range(0, rows, 8192):
+            writer.write(dict(t=t[i:i + 8192, None], h=h[i:i + 8192, None],
+                              status=np.zeros((len(t[i:i + 8192]), 1), dtype=np.int8)))
+
+    ts, ys = from_store(TrajectoryStore(str(tmp_path)), "h", 400)
+    assert len(ts) == 400
+    assert np.all(np.diff(ts) > 0)
+    np.testing.assert_array_equal(np.sort(ys[ys < 0.1]), h[dips])
@@ -0,0 +1,94 @@
+import html
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("manim")
+
+import texcache  # noqa: E402
+from manim import MathTex, config  # noqa: E402
+
+
+def _latex_pages(text):
+    # what the stubbed latex typesets: one page per texcachepage (or the whole
+    # document), and an extra page wherever an expression says \newpage
+    bodies = re.findall(r"\\begin\{texcachepage\}\n(.*?)\n\\end\{texcachepage\}", text, re.S)
+    if not bodies:
+        bodies = [text.split(r"\begin{document}")[1].split(r"\end{document}")[0]]
+    return [page for body in bodies for page in body.split(r"\newpage")]
+
+
+@pytest.fixture
+def latex(tmp_path, monkeypatch):
+    # replaces latex and dvisvgm, the svg of each page holds its source
+    calls = []
+
+    def run(command, cwd=None, stdout=None):
+        calls.append(command[0])
+        if command[0] == "dvisvgm":
+            pages = json.loads(Path(command[-1]).read_text())
+            pattern = command[command.index("-o") + 1]
+            if "--page=1" in command:
+                pages = pages[:1]
+            for i, page in enumerate(pages, 1):
+                Path(pattern.replace("%p", str(i))).write_text(
+                    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1 1">'
+                    f'<title>{html.escape(page)}</title><path d="M0 0h1v1h-1z"/></svg>')
+        else:
+            tex = Path(command[-1])
+            text = tex.read_text()
+            if r"\undefined" not in text:
+                tex.with_suffix(".dvi").write_text(json.dumps(_latex_pages(text)))
+
+    monkeypatch.setattr(texcache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(texcache.subprocess, "run", run)
+    return calls
+
+
+def _jobs(*expressions):
+    template = config["tex_template"]
+    return {texcache._key(texcache._texcode(e, "align*", template)): (e, "align*", template)
+            for e in expressions}
+
+
+def _check(jobs, skip=()):
+    for key, (expression, _, _) in jobs.items():
+        svg = texcache.CACHE_DIR / (key + ".svg")
+        assert svg.exists() != (expression in skip)
+        if svg.exists():
+            source = html.unescape(svg.read_text())
+            assert expression.split(r"\newpage")[0] in source
+            assert all(e.split(r"\newpage")[0] not in source for e, _, _ in jobs.values() if e != expression)
+
+
+def test_batch_maps_pages_to_keys(latex):
+    jobs = _jobs(r"\alpha", r"\beta", r"\gamma")
+    texcache._compile(jobs)
+    assert latex.count("latex") == 1
+    _check(jobs)
+
+
+def test_page_count_mismatch_recompiles_each(latex):
+    jobs = _jobs(r"\alpha", r"\beta \newpage \delta", r"\gamma")
+    texcache._compile(jobs)
+    assert latex.count("latex") == 1 + 3
+    _check(jobs)
+
+
+def test_failing_expression_keeps_the_rest(latex):
+    jobs = _jobs(r"\alpha", r"\undefined", r"\gamma")
+    texcache._compile(jobs, strict=False)
+    _check(jobs, skip=[r"\undefined"])
+    with pytest.raises(ValueError):
+        texcache._compile({k: v for k, v in jobs.items() if v[0] == r"\undefined"})
+
+
+def test_font_size_is_part_of_the_key(latex):
+    texcache.install()
+    MathTex(r"\alpha", font_size=24)
+    MathTex(r"\alpha", font_size=48)
+    MathTex(r"\alpha", font_size=24)
+    assert len(list(texcache.CACHE_DIR.glob("*.svg"))) == 2
+    assert latex.count("latex") == 2
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from iccbf import ICCBF, Linear, Root, acc, jet_seed, jet_step
+from iccbf.falsify import margin
+
+pytest.importorskip("scipy")
+
+from iccbf.falsify import sobol  # noqa: E402
+from iccbf.tune import search  # noqa: E402
+
+
+def test_jet_steps_match_levels():
+    X = np.column_stack([np.linspace(10, 90, 50), np.linspace(2, 22, 50)])
+    b = ICCBF(acc.f, acc.g, acc.h, acc.alphas, acc.U)
+    F, G, jet = jet_seed(acc.f, acc.g, acc.h, X, b.N)
+    levels = [jet.value]
+    for alpha in b.alphas[:-1]:
+        jet = jet_step(jet, F, G, acc.U, alpha)
+        levels.append(jet.value)
+    np.testing.assert_allclose(np.stack(levels), b.levels(X), rtol=1e-12)
+
+
+def test_search_ranks_a_toy_family():
+    families = [Linear, Root, Linear]
+    grid = [[1, 4], [0.1, 7], [0.05, 2]]
+    bounds = ([0, 0], [100, 24])
+    samples = 1 << 10
+    ranked = search(acc.f, acc.g, acc.h, acc.U, families, grid, bounds, samples=samples, workers=0)
+
+    assert len(ranked) == 8
+    keys = [(c["violations"] > 0, -c["volume"]) for c in ranked]
+    assert keys == sorted(keys)
+    # a large C* with violations goes after every candidate without
+    assert ranked[-1]["params"] == (1, 7, 0.05) and ranked[-1]["violations"] > 0
+    assert ranked[-1]["volume"] > ranked[-2]["volume"]
+
+    # the same scores, one candidate at a time
+    lo, hi = (np.asarray(v, dtype=float) for v in bounds)
+    X = lo + sobol(2, 0, 0, samples) * (hi - lo)
+    for c in ranked:
+        b = ICCBF(acc.f, acc.g, acc.h, [family(p) for family, p in zip(families, c["params"])], acc.U)
+        m, inside = margin(b, X)
+        assert c["fraction"] == inside.sum() / samples
+        assert c["violations"] == np.sum(inside & ~(m >= 0))
+        if inside.any():
+            assert c["worst"] == pytest.approx(m[inside].min(), rel=1e-9, abs=1e-9)